@@ -74,6 +74,7 @@ def create_apscheduler_job(
     handle_javascript: bool,
     output_target: str,
     runtime_offset_seconds: int,
+    canonicalization_rules: str | None = None,
 ) -> dict:
     """Creates job record in format needed by apscheduler"""
 
@@ -90,6 +91,7 @@ def create_apscheduler_job(
             allowed_domains,
             starting_urls,
             output_target,
+            canonicalization_rules,
         ],
     }
 
@@ -0,0 +1,245 @@
+"""
+Throughput benchmark of the `elasticsearch` output target that does not need a real cluster.  Pages from the
+test http cache are fed through `SearchGovSpidersPipeline` -> `SearchGovElasticsearch`, which uploads to a
+local stand-in that answers the handful of Elasticsearch APIs the spider uses (`HEAD /<index>` and `_bulk`).
+
+Reports conversion time, bulk latency, docs/sec and peak RSS so regressions from newspaper upgrades or
+batching changes show up as numbers.  Uses the same environment variables as a crawl to tune conversion
+and uploads, except for the host and index settings which always point at the stand-in.
+
+- Run `python -m search_gov_crawler.benchmarks.es_pipeline` from the repo root
+- Run `python -m search_gov_crawler.benchmarks.es_pipeline -h` for more details on arguments
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import resource
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from pythonjsonlogger.json import JsonFormatter
+from scrapy.exceptions import DropItem
+from scrapy.spiders import Spider
+from twisted.internet import defer
+
+from search_gov_crawler.benchmarks.httpcache_corpus import DEFAULT_HTTPCACHE_DIR, CachedPage, load_cached_pages
+from search_gov_crawler.search_gov_spiders.extensions.json_logging import LOG_FMT
+
+logging.basicConfig(level=os.environ.get("SCRAPY_LOG_LEVEL", "INFO"))
+logging.getLogger().handlers[0].setFormatter(JsonFormatter(fmt=LOG_FMT))
+
+log = logging.getLogger("search_gov_crawler.benchmarks.es_pipeline")
+
+
+class FakeElasticsearchHandler(BaseHTTPRequestHandler):
+    """Answers index checks and bulk requests the way Elasticsearch would, optionally adding latency"""
+
+    bulk_latency_seconds: float = 0.0
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Silence default request logging"""
+
+    def _send_json(self, body: dict, status: int = 200) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("X-Elastic-Product", "Elasticsearch")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        """Every index exists"""
+        self.send_response(200)
+        self.send_header("X-Elastic-Product", "Elasticsearch")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Cluster info"""
+        self._send_json({"name": "fake", "version": {"number": "8.17.1"}, "tagline": "You Know, for Search"})
+
+    def _read_body(self) -> bytes:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        return body
+
+    def _is_bulk_request(self) -> bool:
+        """`/_bulk` or `/<index>/_bulk`, the client sends bulk requests as PUT and the spec also allows POST"""
+        return self.path.partition("?")[0].rstrip("/").endswith("/_bulk")
+
+    def do_PUT(self):  # pylint: disable=invalid-name
+        """Bulk requests or index creation"""
+        if self._is_bulk_request():
+            self._send_bulk_response()
+        else:
+            self._read_body()
+            self._send_json({"acknowledged": True})
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Bulk requests"""
+        if self._is_bulk_request():
+            self._send_bulk_response()
+        else:
+            self._read_body()
+            self._send_json({"error": f"no handler found for uri [{self.path}]"}, status=400)
+
+    def _send_bulk_response(self) -> None:
+        """Every index action succeeds"""
+        lines = [json.loads(line) for line in self._read_body().splitlines() if line.strip()]
+        items = [
+            {"index": {"_index": action["index"]["_index"], "_id": action["index"]["_id"], "status": 201}}
+            for action in lines[::2]
+        ]
+        time.sleep(self.bulk_latency_seconds)
+        self._send_json({"took": 1, "errors": False, "items": items})
+
+
+def start_fake_elasticsearch(bulk_latency_seconds: float) -> ThreadingHTTPServer:
+    """Start the stand-in on a free local port in a background thread"""
+    handler = type("Handler", (FakeElasticsearchHandler,), {"bulk_latency_seconds": bulk_latency_seconds})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def peak_rss_mb() -> dict[str, float]:
+    """Peak resident set size of this process and of its largest child (the conversion workers)"""
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+
+def benchmark_conversion(pages: list[CachedPage]) -> dict:
+    """Convert every page inline to measure conversion cost without any pooling or uploads"""
+    # pylint: disable=import-outside-toplevel
+    from search_gov_crawler.elasticsearch.convert_html_i14y import convert_html
+    from search_gov_crawler.search_gov_spiders.helpers.encoding import decode_http_response
+
+    start = time.perf_counter()
+    for page in pages:
+        convert_html(html_content=decode_http_response(page.body), url=page.url)
+    elapsed = time.perf_counter() - start
+
+    return {"pages": len(pages), "seconds": round(elapsed, 3), "ms_per_page": round(1000 * elapsed / len(pages), 2)}
+
+
+@defer.inlineCallbacks
+def benchmark_pipeline(pages: list[CachedPage], spider: Spider, concurrency: int):
+    """
+    Feed pages through the item pipeline with up to `concurrency` items in flight, the way the scrapy
+    scraper does, and wait for the pipeline to finish uploading.
+    """
+    # pylint: disable=import-outside-toplevel
+    from scrapy.utils.defer import parallel
+
+    from search_gov_crawler.search_gov_spiders.helpers.encoding import decode_http_response
+    from search_gov_crawler.search_gov_spiders.items import SearchGovSpidersItem
+    from search_gov_crawler.search_gov_spiders.pipelines import SearchGovSpidersPipeline
+
+    pipeline = SearchGovSpidersPipeline()
+    dropped = []
+
+    def item_dropped(failure, url: str) -> None:
+        failure.trap(DropItem)
+        dropped.append(url)
+
+    def process_page(page: CachedPage):
+        item = SearchGovSpidersItem(
+            url=page.url, html_content=decode_http_response(page.body), output_target="elasticsearch"
+        )
+        deferred = defer.maybeDeferred(pipeline.process_item, item, spider)
+        deferred.addErrback(item_dropped, page.url)
+        return deferred
+
+    start = time.perf_counter()
+    yield defer.maybeDeferred(pipeline.open_spider, spider)
+    yield parallel(pages, concurrency, process_page)
+    yield defer.maybeDeferred(pipeline.close_spider, spider)
+    elapsed = time.perf_counter() - start
+
+    stats = spider.crawler.stats
+    docs = stats.get_value("elasticsearch/bulk/docs_succeeded", 0)
+    batches = stats.get_value("elasticsearch/bulk/batches", 0)
+    return {
+        "pages": len(pages),
+        "dropped": len(dropped),
+        "docs": docs,
+        "seconds": round(elapsed, 3),
+        "docs_per_second": round(docs / elapsed, 2),
+        "bulk_batches": batches,
+        "bulk_latency_ms": round(1000 * stats.get_value("elasticsearch/bulk/seconds", 0) / max(batches, 1), 2),
+    }
+
+
+def main(cache_dir: Path, concurrency: int, bulk_latency_ms: int, repeat: int):
+    """Run the conversion and pipeline benchmarks and log the results"""
+    # pylint: disable=import-outside-toplevel
+    from scrapy.utils.reactor import install_reactor
+
+    install_reactor("twisted.internet.asyncioreactor.AsyncioSelectorReactor")
+    from scrapy.utils.test import get_crawler
+    from twisted.internet import task
+
+    pages = load_cached_pages(cache_dir=cache_dir) * repeat
+    if not pages:
+        raise SystemExit(f"No cached html pages to benchmark in {cache_dir} with repeat={repeat}")
+
+    server = start_fake_elasticsearch(bulk_latency_seconds=bulk_latency_ms / 1000)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.environ.update(
+            {
+                "ES_HOSTS": f"http://127.0.0.1:{server.server_port}",
+                "SPIDER_ES_INDEX_NAME": "benchmark",
+                "SPIDER_ES_INDEX_ALIAS": "benchmark-alias",
+                "SPIDER_ES_FINGERPRINT_DB": "",
+                "SPIDER_ES_DEAD_LETTER_DIR": temp_dir,
+            }
+        )
+
+        conversion_results = benchmark_conversion(pages)
+        log.info("Conversion benchmark results: %s", conversion_results)
+
+        crawler = get_crawler(Spider)
+        spider = crawler._create_spider(  # pylint: disable=protected-access
+            name="es_pipeline_benchmark", output_target="elasticsearch"
+        )
+
+        def run(_reactor):
+            deferred = benchmark_pipeline(pages, spider, concurrency)
+            deferred.addCallback(lambda results: log.info("Pipeline benchmark results: %s", results))
+            return deferred
+
+        try:
+            task.react(run)
+        except SystemExit:
+            pass
+        finally:
+            server.shutdown()
+
+    log.info("Peak RSS MB: %s", peak_rss_mb())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the elasticsearch output pipeline against a stand-in.")
+    parser.add_argument("-c", "--cache_dir", type=Path, default=DEFAULT_HTTPCACHE_DIR, help="Scrapy http cache dir")
+    parser.add_argument("-n", "--concurrency", type=int, default=16, help="Max items in the pipeline at once")
+    parser.add_argument("-l", "--bulk_latency_ms", type=int, default=0, help="Latency added to each bulk request")
+    parser.add_argument("-r", "--repeat", type=int, default=1, help="Number of times to feed the corpus")
+    args = parser.parse_args()
+
+    main(
+        cache_dir=args.cache_dir,
+        concurrency=args.concurrency,
+        bulk_latency_ms=args.bulk_latency_ms,
+        repeat=args.repeat,
+    )
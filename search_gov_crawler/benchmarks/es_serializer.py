@@ -0,0 +1,77 @@
+"""
+Micro-benchmark of the JSON serializers available for Elasticsearch bulk request bodies.  Documents are
+created by running `convert_html` on the pages in the test http cache, then serialized the same way the
+bulk helpers do, one action line and one source line per document.  Reports serialization time and the
+bytes sent with and without gzip request compression.
+
+- Run `python -m search_gov_crawler.benchmarks.es_serializer` from the repo root
+- Run `python -m search_gov_crawler.benchmarks.es_serializer -h` for more details on arguments
+"""
+
+import argparse
+import gzip
+import logging
+import os
+import time
+from pathlib import Path
+
+from pythonjsonlogger.json import JsonFormatter
+
+from search_gov_crawler.benchmarks.httpcache_corpus import DEFAULT_HTTPCACHE_DIR, load_cached_pages
+from search_gov_crawler.elasticsearch.convert_html_i14y import convert_html
+from search_gov_crawler.elasticsearch.es_serializer import get_serializer
+from search_gov_crawler.search_gov_spiders.extensions.json_logging import LOG_FMT
+from search_gov_crawler.search_gov_spiders.helpers.encoding import decode_http_response
+
+logging.basicConfig(level=os.environ.get("SCRAPY_LOG_LEVEL", "INFO"))
+logging.getLogger().handlers[0].setFormatter(JsonFormatter(fmt=LOG_FMT))
+
+log = logging.getLogger("search_gov_crawler.benchmarks.es_serializer")
+
+
+def build_bulk_lines(cache_dir: Path) -> list[dict]:
+    """Convert cached pages into the action and source lines of a bulk request"""
+    lines = []
+    for page in load_cached_pages(cache_dir=cache_dir):
+        doc = convert_html(html_content=decode_http_response(page.body), url=page.url)
+        if doc:
+            lines.append({"index": {"_index": "benchmark", "_id": doc.pop("_id")}})
+            lines.append(doc)
+    return lines
+
+
+def benchmark_serializer(name: str, lines: list[dict], iterations: int) -> dict:
+    """Time serializing all lines with the named serializer and measure the size of the resulting body"""
+    serializer = get_serializer(name)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        body = b"\n".join(serializer.dumps(line) for line in lines) + b"\n"
+    elapsed = time.perf_counter() - start
+
+    return {
+        "serializer": type(serializer).__name__,
+        "documents": len(lines) // 2,
+        "seconds_per_body": round(elapsed / iterations, 6),
+        "body_bytes": len(body),
+        "gzip_body_bytes": len(gzip.compress(body)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Elasticsearch bulk body serialization.")
+    parser.add_argument("-c", "--cache_dir", type=Path, default=DEFAULT_HTTPCACHE_DIR, help="Scrapy http cache dir")
+    parser.add_argument("-i", "--iterations", type=int, default=20, help="Number of times to serialize the corpus")
+    args = parser.parse_args()
+
+    bulk_lines = build_bulk_lines(cache_dir=args.cache_dir)
+    results = [benchmark_serializer(name, bulk_lines, args.iterations) for name in ("json", "orjson")]
+    for result in results:
+        log.info("Serializer benchmark results: %s", result)
+
+    baseline, candidate = results
+    log.info(
+        "orjson speedup=%.2fx gzip bytes saved=%.1f%%",
+        baseline["seconds_per_body"] / candidate["seconds_per_body"],
+        100 * (1 - baseline["gzip_body_bytes"] / baseline["body_bytes"]),
+    )
@@ -0,0 +1,35 @@
+import dbm.dumb
+import pickle
+from pathlib import Path
+from typing import NamedTuple
+
+DEFAULT_HTTPCACHE_DIR = Path(__file__).parent.parent.parent / "tests" / "search_gov_spiders" / "scrapy_httpcache"
+
+
+class CachedPage(NamedTuple):
+    """A single response stored in a scrapy DbmCacheStorage http cache"""
+
+    url: str
+    headers: dict[bytes, list[bytes]]
+    body: bytes
+
+
+def load_cached_pages(
+    cache_dir: Path = DEFAULT_HTTPCACHE_DIR, spider_name: str = "domain_spider", html_only: bool = True
+) -> list[CachedPage]:
+    """
+    Read successful responses from a scrapy http cache created with `HTTPCACHE_DBM_MODULE = "dbm.dumb"`,
+    like the one used by the full crawl tests.  Used as the corpus for benchmarks.
+    """
+    pages = []
+    with dbm.dumb.open(str(cache_dir / f"{spider_name}.db"), "r") as cache_db:
+        for key in cache_db.keys():
+            if not key.endswith(b"_data"):
+                continue
+            data = pickle.loads(cache_db[key])  # nosec - trusted local test fixtures
+            content_type = b"".join(data["headers"].get(b"Content-Type", []))
+            if data["status"] != 200 or (html_only and b"text/html" not in content_type):
+                continue
+            pages.append(CachedPage(url=data["url"], headers=data["headers"], body=data["body"]))
+
+    return sorted(pages, key=lambda page: page.url)
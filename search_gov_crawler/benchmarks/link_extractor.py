@@ -0,0 +1,89 @@
+"""
+Micro-benchmark of link extraction for the domain spiders.  Compares the generic scrapy `LinkExtractor`,
+configured the way the domain spiders used it, with the specialized `SearchGovLinkExtractor` on the html
+pages in the test http cache.  Reports extraction time per page and whether both extract the same links.
+
+- Run `python -m search_gov_crawler.benchmarks.link_extractor` from the repo root
+- Run `python -m search_gov_crawler.benchmarks.link_extractor -h` for more details on arguments
+"""
+
+import argparse
+import logging
+import os
+import time
+from pathlib import Path
+
+from pythonjsonlogger.json import JsonFormatter
+from scrapy.http import HtmlResponse
+from scrapy.linkextractors import LinkExtractor
+
+from search_gov_crawler.benchmarks.httpcache_corpus import DEFAULT_HTTPCACHE_DIR, load_cached_pages
+from search_gov_crawler.search_gov_spiders.extensions.json_logging import LOG_FMT
+from search_gov_crawler.search_gov_spiders.helpers.domain_spider import (
+    FILTER_EXTENSIONS,
+    LINK_DENY_REGEX_STR,
+    domain_spider_link_extractor,
+)
+
+log = logging.getLogger("search_gov_crawler.benchmarks.link_extractor")
+
+generic_link_extractor = LinkExtractor(
+    allow=(),
+    deny=LINK_DENY_REGEX_STR,
+    deny_extensions=FILTER_EXTENSIONS,
+    tags=("a", "area", "va-link"),
+    unique=True,
+)
+
+
+def build_responses(cache_dir: Path) -> list[HtmlResponse]:
+    """Create html responses from the cached pages"""
+    return [
+        HtmlResponse(url=page.url, headers=page.headers, body=page.body)
+        for page in load_cached_pages(cache_dir=cache_dir)
+    ]
+
+
+def benchmark_link_extractor(name: str, link_extractor, responses: list[HtmlResponse], iterations: int) -> dict:
+    """
+    Time extracting links from every response.  Responses are recreated for each iteration so the time to
+    parse the page, which scrapy caches on the response, is included.
+    """
+    elapsed = 0.0
+    for _ in range(iterations):
+        fresh_responses = [response.replace() for response in responses]
+        start = time.perf_counter()
+        links = [link_extractor.extract_links(response) for response in fresh_responses]
+        elapsed += time.perf_counter() - start
+
+    return {
+        "link_extractor": name,
+        "pages": len(responses),
+        "links": sum(len(page_links) for page_links in links),
+        "seconds_per_page": round(elapsed / (iterations * max(1, len(responses))), 6),
+        "link_urls": [[link.url for link in page_links] for page_links in links],
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.environ.get("SCRAPY_LOG_LEVEL", "INFO"))
+    logging.getLogger().handlers[0].setFormatter(JsonFormatter(fmt=LOG_FMT))
+
+    parser = argparse.ArgumentParser(description="Benchmark link extraction for the domain spiders.")
+    parser.add_argument("-c", "--cache_dir", type=Path, default=DEFAULT_HTTPCACHE_DIR, help="Scrapy http cache dir")
+    parser.add_argument("-i", "--iterations", type=int, default=10, help="Number of times to extract the corpus")
+    args = parser.parse_args()
+
+    html_responses = build_responses(cache_dir=args.cache_dir)
+    baseline, candidate = (
+        benchmark_link_extractor(name, link_extractor, html_responses, args.iterations)
+        for name, link_extractor in (("generic", generic_link_extractor), ("search_gov", domain_spider_link_extractor))
+    )
+    for result in (baseline, candidate):
+        log.info("Link extractor benchmark results: %s", {k: v for k, v in result.items() if k != "link_urls"})
+
+    log.info(
+        "Link extractor speedup=%.2fx same_links=%s",
+        baseline["seconds_per_page"] / candidate["seconds_per_page"],
+        baseline["link_urls"] == candidate["link_urls"],
+    )
@@ -0,0 +1,145 @@
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+from twisted.internet import defer
+from twisted.python.failure import Failure
+
+from scrapy.spiders import Spider
+
+from search_gov_crawler.search_gov_spiders.helpers import timing
+from search_gov_crawler.search_gov_spiders.helpers.timing import StageTimer
+
+
+def deferred_from_future(future: Future) -> defer.Deferred:
+    """Wrap a concurrent.futures Future in a Deferred that is fired on the reactor thread."""
+    from twisted.internet import reactor  # pylint: disable=import-outside-toplevel
+
+    deferred = defer.Deferred()
+
+    def _fire(done_future: Future) -> None:
+        if (exc := done_future.exception()) is not None:
+            deferred.errback(Failure(exc))
+        else:
+            deferred.callback(done_future.result())
+
+    future.add_done_callback(lambda done_future: reactor.callFromThread(_fire, done_future))
+    return deferred
+
+
+def call_with_timings(func: Callable[..., Any], stage: str, /, **kwargs) -> tuple[Any, dict[str, tuple[float, float]]]:
+    """
+    Call func with a timings dict it can fill with the time of its own stages, returns the result and the
+    timings including the time of the whole call under stage.  Runs in the worker process.
+    """
+    timings: dict[str, tuple[float, float]] = {}
+    with StageTimer(timings, stage):
+        result = func(**kwargs, timings=timings)
+    return result, timings
+
+
+def record_conversion_timings(result: tuple[Any, dict[str, tuple[float, float]]], spider: Spider) -> Any:
+    """Add the timings measured in the conversion worker to the spider stats and pass on the result"""
+    result, timings = result
+    timing.record_timings(spider, timings)
+    return result
+
+
+class ConversionPool:
+    """
+    Runs html to i14y document conversion in a pool of worker processes so that the CPU-bound
+    newspaper parsing does not block the reactor thread.  The number of conversions submitted to the
+    pool at one time is bounded by `max_pending`, additional conversions wait their turn without
+    blocking.  A `max_workers` value of 0 runs conversions inline on the calling thread.  With a
+    `timing_stage`, the convert function is passed a timings dict and results are `(result, timings)`.
+    When a worker process dies, e.g. killed for running out of memory, the pool is replaced and the
+    conversions it was running are retried once, so only a conversion that breaks the pool again fails.
+    """
+
+    def __init__(
+        self, convert_func: Callable[..., Any], max_workers: int, max_pending: int, timing_stage: str | None = None
+    ):
+        self._convert_func = convert_func
+        self._timing_stage = timing_stage
+        self._max_workers = max_workers
+        self._executor = self._new_executor() if max_workers > 0 else None
+        self._semaphore = defer.DeferredSemaphore(max(1, max_pending))
+        self._pending: set[defer.Deferred] = set()
+
+    @classmethod
+    def from_env(cls, convert_func: Callable[..., Any], timing_stage: str | None = None) -> "ConversionPool":
+        """Create a pool sized by SPIDER_ES_CONVERT_WORKERS and SPIDER_ES_CONVERT_QUEUE_SIZE"""
+        return cls(
+            convert_func=convert_func,
+            max_workers=int(os.environ.get("SPIDER_ES_CONVERT_WORKERS", "1")),
+            max_pending=int(os.environ.get("SPIDER_ES_CONVERT_QUEUE_SIZE", "8")),
+            timing_stage=timing_stage,
+        )
+
+    @property
+    def pending(self) -> int:
+        """Number of conversions that are either running or waiting to run"""
+        return len(self._pending)
+
+    def submit(self, **kwargs) -> defer.Deferred:
+        """Queue a conversion, returns a deferred that fires with the result of the convert function"""
+        deferred = self._semaphore.run(self._convert, **kwargs)
+        self._pending.add(deferred)
+        deferred.addBoth(self._discard_pending, deferred)
+        return deferred
+
+    def drain(self) -> defer.Deferred:
+        """Returns a deferred that fires once every queued conversion has finished"""
+        return defer.DeferredList(list(self._pending), consumeErrors=True)
+
+    def close(self) -> None:
+        """Shutdown worker processes, any conversions not yet started are cancelled"""
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _convert(self, **kwargs) -> defer.Deferred:
+        args = (self._convert_func,)
+        if self._timing_stage:
+            args = (call_with_timings, self._convert_func, self._timing_stage)
+        if self._executor is None:
+            return defer.maybeDeferred(*args, **kwargs)
+        return self._submit_to_executor(args, kwargs, retry=True)
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self._max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _submit_to_executor(self, args: tuple, kwargs: dict[str, Any], retry: bool) -> defer.Deferred:
+        executor = self._executor
+        if executor is None:
+            return defer.fail(BrokenProcessPool("Conversion pool is closed"))
+        try:
+            future = executor.submit(*args, **kwargs)
+        except BrokenProcessPool:
+            executor = self._replace_broken_executor(executor)
+            future = executor.submit(*args, **kwargs)
+
+        deferred = deferred_from_future(future)
+        if retry:
+            deferred.addErrback(self._retry_broken_pool, executor, args, kwargs)
+        return deferred
+
+    def _retry_broken_pool(
+        self, failure: Failure, executor: ProcessPoolExecutor, args: tuple, kwargs: dict[str, Any]
+    ) -> defer.Deferred:
+        failure.trap(BrokenProcessPool)
+        self._replace_broken_executor(executor)
+        return self._submit_to_executor(args, kwargs, retry=False)
+
+    def _replace_broken_executor(self, executor: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        """Replace a broken executor once, conversions that failed with it all share the new one"""
+        if self._executor is executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+        return self._executor
+
+    def _discard_pending(self, result: Any, deferred: defer.Deferred) -> Any:
+        self._pending.discard(deferred)
+        return result
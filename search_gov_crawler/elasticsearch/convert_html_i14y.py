@@ -1,11 +1,15 @@
 import os
 import hashlib
 import newspaper
-import tldextract
 from datetime import datetime, timezone
 from urllib.parse import urlparse
+from newspaper import nlp as newspaper_nlp
+from newspaper.text import StopWords
 
 import search_gov_crawler.search_gov_spiders.helpers.content as content
+from search_gov_crawler.search_gov_spiders.helpers.domain_extraction import get_domain_name
+from search_gov_crawler.search_gov_spiders.helpers.timing import StageTimer
+from search_gov_crawler.search_gov_spiders.helpers.url_canonicalization import canonicalize_url
 
 
 ALLOWED_LANGUAGE_CODE = {
@@ -17,12 +21,40 @@ ALLOWED_LANGUAGE_CODE = {
     ]
 }
 
-def convert_html(html_content: str, url: str):
-    """Extracts and processes article content from HTML using newspaper3k."""
-    article = newspaper.Article(url=url)
-    article.download(input_html=html_content)
-    article.parse()
-    article.nlp()
+# Controls when newspaper nlp (keywords and summary) is run during conversion:
+#   always - run nlp for every page
+#   lazy   - only run nlp when the summary fallback is needed, or only keyword extraction when
+#            the keywords fallback is the only one needed
+#   off    - never run nlp
+NLP_MODES = ("always", "lazy", "off")
+DEFAULT_NLP_MODE = os.environ.get("SPIDER_ES_NLP_MODE", "lazy")
+
+def convert_html(
+    html_content: str,
+    url: str,
+    nlp_mode: str = DEFAULT_NLP_MODE,
+    canonicalization_rules: tuple[str, ...] = (),
+    timings: dict[str, tuple[float, float]] | None = None,
+):
+    """
+    Extracts and processes article content from HTML using newspaper3k.  The document id is the hash of
+    the url, in the canonical form given by canonicalization_rules, so with rules the same page reached through
+    different urls is indexed once.  When a timings
+    dict is passed, the time spent parsing, running nlp and sanitizing text is stored in it.
+    """
+    if nlp_mode not in NLP_MODES:
+        raise ValueError(f"Invalid nlp_mode value {nlp_mode}! Must be one of {NLP_MODES}")
+
+    with StageTimer(timings, "convert_html/parse"):
+        article = newspaper.Article(url=url)
+        article.download(input_html=html_content)
+        article.parse()
+    if needs_nlp(article, nlp_mode):
+        with StageTimer(timings, "convert_html/nlp"):
+            article.nlp()
+    elif needs_keywords(article, nlp_mode):
+        with StageTimer(timings, "convert_html/keywords"):
+            extract_keywords(article)
 
     title = article.title or article.meta_site_name or None
     description = article.meta_description or article.summary or None
@@ -35,10 +67,14 @@ def convert_html(html_content: str, url: str):
     path = article.url or url
 
     basename, extension = get_base_extension(url)
-    sha_id = generate_url_sha256(path)
+    sha_id = generate_url_sha256(canonicalize_url(path, canonicalization_rules))
 
     valid_language = f"_{article.meta_lang}" if article.meta_lang in ALLOWED_LANGUAGE_CODE else ""
 
+    with StageTimer(timings, "convert_html/sanitize"):
+        sanitized_description = content.sanitize_text(description)
+        sanitized_content = content.sanitize_text(main_content)
+
     i14y_doc = {
         "audience": None,
         "changed": None,
@@ -60,8 +96,8 @@ def convert_html(html_content: str, url: str):
         "updated_at": time_now_str,
         "updated": article.publish_date,
         f"title{valid_language}": title,
-        f"description{valid_language}": content.sanitize_text(description),
-        f"content{valid_language}": content.sanitize_text(main_content),
+        f"description{valid_language}": sanitized_description,
+        f"content{valid_language}": sanitized_content,
         "basename": basename,
         "extension": extension or None,
         "url_path": get_url_path(url),
@@ -70,6 +106,36 @@ def convert_html(html_content: str, url: str):
 
     return i14y_doc
 
+def needs_nlp(article: newspaper.Article, nlp_mode: str) -> bool:
+    """
+    Determine if the full nlp, keywords and summary, should run for a parsed article.  The nlp summary is
+    only used when there is no meta description.
+    """
+    if nlp_mode == "always":
+        return True
+    if nlp_mode == "off":
+        return False
+    return not article.meta_description
+
+def needs_keywords(article: newspaper.Article, nlp_mode: str) -> bool:
+    """
+    Determine if keywords should be extracted for a parsed article.  The nlp keywords are only used when
+    there are no tags or meta keywords, newspaper reports missing meta keywords as `[""]`.
+    """
+    return nlp_mode == "lazy" and not (article.tags or any(article.meta_keywords or []))
+
+def extract_keywords(article: newspaper.Article) -> None:
+    """Set the keywords of a parsed article the way `Article.nlp()` does, without the costly summary"""
+    stopwords = StopWords(article.config.language)
+    max_keywords = article.config.max_keywords
+    keywords = newspaper_nlp.keywords(article.text, stopwords, max_keywords)
+    for keyword, score in newspaper_nlp.keywords(article.title, stopwords, max_keywords).items():
+        keywords[keyword] = (keywords[keyword] + score) / 2 if keyword in keywords else score
+
+    keywords = sorted(keywords.items(), key=lambda keyword_score: keyword_score[1], reverse=True)[:max_keywords]
+    article.keywords = [keyword for keyword, _ in keywords]
+    article.keyword_scores = dict(keywords)
+
 def get_url_path(url: str) -> str:
     """Extracts the path from a URL."""
     return urlparse(url).path
@@ -86,10 +152,3 @@ def current_utc_iso() -> str:
 def generate_url_sha256(url: str) -> str:
     """Generates a SHA-256 hash for a given URL."""
     return hashlib.sha256(url.encode()).hexdigest()
-
-def get_domain_name(url: str) -> str:
-    """Extracts the domain from a URL, removing www and ensuring consistency."""
-    parsed = urlparse(url if url.startswith(('http://', 'https://')) else f'https://{url}')
-    extracted = tldextract.extract(parsed.netloc)
-    domain = f"{extracted.subdomain}.{extracted.domain}.{extracted.suffix}".lstrip('.').replace("www.", "")
-    return domain
\ No newline at end of file
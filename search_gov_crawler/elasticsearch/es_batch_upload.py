@@ -1,24 +1,46 @@
-import asyncio
 import logging
 import os
-from concurrent.futures import ThreadPoolExecutor
-from typing import Any
-from urllib.parse import urlparse
+import time
+from pathlib import Path
+from typing import Any, Iterable
 
 from elasticsearch import Elasticsearch, helpers
 from scrapy.spiders import Spider
+from twisted.internet import defer, threads
+from twisted.internet.defer import Deferred
 
+from search_gov_crawler.elasticsearch.conversion_pool import ConversionPool, record_conversion_timings
 from search_gov_crawler.elasticsearch.convert_html_i14y import convert_html
+from search_gov_crawler.elasticsearch.es_client import (
+    RETRY_EXCEPTIONS,
+    ensure_index,
+    get_es_client,
+    parse_es_urls,
+    retry_backoff,
+)
+from search_gov_crawler.elasticsearch.es_dead_letter import DeadLetterSpool, dead_letter_entry
+from search_gov_crawler.elasticsearch.fingerprint_store import FingerprintStore, document_fingerprint
+from search_gov_crawler.search_gov_spiders.helpers import stats, timing
+
+DEFAULT_FINGERPRINT_DB = Path(__file__).parent.parent / "output" / "es-fingerprints.sqlite"
+
+# bulk item statuses that are worth retrying
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
 
 # limit excess INFO messages from elasticsearch that are not tied to a spider
 logging.getLogger("elastic_transport.transport").setLevel("ERROR")
 
 
 class SearchGovElasticsearch:
-    """Defines the shape and methods of the spider's connection to Elasticsearch"""
+    """
+    Defines the shape and methods of the spider's connection to Elasticsearch.  A conversion pool can be shared
+    with other outputs, a shared pool is drained but not shutdown when the connection is closed.
+    """
 
-    def __init__(self, batch_size: int = 50):
+    def __init__(self, batch_size: int = 50, conversion_pool: ConversionPool | None = None):
         self._current_batch = []
+        self._current_batch_bytes = 0
+        self._current_fingerprints = {}
         self._batch_size = batch_size
         self._es_client = None
         self._env_es_hosts = os.environ.get("ES_HOSTS", "")
@@ -26,97 +48,311 @@ class SearchGovElasticsearch:
         self._env_es_index_alias = os.environ.get("SPIDER_ES_INDEX_ALIAS", "")
         self._env_es_username = os.environ.get("ES_USER", "")
         self._env_es_password = os.environ.get("ES_PASSWORD", "")
-        self._executor = ThreadPoolExecutor(max_workers=5)  # Reuse one executor
+        self._env_es_fingerprint_db = os.environ.get("SPIDER_ES_FINGERPRINT_DB", str(DEFAULT_FINGERPRINT_DB))
+        self._fingerprint_store = None
+        self._index_checked = False
+        self._env_es_batch_max_bytes = int(os.environ.get("SPIDER_ES_BATCH_MAX_BYTES", str(10 * 1024 * 1024)))
+        self._env_es_bulk_chunk_size = int(os.environ.get("SPIDER_ES_BULK_CHUNK_SIZE", str(batch_size)))
+        self._env_es_bulk_thread_count = int(os.environ.get("SPIDER_ES_BULK_THREAD_COUNT", "1"))
+        self._env_es_max_uploads_in_flight = int(os.environ.get("SPIDER_ES_MAX_UPLOADS_IN_FLIGHT", "2"))
+        self._upload_semaphore = defer.DeferredSemaphore(max(1, self._env_es_max_uploads_in_flight))
+        self._uploads_in_flight: set[Deferred] = set()
+        self._env_es_max_retries = int(os.environ.get("SPIDER_ES_MAX_RETRIES", "3"))
+        self._env_es_initial_backoff = float(os.environ.get("SPIDER_ES_INITIAL_BACKOFF", "2"))
+        self._env_es_max_backoff = float(os.environ.get("SPIDER_ES_MAX_BACKOFF", "60"))
+        self._dead_letter_spool = DeadLetterSpool()
+        self._owns_conversion_pool = conversion_pool is None
+        self._conversion_pool = conversion_pool or ConversionPool.from_env(convert_html, timing_stage="convert_html")
+
+    def open(self, spider: Spider) -> Deferred:
+        """
+        Check the index in the reactor thread pool before any document is compared with its stored fingerprint,
+        so fingerprints are cleared when the index has to be created.  Returns a deferred that fires once the
+        index has been checked.
+        """
+        return threads.deferToThread(self._get_client, spider)
 
-    def add_to_batch(self, html_content: str, url: str, spider: Spider):
+    def add_to_batch(self, html_content: str, url: str, spider: Spider) -> Deferred:
         """
-        Add a document to the batch for Elasticsearch upload.
+        Convert a document in the conversion pool and add it to the batch for Elasticsearch upload.
+        Returns a deferred that fires once the converted document has been added to the batch.
+        """
+        deferred = self._conversion_pool.submit(
+            html_content=html_content,
+            url=url,
+            canonicalization_rules=getattr(spider, "document_id_rules", ()),
+        )
+        deferred.addCallback(record_conversion_timings, spider=spider)
+        deferred.addCallback(self.add_doc_to_batch, url=url, spider=spider)
+        return deferred
+
+    def add_doc_to_batch(self, doc: dict[str, Any] | None, url: str, spider: Spider) -> Deferred:
+        """
+        Add a converted document to the batch, uploading the batch if it is full.  Documents whose
+        fingerprint matches the one stored when they were last uploaded to the same index are skipped, once the
+        index has been checked.  When the batch is uploaded, the returned deferred waits for an upload slot,
+        applying backpressure to the pipeline, otherwise it has already fired.
         """
-        doc = convert_html(html_content=html_content, url=url)
         if doc:
+            fingerprint = document_fingerprint(doc)
+            fingerprint_store = self._get_fingerprint_store()
+            if (
+                fingerprint_store
+                and self._index_checked
+                and fingerprint_store.is_unchanged(self._env_es_index_name, doc["_id"], fingerprint)
+            ):
+                stats.inc_value(spider, "elasticsearch/fingerprint/unchanged")
+                return defer.succeed(None)
+
+            stats.inc_value(spider, "elasticsearch/fingerprint/changed")
+            self._current_fingerprints[doc["_id"]] = fingerprint
             self._current_batch.append(doc)
+            self._current_batch_bytes += self._estimate_doc_bytes(doc)
 
-            if len(self._current_batch) >= self._batch_size:
-                self.batch_upload(spider)
+            if (
+                len(self._current_batch) >= self._batch_size
+                or self._current_batch_bytes >= self._env_es_batch_max_bytes
+            ):
+                return self.batch_upload(spider)
         else:
             spider.logger.warning(f"Did not create i14y document for URL: {url}")
+        return defer.succeed(None)
 
-    def batch_upload(self, spider: Spider):
+    def batch_upload(self, spider: Spider) -> Deferred:
         """
-        Initiates batch upload using asyncio.
+        Initiates batch upload in the reactor thread pool.  Returns a deferred that fires once the
+        upload has started, which waits while the maximum number of uploads are already in flight.
         """
         if not self._current_batch:
-            return
+            return defer.succeed(None)
 
         current_batch_copy = self._current_batch.copy()
+        current_fingerprints = self._current_fingerprints
         self._current_batch = []
+        self._current_batch_bytes = 0
+        self._current_fingerprints = {}
 
-        loop = asyncio.get_running_loop() if asyncio.get_event_loop().is_running() else asyncio.new_event_loop()
-        asyncio.ensure_future(self._batch_elasticsearch_upload(current_batch_copy, loop, spider))
+        deferred = self._upload_semaphore.acquire()
+        deferred.addCallback(self._start_upload, current_batch_copy, spider, current_fingerprints)
+        return deferred
 
-    def _parse_es_urls(self, url_string: str) -> list[dict[str, Any]]:
+    def _start_upload(self, _semaphore, docs: list[dict[Any, Any]], spider: Spider, fingerprints: dict[str, str]):
         """
-        Parse Elasticsearch hosts from a comma-separated string.
+        Run the bulk upload in a thread, releasing the upload slot when it finishes.  The stats of the upload
+        are recorded back on the reactor thread, the stats collector is not thread-safe.
         """
-        hosts = []
-        for url in url_string.split(","):
-            parsed = urlparse(url)
-            if not parsed.scheme or not parsed.hostname or not parsed.port:
-                raise ValueError(f"Invalid Elasticsearch URL: {url}")
+        upload = threads.deferToThread(self._bulk_upload, docs, spider, fingerprints)
+        self._uploads_in_flight.add(upload)
+        upload.addCallback(self._record_bulk_stats, spider)
+        upload.addErrback(lambda failure: spider.logger.error(f"Error in bulk upload: {failure.getErrorMessage()}"))
+        upload.addBoth(self._finish_upload, upload)
+
+    @staticmethod
+    def _record_bulk_stats(
+        result: tuple[dict[str, float], dict[str, tuple[float, float]]], spider: Spider
+    ) -> None:
+        """Add the counts and timings returned by a bulk upload thread to the spider stats"""
+        counts, timings = result
+        for key, count in counts.items():
+            stats.inc_value(spider, key, count)
+        timing.record_timings(spider, timings)
+
+        if elapsed := counts.get("elasticsearch/bulk/seconds"):
+            docs = counts.get("elasticsearch/bulk/docs_succeeded", 0) + counts.get("elasticsearch/bulk/docs_failed", 0)
+            stats.set_value(spider, "elasticsearch/bulk/last_batch_docs_per_second", round(docs / elapsed, 2))
 
-            hosts.append({"host": parsed.hostname, "port": parsed.port, "scheme": parsed.scheme})
-        return hosts
+    def _finish_upload(self, _result, upload: Deferred) -> None:
+        self._uploads_in_flight.discard(upload)
+        self._upload_semaphore.release()
 
-    def _get_client(self, spider: Spider):
+    def close(self, spider: Spider) -> Deferred:
         """
-        Lazily initializes the Elasticsearch client.
+        Wait for queued conversions, upload the final batch, wait for every outstanding upload,
+        shutdown the conversion pool and close the fingerprint store.
+        """
+        deferred = self._conversion_pool.drain()
+        deferred.addCallback(lambda _: self.batch_upload(spider))
+        deferred.addCallback(lambda _: defer.DeferredList(list(self._uploads_in_flight), consumeErrors=True))
+        deferred.addBoth(self._close_conversion_pool)
+        deferred.addBoth(self._close_fingerprint_store)
+        return deferred
+
+    def _close_conversion_pool(self, result: Any) -> Any:
+        if self._owns_conversion_pool:
+            self._conversion_pool.close()
+        return result
+
+    def _close_fingerprint_store(self, result: Any) -> Any:
+        if self._fingerprint_store:
+            self._fingerprint_store.close()
+            self._fingerprint_store = None
+        return result
+
+    def _get_fingerprint_store(self) -> FingerprintStore | None:
+        """
+        Lazily opens the fingerprint store.  Setting SPIDER_ES_FINGERPRINT_DB to an empty value disables it.
+        """
+        if not self._fingerprint_store and self._env_es_fingerprint_db:
+            self._fingerprint_store = FingerprintStore(Path(self._env_es_fingerprint_db))
+        return self._fingerprint_store
+
+    _parse_es_urls = staticmethod(parse_es_urls)
+
+    def _get_client(self, spider: Spider) -> Elasticsearch:
+        """
+        Lazily fetches the process-wide Elasticsearch client for this uploader's hosts and credentials.
         """
         if not self._es_client:
-            self._es_client = Elasticsearch(
-                hosts=self._parse_es_urls(self._env_es_hosts),
-                verify_certs=False,
-                ssl_show_warn=False,
-                basic_auth=(self._env_es_username, self._env_es_password),
+            self._es_client = get_es_client(
+                hosts=self._env_es_hosts, username=self._env_es_username, password=self._env_es_password
             )
             self._create_index_if_not_exists(spider)
         return self._es_client
 
     def _create_index_if_not_exists(self, spider: Spider):
         """
-        Creates an index in Elasticsearch if it does not exist.
+        Creates an index in Elasticsearch if it does not exist.  The check is shared by all uploaders
+        in the process so it is only made once.
         """
         index_name = self._env_es_index_name
         try:
-            es_client = self._get_client(spider)
-            if not es_client.indices.exists(index=index_name):
-                index_settings = {
-                    "settings": {"index": {"number_of_shards": 6, "number_of_replicas": 1}},
-                    "aliases": {self._env_es_index_alias: {}},
-                }
-                es_client.indices.create(index=index_name, body=index_settings)
+            if ensure_index(self._get_client(spider), index_name=index_name, index_alias=self._env_es_index_alias):
                 spider.logger.info(f"Index '{index_name}' created successfully.")
+                if fingerprint_store := self._get_fingerprint_store():
+                    fingerprint_store.clear(index_name)  # new index, nothing is indexed yet
             else:
                 spider.logger.info(f"Index '{index_name}' already exists.")
+            self._index_checked = True
         except Exception as e:
             spider.logger.error(f"Error creating/checking index: {str(e)}")
 
+    @staticmethod
+    def _estimate_doc_bytes(doc: dict[str, Any]) -> int:
+        """
+        Cheap estimate of the serialized size of a document in bytes, dominated by its text and list fields.
+        Text is measured utf-8 encoded, the way the serializer sends it.
+        """
+        doc_bytes = 0
+        for value in doc.values():
+            if isinstance(value, str):
+                doc_bytes += len(value.encode("utf-8"))
+            elif isinstance(value, (list, tuple)):
+                doc_bytes += sum(len(str(item).encode("utf-8")) for item in value)
+        return doc_bytes
+
     def _create_actions(self, docs: list[dict[Any, Any]]) -> list[dict[str, Any]]:
         """
         Create actions for bulk upload from documents.
         """
         return [{"_index": self._env_es_index_name, "_id": doc.pop("_id", None), "_source": doc} for doc in docs]
 
-    async def _batch_elasticsearch_upload(self, docs: list[dict[Any, Any]], loop, spider: Spider):
+    def _bulk_results(self, client: Elasticsearch, actions: list[dict[str, Any]]) -> Iterable[tuple[bool, dict]]:
+        """
+        Stream bulk results per action.  Uses parallel_bulk when more than one bulk thread is configured.
+        """
+        bulk_kwargs = {
+            "chunk_size": self._env_es_bulk_chunk_size,
+            "max_chunk_bytes": self._env_es_batch_max_bytes,
+            "raise_on_error": False,
+            "raise_on_exception": False,
+        }
+        if self._env_es_bulk_thread_count > 1:
+            return helpers.parallel_bulk(client, actions, thread_count=self._env_es_bulk_thread_count, **bulk_kwargs)
+        return helpers.streaming_bulk(client, actions, **bulk_kwargs)
+
+    def _retry_backoff(self, attempt: int) -> float:
         """
-        Perform bulk upload asynchronously using ThreadPoolExecutor.
+        Exponential backoff in seconds before a retry attempt.
         """
+        return retry_backoff(attempt, self._env_es_initial_backoff, self._env_es_max_backoff)
 
-        def _bulk_upload():
+    def _bulk_with_retries(
+        self, client: Elasticsearch, actions: list[dict[str, Any]], spider: Spider
+    ) -> tuple[list[str], list[dict[str, Any]], int]:
+        """
+        Upload actions, retrying documents that failed with a retryable status or a connection error
+        with exponential backoff.  Returns the ids uploaded, dead letter entries for documents that
+        could not be uploaded and the number of retries.
+        """
+        remaining = {action["_id"]: action for action in actions}
+        uploaded_ids, dead_letters, retries = [], [], 0
+
+        for attempt in range(self._env_es_max_retries + 1):
+            if attempt:
+                backoff = self._retry_backoff(attempt)
+                spider.logger.warning(
+                    f"Retrying {len(remaining)} Elasticsearch documents in {backoff} seconds, attempt {attempt}"
+                )
+                retries += 1
+                time.sleep(backoff)
+
+            retryable, last_errors = {}, {}
             try:
-                actions = self._create_actions(docs)
-                success, _ = helpers.bulk(self._get_client(spider), actions)
-                spider.logger.info("Loaded %s records to Elasticsearch!", success)
-            except Exception as e:
-                spider.logger.error(f"Error in bulk upload: {str(e)}")
+                for ok, result in self._bulk_results(client, list(remaining.values())):
+                    op_result = next(iter(result.values()), {})
+                    doc_id = op_result.get("_id")
+                    action = remaining.pop(doc_id, None)
+                    if ok:
+                        uploaded_ids.append(doc_id)
+                    elif op_result.get("status") in RETRY_STATUS_CODES and action:
+                        retryable[doc_id] = action
+                        last_errors[doc_id] = op_result
+                    else:
+                        spider.logger.error(f"Failed to load document {doc_id}: {op_result.get('error')}")
+                        dead_letters.append(dead_letter_entry(action or {"_id": doc_id}, op_result))
+            except RETRY_EXCEPTIONS as e:
+                spider.logger.warning(f"Connection error during bulk upload: {str(e)}")
+                for doc_id in remaining:
+                    last_errors[doc_id] = {"status": "N/A", "error": str(e)}
+                retryable.update(remaining)
+
+            remaining = retryable
+            if not remaining:
+                break
+
+        for doc_id, action in remaining.items():
+            spider.logger.error(f"Failed to load document {doc_id} after retries: {last_errors[doc_id].get('error')}")
+            dead_letters.append(dead_letter_entry(action, last_errors[doc_id]))
+
+        return uploaded_ids, dead_letters, retries
+
+    def _bulk_upload(
+        self, docs: list[dict[Any, Any]], spider: Spider, fingerprints: dict[str, str] | None = None
+    ) -> tuple[dict[str, float], dict[str, tuple[float, float]]]:
+        """
+        Upload documents, runs in a thread.  Documents that could not be uploaded are written to the dead
+        letter spool.  Fingerprints are only stored for documents that were uploaded successfully.  Returns
+        the per-document failures, throughput and timings of the upload for the spider stats.
+        """
+        batch_bytes = sum(self._estimate_doc_bytes(doc) for doc in docs)
+        actions = self._create_actions(docs)
+
+        timings: dict[str, tuple[float, float]] = {}
+        with timing.StageTimer(timings, "elasticsearch_bulk") as bulk_timer:
+            uploaded_ids, dead_letters, retries = self._bulk_with_retries(self._get_client(spider), actions, spider)
+        elapsed = bulk_timer.wall_seconds
+
+        if dead_letters:
+            self._dead_letter_spool.append(dead_letters)
+            spider.logger.error(
+                f"Wrote {len(dead_letters)} documents to dead letter file {self._dead_letter_spool.file_path}"
+            )
+
+        spider.logger.info("Loaded %s records to Elasticsearch in %.2f seconds!", len(uploaded_ids), elapsed)
+
+        if fingerprints and (fingerprint_store := self._get_fingerprint_store()):
+            fingerprint_store.update(
+                self._env_es_index_name,
+                {doc_id: fingerprints[doc_id] for doc_id in uploaded_ids if doc_id in fingerprints},
+            )
 
-        await loop.run_in_executor(self._executor, _bulk_upload)
+        counts = {
+            "elasticsearch/bulk/batches": 1,
+            "elasticsearch/bulk/docs_succeeded": len(uploaded_ids),
+            "elasticsearch/bulk/docs_failed": len(dead_letters),
+            "elasticsearch/bulk/bytes": batch_bytes,
+            "elasticsearch/bulk/seconds": elapsed,
+        }
+        if retries:
+            counts["elasticsearch/bulk/retries"] = retries
+        return counts, timings
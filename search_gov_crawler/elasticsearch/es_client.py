@@ -0,0 +1,101 @@
+import os
+import threading
+from typing import Any
+from urllib.parse import urlparse
+
+from elasticsearch import ConnectionError as EsConnectionError
+from elasticsearch import ConnectionTimeout, Elasticsearch
+
+from search_gov_crawler.elasticsearch.es_serializer import get_serializer
+
+# process-wide registry of clients keyed by hosts and credentials, along with the indices already checked
+_clients: dict[tuple[str, str, str], Elasticsearch] = {}
+_checked_indices: set[tuple[int, str]] = set()
+_lock = threading.Lock()
+
+# transport errors that are worth retrying
+RETRY_EXCEPTIONS = (EsConnectionError, ConnectionTimeout)
+
+
+def retry_backoff(attempt: int, initial_backoff: float, max_backoff: float) -> float:
+    """
+    Exponential backoff in seconds before a retry attempt.
+    """
+    return min(max_backoff, initial_backoff * 2 ** (attempt - 1))
+
+
+def parse_es_urls(url_string: str) -> list[dict[str, Any]]:
+    """
+    Parse Elasticsearch hosts from a comma-separated string.
+    """
+    hosts = []
+    for url in url_string.split(","):
+        parsed = urlparse(url)
+        if not parsed.scheme or not parsed.hostname or not parsed.port:
+            raise ValueError(f"Invalid Elasticsearch URL: {url}")
+
+        hosts.append({"host": parsed.hostname, "port": parsed.port, "scheme": parsed.scheme})
+    return hosts
+
+
+def get_es_client(hosts: str, username: str, password: str) -> Elasticsearch:
+    """
+    Return the shared client for the given hosts and credentials, creating it on first use.  All spiders
+    and uploaders in a process reuse the same connection pool.  Pool size and request compression are set
+    with SPIDER_ES_CONNECTIONS_PER_NODE and SPIDER_ES_HTTP_COMPRESS, the JSON serializer used for request
+    bodies with SPIDER_ES_SERIALIZER.
+    """
+    key = (hosts, username, password)
+    with _lock:
+        if key not in _clients:
+            _clients[key] = Elasticsearch(
+                hosts=parse_es_urls(hosts),
+                verify_certs=False,
+                ssl_show_warn=False,
+                basic_auth=(username, password),
+                connections_per_node=int(os.environ.get("SPIDER_ES_CONNECTIONS_PER_NODE", "10")),
+                http_compress=os.environ.get("SPIDER_ES_HTTP_COMPRESS", "true").lower() == "true",
+                serializer=get_serializer(os.environ.get("SPIDER_ES_SERIALIZER", "orjson")),
+            )
+        return _clients[key]
+
+
+def get_es_client_from_env() -> Elasticsearch:
+    """Return the shared client for the hosts and credentials in the environment"""
+    return get_es_client(
+        hosts=os.environ.get("ES_HOSTS", ""),
+        username=os.environ.get("ES_USER", ""),
+        password=os.environ.get("ES_PASSWORD", ""),
+    )
+
+
+def ensure_index(es_client: Elasticsearch, index_name: str, index_alias: str) -> bool:
+    """
+    Create the index with its alias if it does not exist.  The check is only made once per client and
+    index in a process.  Returns True if the index was created by this call.
+    """
+    key = (id(es_client), index_name)
+    with _lock:
+        if key in _checked_indices:
+            return False
+
+        created = False
+        if not es_client.indices.exists(index=index_name):
+            index_settings = {
+                "settings": {"index": {"number_of_shards": 6, "number_of_replicas": 1}},
+                "aliases": {index_alias: {}},
+            }
+            es_client.indices.create(index=index_name, body=index_settings)
+            created = True
+
+        _checked_indices.add(key)
+        return created
+
+
+def clear_clients() -> None:
+    """Close and forget all shared clients and index checks"""
+    with _lock:
+        for es_client in _clients.values():
+            es_client.close()
+        _clients.clear()
+        _checked_indices.clear()
@@ -0,0 +1,168 @@
+"""
+Append-only spool of i14y documents that could not be loaded to Elasticsearch, along with a command to replay
+them once Elasticsearch is available again.  Run from the repo root:
+- Replay every dead letter file in the default directory:
+  - Run `python -m search_gov_crawler.elasticsearch.es_dead_letter`
+- Replay specific files:
+  - Run `python -m search_gov_crawler.elasticsearch.es_dead_letter -f ./output/dead-letter/es-dead-letter-p1234.jsonl`
+
+Documents that fail again during replay are written to a new dead letter file and the replayed file is removed.
+Connection errors are retried with the same backoff as crawl uploads, set with SPIDER_ES_MAX_RETRIES,
+SPIDER_ES_INITIAL_BACKOFF and SPIDER_ES_MAX_BACKOFF.  A file that still can not be replayed is put back to be
+replayed later.
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any, Iterator
+
+from dotenv import load_dotenv
+from elasticsearch import Elasticsearch, helpers
+from pythonjsonlogger.json import JsonFormatter
+
+from search_gov_crawler.elasticsearch.es_client import RETRY_EXCEPTIONS, get_es_client_from_env, retry_backoff
+from search_gov_crawler.search_gov_spiders.extensions.json_logging import LOG_FMT
+
+DEFAULT_DEAD_LETTER_DIR = Path(__file__).parent.parent / "output" / "dead-letter"
+DEAD_LETTER_GLOB = "es-dead-letter-*.jsonl"
+
+log = logging.getLogger("search_gov_crawler.elasticsearch.es_dead_letter")
+
+
+def dead_letter_entry(action: dict[str, Any], op_result: dict[str, Any]) -> dict[str, Any]:
+    """Create a dead letter record from a bulk action and the result of its last attempt"""
+    return {
+        "_index": action.get("_index"),
+        "_id": action.get("_id"),
+        "_source": action.get("_source"),
+        "status": op_result.get("status"),
+        "error": str(op_result.get("error")),
+        "failed_at": datetime.now(tz=UTC).isoformat(),
+    }
+
+
+class DeadLetterSpool:
+    """Thread-safe, append-only jsonl file of documents that never made it to Elasticsearch"""
+
+    def __init__(self, directory: Path | None = None):
+        directory = directory or Path(os.environ.get("SPIDER_ES_DEAD_LETTER_DIR", str(DEFAULT_DEAD_LETTER_DIR)))
+        self.file_path = directory / f"es-dead-letter-p{os.getpid()}.jsonl"
+        self._lock = threading.Lock()
+
+    def append(self, entries: list[dict[str, Any]]) -> None:
+        """Append entries to the spool, the file is only opened while writing"""
+        if not entries:
+            return
+        with self._lock:
+            self.file_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.file_path.open("a", encoding="utf-8") as spool_file:
+                spool_file.writelines(f"{json.dumps(entry, default=str)}\n" for entry in entries)
+
+
+def read_dead_letters(file_path: Path) -> Iterator[dict[str, Any]]:
+    """Yield dead letter records from a spool file"""
+    with file_path.open(encoding="utf-8") as spool_file:
+        for line in spool_file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def replay_dead_letter_file(file_path: Path, es_client: Elasticsearch, spool: DeadLetterSpool) -> tuple[int, int]:
+    """
+    Upload the documents in a dead letter file.  The file is renamed before reading so that a running
+    crawl will start a new file instead of appending to the one being replayed.  Connection errors are
+    retried with backoff, if they persist the file is put back under a dead letter name and the error is
+    raised.  Returns counts of documents loaded and documents that failed again.
+    """
+    replay_path = file_path.with_suffix(".replaying")
+    file_path.rename(replay_path)
+
+    remaining = {
+        record["_id"]: {"_index": record["_index"], "_id": record["_id"], "_source": record["_source"]}
+        for record in read_dead_letters(replay_path)
+    }
+    max_retries = int(os.environ.get("SPIDER_ES_MAX_RETRIES", "3"))
+    initial_backoff = float(os.environ.get("SPIDER_ES_INITIAL_BACKOFF", "2"))
+    max_backoff = float(os.environ.get("SPIDER_ES_MAX_BACKOFF", "60"))
+
+    loaded, failures = 0, []
+    for attempt in range(max_retries + 1):
+        if attempt:
+            backoff = retry_backoff(attempt, initial_backoff, max_backoff)
+            log.warning("Retrying %s dead letter documents in %s seconds, attempt %s", len(remaining), backoff, attempt)
+            time.sleep(backoff)
+        try:
+            for ok, result in helpers.streaming_bulk(
+                es_client, list(remaining.values()), raise_on_error=False, raise_on_exception=False
+            ):
+                op_result = next(iter(result.values()), {})
+                action = remaining.pop(op_result.get("_id"), {})
+                if ok:
+                    loaded += 1
+                else:
+                    failures.append(dead_letter_entry(action, op_result))
+            break
+        except RETRY_EXCEPTIONS as e:
+            log.warning("Connection error replaying dead letter file %s: %s", file_path.name, str(e))
+            if attempt == max_retries:
+                _restore_dead_letter_file(replay_path, file_path)
+                raise
+
+    spool.append(failures)
+    replay_path.unlink()
+    log.info("Replayed dead letter file %s: loaded=%s failed=%s", file_path.name, loaded, len(failures))
+    return loaded, len(failures)
+
+
+def _restore_dead_letter_file(replay_path: Path, file_path: Path) -> None:
+    """
+    Put a file that could not be replayed back under a name matching DEAD_LETTER_GLOB.  Documents loaded before
+    the error are loaded again on the next replay, which only overwrites them with the same content.
+    """
+    if file_path.exists():  # a crawl in a process with the same pid started a new file
+        file_path = file_path.with_name(f"{file_path.stem}-{time.time_ns()}{file_path.suffix}")
+    replay_path.rename(file_path)
+    log.error("Could not replay dead letter file, kept it as %s", file_path.name)
+
+
+def replay_dead_letters(file_paths: list[Path], es_client: Elasticsearch) -> tuple[int, int]:
+    """
+    Replay a list of dead letter files, returns total counts of documents loaded and failed.  Files that
+    could not be replayed because of connection errors are kept and not counted.
+    """
+    spool = DeadLetterSpool()
+    total_loaded, total_failed = 0, 0
+    for file_path in file_paths:
+        try:
+            loaded, failed = replay_dead_letter_file(file_path=file_path, es_client=es_client, spool=spool)
+        except RETRY_EXCEPTIONS:
+            continue
+        total_loaded += loaded
+        total_failed += failed
+    return total_loaded, total_failed
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(level=os.environ.get("SCRAPY_LOG_LEVEL", "INFO"))
+    logging.getLogger().handlers[0].setFormatter(JsonFormatter(fmt=LOG_FMT))
+
+    parser = argparse.ArgumentParser(description="Replay documents from Elasticsearch dead letter files.")
+    parser.add_argument("-f", "--files", type=Path, nargs="+", help="Dead letter files to replay")
+    parser.add_argument(
+        "-d",
+        "--directory",
+        type=Path,
+        default=Path(os.environ.get("SPIDER_ES_DEAD_LETTER_DIR", str(DEFAULT_DEAD_LETTER_DIR))),
+        help="Directory to search for dead letter files when no files are given",
+    )
+    args = parser.parse_args()
+
+    input_files = args.files or sorted(args.directory.glob(DEAD_LETTER_GLOB))
+    replay_dead_letters(file_paths=input_files, es_client=get_es_client_from_env())
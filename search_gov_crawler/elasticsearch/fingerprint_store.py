@@ -0,0 +1,70 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any
+
+# fields that change on every conversion and should not affect a document fingerprint
+VOLATILE_FIELDS = frozenset(["_id", "created_at", "updated_at"])
+
+
+def document_fingerprint(doc: dict[str, Any]) -> str:
+    """Generates a SHA-256 hash of the sanitized content of an i14y document."""
+    stable_doc = {key: value for key, value in doc.items() if key not in VOLATILE_FIELDS}
+    serialized = json.dumps(stable_doc, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class FingerprintStore:
+    """
+    Persistent SQLite store of document fingerprints keyed by index name and i14y document _id.  Used to
+    skip re-indexing documents that have not changed since they were last uploaded to the same index, so
+    switching SPIDER_ES_INDEX_NAME indexes every document again.  Safe to share between threads and between
+    crawl processes using the same file.
+    """
+
+    def __init__(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS index_fingerprints (
+                    index_name TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    PRIMARY KEY (index_name, id)
+                )
+                """
+            )
+
+    def is_unchanged(self, index_name: str, doc_id: str, fingerprint: str) -> bool:
+        """Returns True if the stored fingerprint for doc_id in index_name matches fingerprint"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint FROM index_fingerprints WHERE index_name = ? AND id = ?", (index_name, doc_id)
+            ).fetchone()
+        return row is not None and row[0] == fingerprint
+
+    def update(self, index_name: str, fingerprints: dict[str, str]) -> None:
+        """Insert or replace fingerprints for documents successfully indexed in index_name"""
+        if not fingerprints:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO index_fingerprints (index_name, id, fingerprint) VALUES (?, ?, ?)",
+                ((index_name, doc_id, fingerprint) for doc_id, fingerprint in fingerprints.items()),
+            )
+
+    def clear(self, index_name: str) -> None:
+        """Remove all fingerprints of an index, used when the index is recreated"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM index_fingerprints WHERE index_name = ?", (index_name,))
+
+    def close(self) -> None:
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,250 @@
+"""
+Offline export of i14y documents so crawling and indexing can run at different times.  The `jsonl` output target
+converts pages like the `elasticsearch` target, but writes the documents to rotated, compressed jsonl files instead
+of uploading them.  The finished files can then be bulk loaded with parallel workers, e.g. during the maintenance
+window that scheduled crawls avoid.  Run from the repo root:
+- Load every finished export file in the default directory:
+  - Run `python -m search_gov_crawler.elasticsearch.jsonl_export`
+- Load specific files with 8 workers:
+  - Run `python -m search_gov_crawler.elasticsearch.jsonl_export -w 8 -f ./output/jsonl-export/<file>.jsonl.gz`
+
+Loaded files are moved to a `loaded` subdirectory so they are not loaded twice.  Documents that fail to load are
+written to the Elasticsearch dead letter spool.  A file that could not be read or loaded to the end, e.g. because
+of a connection error, is left in place to be loaded again by a later run while the other files are still loaded.
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from dotenv import load_dotenv
+from elasticsearch import Elasticsearch, helpers
+from pythonjsonlogger.json import JsonFormatter
+from scrapy.spiders import Spider
+from twisted.internet.defer import Deferred
+
+from search_gov_crawler.elasticsearch.conversion_pool import ConversionPool, record_conversion_timings
+from search_gov_crawler.elasticsearch.convert_html_i14y import convert_html
+from search_gov_crawler.elasticsearch.es_client import ensure_index, get_es_client_from_env
+from search_gov_crawler.elasticsearch.es_dead_letter import DeadLetterSpool, dead_letter_entry
+from search_gov_crawler.search_gov_spiders.extensions.json_logging import LOG_FMT
+from search_gov_crawler.search_gov_spiders.helpers import stats, timing
+from search_gov_crawler.search_gov_spiders.helpers.csv_writer import RotatingCsvWriter, zstandard
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+DEFAULT_EXPORT_DIR = Path(__file__).parent.parent / "output" / "jsonl-export"
+EXPORT_BASE_NAME = "i14y-documents"
+EXPORT_GLOB = f"{EXPORT_BASE_NAME}-p*-[0-9]*.jsonl*"  # only finished, numbered files
+
+log = logging.getLogger("search_gov_crawler.elasticsearch.jsonl_export")
+
+
+def dumps_line(doc: dict[str, Any]) -> bytes:
+    """Serialize a document as a single jsonl line"""
+    if orjson is not None:
+        return orjson.dumps(doc, default=str, option=orjson.OPT_APPEND_NEWLINE)
+    return f"{json.dumps(doc, default=str)}\n".encode("utf-8")
+
+
+class RotatingJsonlWriter(RotatingCsvWriter):
+    """
+    Writes documents as jsonl through the same buffered, rotating and optionally compressed files as the csv
+    output.  The manifest counts documents instead of urls.
+    """
+
+    EXTENSION = "jsonl"
+    RECORD_NAME = "docs"
+
+    def write_docs(self, docs: Iterable[dict[str, Any]]) -> None:
+        """Write one document per line, rotating between documents when the current file is full"""
+        self.write_lines(dumps_line(doc) for doc in docs)
+
+
+class SearchGovJsonlExport:
+    """
+    Converts documents in the conversion pool and writes them to rotated jsonl files for a later bulk load.
+    Conversion results are handled on the reactor thread, so files are only written from one thread.  A conversion
+    pool shared with the `elasticsearch` output is drained but not shutdown when the export is closed.
+    """
+
+    def __init__(self, conversion_pool: ConversionPool | None = None):
+        self._env_export_dir = Path(os.environ.get("SPIDER_JSONL_EXPORT_DIR", str(DEFAULT_EXPORT_DIR)))
+        self._env_export_max_bytes = int(os.environ.get("SPIDER_JSONL_EXPORT_MAX_BYTES", str(100 * 1024 * 1024)))
+        self._env_export_compression = os.environ.get("SPIDER_JSONL_EXPORT_COMPRESSION", "gzip")
+        self._writer = RotatingJsonlWriter(
+            output_dir=self._env_export_dir,
+            base_name=f"{EXPORT_BASE_NAME}-p{os.getpid()}",
+            max_bytes=self._env_export_max_bytes,
+            compression=self._env_export_compression,
+        )
+        self._owns_conversion_pool = conversion_pool is None
+        self._conversion_pool = conversion_pool or ConversionPool.from_env(convert_html, timing_stage="convert_html")
+
+    def add_to_export(self, html_content: str, url: str, spider: Spider) -> Deferred:
+        """
+        Convert a document in the conversion pool and write it to the export file.  Returns a deferred that
+        fires once the document has been written.
+        """
+        deferred = self._conversion_pool.submit(
+            html_content=html_content,
+            url=url,
+            canonicalization_rules=getattr(spider, "document_id_rules", ()),
+        )
+        deferred.addCallback(record_conversion_timings, spider=spider)
+        deferred.addCallback(self.write_doc, url=url, spider=spider)
+        return deferred
+
+    def write_doc(self, doc: dict[str, Any] | None, url: str, spider: Spider) -> None:
+        """Write a converted document to the export file"""
+        if not doc:
+            spider.logger.warning(f"Did not create i14y document for URL: {url}")
+            return
+
+        with timing.timed(spider, "jsonl_write"):
+            self._writer.write_docs([doc])
+        stats.inc_value(spider, "jsonl_export/docs")
+
+    def close(self, spider: Spider) -> Deferred:
+        """Wait for queued conversions, finish the last file and shutdown the conversion pool"""
+        deferred = self._conversion_pool.drain()
+        deferred.addCallback(lambda _: self._close_writer(spider))
+        deferred.addBoth(self._close_conversion_pool)
+        return deferred
+
+    def _close_writer(self, spider: Spider) -> None:
+        if manifest_path := self._writer.close():
+            spider.logger.info(f"Wrote {len(self._writer.files)} jsonl export files, manifest: {manifest_path}")
+
+    def _close_conversion_pool(self, result: Any) -> Any:
+        if self._owns_conversion_pool:
+            self._conversion_pool.close()
+        return result
+
+
+def read_jsonl_docs(file_path: Path) -> Iterator[dict[str, Any]]:
+    """Yield documents from an export file, decompressing by file suffix"""
+    if file_path.suffix == ".gz":
+        export_file = gzip.open(file_path, "rt", encoding="utf-8")
+    elif file_path.suffix == ".zst":
+        export_file = zstandard.open(file_path, "rt", encoding="utf-8")
+    else:
+        export_file = file_path.open(encoding="utf-8")
+
+    with export_file:
+        for line in export_file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def load_jsonl_file(
+    file_path: Path, es_client: Elasticsearch, index_name: str, spool: DeadLetterSpool, chunk_size: int = 500
+) -> tuple[int, int]:
+    """
+    Bulk load the documents in an export file and move the file to the `loaded` subdirectory.  Only the
+    actions of the chunk being loaded are kept in memory.  Returns counts of documents loaded and failed.
+    """
+    pending: dict[str, dict[str, Any]] = {}
+
+    def _actions() -> Iterator[dict[str, Any]]:
+        for doc in read_jsonl_docs(file_path):
+            action = {"_index": index_name, "_id": doc.pop("_id", None), "_source": doc}
+            pending[action["_id"]] = action
+            yield action
+
+    loaded, failures = 0, []
+    for ok, result in helpers.streaming_bulk(
+        es_client, _actions(), chunk_size=chunk_size, raise_on_error=False, raise_on_exception=False
+    ):
+        op_result = next(iter(result.values()), {})
+        action = pending.pop(op_result.get("_id"), None)
+        if ok:
+            loaded += 1
+        else:
+            failures.append(dead_letter_entry(action or {"_id": op_result.get("_id")}, op_result))
+
+    spool.append(failures)
+    loaded_dir = file_path.parent / "loaded"
+    loaded_dir.mkdir(exist_ok=True)
+    file_path.rename(loaded_dir / file_path.name)
+    log.info("Loaded jsonl export file %s: loaded=%s failed=%s", file_path.name, loaded, len(failures))
+    return loaded, len(failures)
+
+
+def _load_jsonl_file_or_keep(
+    file_path: Path, es_client: Elasticsearch, index_name: str, spool: DeadLetterSpool, chunk_size: int
+) -> tuple[int, int]:
+    """
+    Load an export file, leaving it in place when it can not be loaded to the end.  The whole file is loaded
+    again by the next run, so document failures seen before the error are not written to the spool.
+    """
+    try:
+        return load_jsonl_file(file_path, es_client, index_name, spool, chunk_size)
+    except Exception as e:
+        log.error("Could not load jsonl export file %s, left it to be loaded again: %s", file_path.name, str(e))
+        return 0, 0
+
+
+def load_jsonl_files(
+    file_paths: list[Path], es_client: Elasticsearch, index_name: str, workers: int = 4, chunk_size: int = 500
+) -> tuple[int, int]:
+    """
+    Load export files with a pool of worker threads, returns total counts of documents loaded and failed.
+    Files that could not be loaded are left in place and not counted.
+    """
+    spool = DeadLetterSpool()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = list(
+            executor.map(
+                lambda file_path: _load_jsonl_file_or_keep(file_path, es_client, index_name, spool, chunk_size),
+                file_paths,
+            )
+        )
+    return sum(loaded for loaded, _ in results), sum(failed for _, failed in results)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(level=os.environ.get("SCRAPY_LOG_LEVEL", "INFO"))
+    logging.getLogger().handlers[0].setFormatter(JsonFormatter(fmt=LOG_FMT))
+
+    parser = argparse.ArgumentParser(description="Bulk load jsonl export files into Elasticsearch.")
+    parser.add_argument("-f", "--files", type=Path, nargs="+", help="Export files to load")
+    parser.add_argument(
+        "-d",
+        "--directory",
+        type=Path,
+        default=Path(os.environ.get("SPIDER_JSONL_EXPORT_DIR", str(DEFAULT_EXPORT_DIR))),
+        help="Directory to search for finished export files when no files are given",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=int(os.environ.get("SPIDER_JSONL_LOAD_WORKERS", "4")),
+        help="Number of files to load in parallel",
+    )
+    parser.add_argument("-c", "--chunk_size", type=int, default=500, help="Number of documents per bulk request")
+    args = parser.parse_args()
+
+    es_index_name = os.environ.get("SPIDER_ES_INDEX_NAME", "")
+    client = get_es_client_from_env()
+    ensure_index(client, index_name=es_index_name, index_alias=os.environ.get("SPIDER_ES_INDEX_ALIAS", ""))
+
+    input_files = args.files or sorted(args.directory.glob(EXPORT_GLOB))
+    total_loaded, total_failed = load_jsonl_files(
+        file_paths=input_files,
+        es_client=client,
+        index_name=es_index_name,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+    )
+    log.info("Loaded %s jsonl export files: loaded=%s failed=%s", len(input_files), total_loaded, total_failed)
@@ -37,15 +37,33 @@ CRAWL_SITES_FILE = (
 
 
 def run_scrapy_crawl(
-    spider: str, allow_query_string: bool, allowed_domains: str, start_urls: str, output_target: str
+    spider: str,
+    allow_query_string: bool,
+    allowed_domains: str,
+    start_urls: str,
+    output_target: str,
+    canonicalization_rules: str | None = None,
+    job_id: str | None = None,
 ) -> None:
-    """Runs `scrapy crawl` command as a subprocess given the allowed arguments"""
+    """
+    Runs `scrapy crawl` command as a subprocess given the allowed arguments.  Passing a job_id keeps url
+    state for that job between runs so later crawls only process changed pages.
+    """
 
     scrapy_env = os.environ.copy()
     scrapy_env["PYTHONPATH"] = str(Path(__file__).parent.parent)
 
+    crawl_command = (
+        f"scrapy crawl {spider} -a allow_query_string={allow_query_string} -a allowed_domains={allowed_domains} "
+        f"-a start_urls={start_urls} -a output_target={output_target}"
+    )
+    if canonicalization_rules is not None:
+        crawl_command += f" -a canonicalization_rules='{canonicalization_rules}'"
+    if job_id is not None:
+        crawl_command += f" -a job_id={job_id}"
+
     subprocess.run(
-        f"scrapy crawl {spider} -a allow_query_string={allow_query_string} -a allowed_domains={allowed_domains} -a start_urls={start_urls} -a output_target={output_target}",
+        crawl_command,
         check=True,
         cwd=Path(__file__).parent,
         env=scrapy_env,
@@ -69,10 +87,11 @@ def transform_crawl_sites(crawl_sites: CrawlSites) -> list[dict]:
 
     for crawl_site in crawl_sites.scheduled():
         job_name = crawl_site.name
+        job_id = job_name.lower().replace(" ", "-").replace("---", "-")
         transformed_crawl_sites.append(
             {
                 "func": run_scrapy_crawl,
-                "id": job_name.lower().replace(" ", "-").replace("---", "-"),
+                "id": job_id,
                 "name": job_name,
                 "trigger": CronTrigger.from_crontab(expr=crawl_site.schedule, timezone="UTC"),
                 "args": [
@@ -81,6 +100,8 @@ def transform_crawl_sites(crawl_sites: CrawlSites) -> list[dict]:
                     crawl_site.allowed_domains,
                     crawl_site.starting_urls,
                     crawl_site.output_target,
+                    crawl_site.canonicalization_rules,
+                    job_id,
                 ],
             },
         )
@@ -0,0 +1,62 @@
+from scrapy.crawler import Crawler
+from scrapy.dupefilters import RFPDupeFilter
+from scrapy.http import Request
+from scrapy.utils.job import job_dir
+
+from search_gov_crawler.search_gov_spiders.helpers.url_canonicalization import (
+    DEFAULT_CANONICALIZATION_RULES,
+    canonicalize_url,
+)
+from search_gov_crawler.search_gov_spiders.helpers.url_dedup import FingerprintArray
+
+
+class SearchGovDupeFilter(RFPDupeFilter):
+    """
+    Request dupefilter that compares GET requests by their canonical url, using the same canonicalization
+    rules as the dedup pipeline and Elasticsearch document ids.  Other requests fall back to the scrapy
+    request fingerprint.  Seen requests are kept as 64-bit fingerprints instead of a set of hex strings.
+    """
+
+    def __init__(self, path: str | None = None, debug: bool = False, *, fingerprinter=None):
+        super().__init__(path, debug, fingerprinter=fingerprinter)
+        self.crawler: Crawler | None = None
+        self.fingerprints_seen = FingerprintArray()
+
+        # fingerprints loaded from a job directory are moved to the compact store
+        for fingerprint in self.fingerprints:
+            self.fingerprints_seen.add(fingerprint)
+        self.fingerprints.clear()
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        dupefilter = cls(
+            job_dir(crawler.settings),
+            crawler.settings.getbool("DUPEFILTER_DEBUG"),
+            fingerprinter=crawler.request_fingerprinter,
+        )
+        dupefilter.crawler = crawler
+        return dupefilter
+
+    def _canonicalization_rules(self) -> tuple[str, ...]:
+        spider = getattr(self.crawler, "spider", None)
+        return getattr(spider, "canonicalization_rules", DEFAULT_CANONICALIZATION_RULES)
+
+    def request_fingerprint(self, request: Request) -> str:
+        if request.method == "GET" and not request.body:
+            return canonicalize_url(request.url, self._canonicalization_rules())
+        return super().request_fingerprint(request)
+
+    def request_seen(self, request: Request) -> bool:
+        fingerprint = self.request_fingerprint(request)
+        if not self.fingerprints_seen.add(fingerprint):
+            return True
+
+        if self.file:
+            self.file.write(f"{fingerprint}\n")
+        return False
+
+    def close(self, reason: str) -> None:
+        if stats := getattr(self.crawler, "stats", None):
+            stats.set_value("dupefilter/fingerprints", len(self.fingerprints_seen))
+            stats.set_value("dupefilter/memory_bytes", self.fingerprints_seen.memory_bytes)
+        super().close(reason)
@@ -0,0 +1,70 @@
+from typing import Self
+
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured, StopDownload
+from scrapy.http import Headers, Request
+from scrapy.http.request import NO_CALLBACK
+from scrapy.signals import headers_received
+from scrapy.spiders import Spider
+
+from search_gov_crawler.search_gov_spiders.helpers import stats
+from search_gov_crawler.search_gov_spiders.helpers.domain_spider import (
+    DOWNLOAD_OUTPUT_TARGETS_META,
+    get_output_targets,
+    is_body_needed,
+)
+
+
+class DownloadFilter:
+    """
+    Scrapy extension that stops downloading a response body once its headers show the body is not needed
+    by the output targets of the spider.  The body is skipped when no output target accepts the content type,
+    or when it is neither parsed for links nor output as content by the targets left, e.g. a pdf on a csv crawl
+    or a pdf over the size cap of every target.  The output targets left for the response are stored in its
+    request meta so the spider only outputs it to those targets.  An html page over the size cap of every
+    target is still downloaded for its links, but is not output to any target.
+    """
+
+    def __init__(self, max_bytes: dict[str, int]):
+        self.max_bytes = {output_target: int(cap) for output_target, cap in max_bytes.items() if int(cap) > 0}
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> Self:
+        """
+        Required extension method that checks for configuration and connects extension methods to signals
+        """
+        if not crawler.settings.getbool("DOWNLOAD_FILTER_ENABLED"):
+            raise NotConfigured("DownloadFilter Extension is listed in Extension but is not enabled.")
+
+        ext = cls(max_bytes=crawler.settings.getdict("OUTPUT_TARGET_MAX_BYTES"))
+        crawler.signals.connect(ext.headers_received, signal=headers_received)
+        return ext
+
+    def headers_received(self, headers: Headers, body_length: int, request: Request, spider: Spider) -> None:
+        """Stop the download, keeping the headers, when the response body is not needed"""
+        output_targets = getattr(spider, "output_targets", None)
+        content_type = headers.get("Content-Type")
+
+        # robots.txt and other requests not handled by the spider are always downloaded
+        if not output_targets or not content_type or request.callback is NO_CALLBACK:
+            return
+
+        accepted_output_targets = get_output_targets(content_type, output_targets)
+        download_output_targets = tuple(
+            output_target
+            for output_target in accepted_output_targets
+            if not 0 < self.max_bytes.get(output_target, 0) < body_length
+        )
+        request.meta[DOWNLOAD_OUTPUT_TARGETS_META] = download_output_targets
+
+        if not accepted_output_targets:
+            reason = "content_type"
+        elif is_body_needed(content_type, download_output_targets):
+            return
+        elif not download_output_targets:
+            reason = "max_bytes"
+        else:
+            reason = "body_not_needed"
+
+        stats.inc_value(spider, f"download_filter/stopped/{reason}")
+        raise StopDownload(fail=False)
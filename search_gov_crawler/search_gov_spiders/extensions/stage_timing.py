@@ -0,0 +1,69 @@
+import time
+from typing import Self
+
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+from scrapy.signals import spider_closed, spider_opened
+from scrapy.spiders import Spider
+from scrapy.statscollectors import StatsCollector
+from twisted.internet import task
+
+from search_gov_crawler.search_gov_spiders.helpers.timing import timing_snapshot
+
+
+class StageTiming:
+    """
+    Scrapy extension that periodically logs a snapshot of the per stage timing stats, with the calls per
+    second of each stage since the previous snapshot.  With json logging enabled the snapshot is logged as
+    the `stage_timings` field of the log record.
+    """
+
+    def __init__(self, stats: StatsCollector, interval: float):
+        self.stats = stats
+        self.interval = interval
+        self.task: task.LoopingCall | None = None
+        self._last_counts: dict[str, float] = {}
+        self._last_time = 0.0
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> Self:
+        """
+        Required extension method that checks for configuration and connects extension methods to signals
+        """
+        interval = crawler.settings.getfloat("STAGE_TIMING_LOG_INTERVAL")
+        if not interval:
+            raise NotConfigured("StageTiming Extension is listed in Extension but is not enabled.")
+
+        ext = cls(stats=crawler.stats, interval=interval)
+        crawler.signals.connect(ext.spider_opened, signal=spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=spider_closed)
+        return ext
+
+    def spider_opened(self, spider: Spider) -> None:
+        """Start logging snapshots every interval"""
+        self._last_time = time.monotonic()
+        self.task = task.LoopingCall(self.log_snapshot, spider)
+        self.task.start(self.interval, now=False)
+
+    def spider_closed(self, spider: Spider) -> None:
+        """Stop the periodic snapshots and log a final one"""
+        if self.task and self.task.running:
+            self.task.stop()
+        self.log_snapshot(spider)
+
+    def log_snapshot(self, spider: Spider) -> dict[str, dict[str, float]]:
+        """Log the current timing stats of every stage"""
+        snapshot = timing_snapshot(self.stats.get_stats())
+        now = time.monotonic()
+        elapsed = now - self._last_time
+
+        for stage, stage_timing in snapshot.items():
+            count = stage_timing.get("count", 0)
+            if elapsed > 0:
+                stage_timing["per_second"] = round((count - self._last_counts.get(stage, 0)) / elapsed, 2)
+            self._last_counts[stage] = count
+        self._last_time = now
+
+        if snapshot:
+            spider.logger.info("Stage timings for spider %s", spider.name, extra={"stage_timings": snapshot})
+        return snapshot
@@ -0,0 +1,119 @@
+"""
+On-disk state kept between runs of the same crawl site so later runs can be incremental.  Each crawl site gets
+its own SQLite file, named after the scheduler job id, holding one row per canonical url with the time it was
+last seen, the validators needed for conditional requests, a hash of the content and the links followed from
+it.  The links are needed because a 304 response has no body to extract them from.
+"""
+
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS url_state (
+    url TEXT PRIMARY KEY,
+    last_seen REAL NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT,
+    outlinks TEXT
+)
+"""
+
+
+class UrlState(NamedTuple):
+    """State of a single url from a previous run"""
+
+    last_seen: float
+    etag: str | None
+    last_modified: str | None
+    content_hash: str | None
+    outlinks: list[tuple[int, str, str]]
+
+
+class CrawlStateStore:
+    """
+    SQLite backed store of url state for a single crawl site.  Writes are committed every `commit_every`
+    changes and on close, so an interrupted crawl loses at most that many updates.
+    """
+
+    def __init__(self, path: Path, commit_every: int = 1000):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.commit_every = commit_every
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(SCHEMA)
+        self._pending_changes = 0
+
+    @classmethod
+    def for_job(cls, state_dir: Path, job_id: str) -> "CrawlStateStore":
+        """Open the store for a scheduler job id"""
+        return cls(state_dir / f"{job_id}.sqlite3")
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM url_state").fetchone()[0]
+
+    def get(self, url: str) -> UrlState | None:
+        """Return the stored state for a url, if any"""
+        row = self._connection.execute(
+            "SELECT last_seen, etag, last_modified, content_hash, outlinks FROM url_state WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        last_seen, etag, last_modified, content_hash, outlinks = row
+        return UrlState(
+            last_seen=last_seen,
+            etag=etag,
+            last_modified=last_modified,
+            content_hash=content_hash,
+            outlinks=[tuple(outlink) for outlink in json.loads(outlinks)] if outlinks else [],
+        )
+
+    def record_response(self, url: str, etag: str | None, last_modified: str | None, content_hash: str) -> None:
+        """Store validators and content hash of a downloaded url, keeping any stored outlinks"""
+        self._execute(
+            """
+            INSERT INTO url_state (url, last_seen, etag, last_modified, content_hash) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                last_seen = excluded.last_seen,
+                etag = excluded.etag,
+                last_modified = excluded.last_modified,
+                content_hash = excluded.content_hash
+            """,
+            (url, time.time(), etag, last_modified, content_hash),
+        )
+
+    def record_outlinks(self, url: str, outlinks: list[tuple[int, str, str]]) -> None:
+        """Store the (rule index, url, link text) of each link followed from a url"""
+        self._execute(
+            """
+            INSERT INTO url_state (url, last_seen, outlinks) VALUES (?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET outlinks = excluded.outlinks
+            """,
+            (url, time.time(), json.dumps(outlinks)),
+        )
+
+    def touch(self, url: str) -> None:
+        """Update the last seen time of an unchanged url"""
+        self._execute("UPDATE url_state SET last_seen = ? WHERE url = ?", (time.time(), url))
+
+    def _execute(self, sql: str, parameters: tuple) -> None:
+        self._connection.execute(sql, parameters)
+        self._pending_changes += 1
+        if self._pending_changes >= self.commit_every:
+            self.commit()
+
+    def commit(self) -> None:
+        """Commit pending changes"""
+        self._connection.commit()
+        self._pending_changes = 0
+
+    def close(self) -> None:
+        """Commit pending changes and close the database"""
+        self.commit()
+        self._connection.close()
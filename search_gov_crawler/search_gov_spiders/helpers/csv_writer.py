@@ -0,0 +1,118 @@
+import gzip
+import json
+import os
+from pathlib import Path
+from typing import BinaryIO, Iterable
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+COMPRESSION_SUFFIXES = {"": "", "gzip": ".gz", "zstd": ".zst"}
+
+
+class RotatingCsvWriter:
+    """
+    Writes urls to csv files through a large buffer, rotating to a new file before one would grow past
+    `max_bytes` of uncompressed output.  Sizes and counts are tracked in memory so no flush or stat is needed
+    to decide when to rotate.  Files can optionally be gzip or zstd compressed.
+
+    The file being written is named `<base_name>.csv[.gz|.zst]` and each finished file is atomically renamed
+    to `<base_name>-N.csv[.gz|.zst]`, so any file with a number is complete.  Closing the writer finishes
+    the last file and writes `<base_name>-manifest.json` listing every finished file and its url count.
+    Subclasses can write other line based formats by changing `EXTENSION` and `RECORD_NAME`.
+    """
+
+    EXTENSION = "csv"
+    RECORD_NAME = "urls"
+
+    def __init__(
+        self,
+        output_dir: Path,
+        base_name: str,
+        max_bytes: int,
+        compression: str = "",
+        buffer_size: int = 1024 * 1024,
+    ):
+        if compression not in COMPRESSION_SUFFIXES:
+            msg = f"Invalid {self.EXTENSION} compression: {compression}, must be one of {list(COMPRESSION_SUFFIXES)}"
+            raise ValueError(msg)
+        if compression == "zstd" and zstandard is None:
+            raise ValueError(f"{self.EXTENSION.capitalize()} compression zstd requires the zstandard package")
+
+        self.output_dir = output_dir
+        self.base_name = base_name
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.buffer_size = buffer_size
+        self.suffix = f".{self.EXTENSION}{COMPRESSION_SUFFIXES[compression]}"
+        self.file_path = output_dir / f"{base_name}{self.suffix}"
+        self.file_number = 1
+        self.files: list[dict] = []
+
+        self._raw_file: BinaryIO | None = None
+        self._stream: BinaryIO | None = None
+        self._file_bytes = 0
+        self._file_records = 0
+
+    def _open(self) -> BinaryIO:
+        """Open the current file, wrapping the buffered file in a compressor if needed"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._raw_file = open(self.file_path, "wb", buffering=self.buffer_size)  # pylint: disable=consider-using-with
+        if self.compression == "gzip":
+            self._stream = gzip.GzipFile(fileobj=self._raw_file, mode="wb")
+        elif self.compression == "zstd":
+            self._stream = zstandard.ZstdCompressor().stream_writer(self._raw_file, closefd=False)
+        else:
+            self._stream = self._raw_file
+        return self._stream
+
+    def write_urls(self, urls: Iterable[str]) -> None:
+        """Write one url per line, rotating between lines when the current file is full"""
+        self.write_lines(f"{url}\n".encode("utf-8") for url in urls)
+
+    def write_lines(self, lines: Iterable[bytes]) -> None:
+        """Write encoded lines, each counted as one record, rotating between lines when the current file is full"""
+        stream = self._stream or self._open()
+        for line in lines:
+            if self._file_records and self._file_bytes + len(line) > self.max_bytes:
+                self.rotate()
+                stream = self._open()
+            stream.write(line)
+            self._file_bytes += len(line)
+            self._file_records += 1
+
+    def rotate(self) -> None:
+        """Finish the current file and atomically rename it to the next numbered file name"""
+        if self._stream is None:
+            return
+
+        self._stream.close()
+        if not self._raw_file.closed:
+            self._raw_file.close()
+
+        rotated_file = self.output_dir / f"{self.base_name}-{self.file_number}{self.suffix}"
+        os.replace(self.file_path, rotated_file)
+        self.files.append({"file": rotated_file.name, self.RECORD_NAME: self._file_records, "bytes": self._file_bytes})
+
+        self.file_number += 1
+        self._raw_file, self._stream = None, None
+        self._file_bytes, self._file_records = 0, 0
+
+    def close(self) -> Path | None:
+        """Finish the last file and write the manifest, returns the manifest path if any file was written"""
+        self.rotate()
+        if not self.files:
+            return None
+
+        manifest = {
+            "files": self.files,
+            f"total_{self.RECORD_NAME}": sum(entry[self.RECORD_NAME] for entry in self.files),
+            "compression": self.compression or None,
+        }
+        manifest_path = self.output_dir / f"{self.base_name}-manifest.json"
+        temp_path = manifest_path.with_suffix(".json.tmp")
+        temp_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        os.replace(temp_path, manifest_path)
+        return manifest_path
@@ -0,0 +1,20 @@
+from functools import lru_cache
+from urllib.parse import urlparse
+
+import tldextract
+
+# Only use the public suffix list snapshot bundled with tldextract, never fetch the list over the network
+offline_tldextract = tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None)
+
+
+@lru_cache(maxsize=4096)
+def domain_from_netloc(netloc: str) -> str:
+    """Extracts the domain from a network location, removing www.  Cached since hosts repeat across a crawl."""
+    extracted = offline_tldextract(netloc)
+    return f"{extracted.subdomain}.{extracted.domain}.{extracted.suffix}".lstrip(".").replace("www.", "")
+
+
+def get_domain_name(url: str) -> str:
+    """Extracts the domain from a URL, removing www and ensuring consistency."""
+    parsed = urlparse(url if url.startswith(("http://", "https://")) else f"https://{url}")
+    return domain_from_netloc(parsed.netloc)
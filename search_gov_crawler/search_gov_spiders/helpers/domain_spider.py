@@ -1,10 +1,13 @@
 import json
-import re
 import os
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Optional
 
-from scrapy.linkextractors import LinkExtractor
+from scrapy.http import Response
+
+from search_gov_crawler.search_gov_spiders.helpers.link_extractor import SearchGovLinkExtractor
+from search_gov_crawler.search_gov_spiders.helpers.output_targets import CONTENT_OUTPUT_TARGETS
 
 # fmt: off
 FILTER_EXTENSIONS = [
@@ -46,16 +49,30 @@ ALLOWED_CONTENT_TYPE_OUTPUT_MAP = {
     "csv": ALLOWED_CONTENT_TYPE,
     "endpoint": ALLOWED_CONTENT_TYPE,
     "elasticsearch": ES_ALLOWED_CONTENT_TYPE,
+    "jsonl": ES_ALLOWED_CONTENT_TYPE,
+}
+
+# media types allowed by each output target, built once for set lookups
+ALLOWED_MEDIA_TYPE_OUTPUT_MAP = {
+    output_target: frozenset(content_type.lower() for content_type in content_types)
+    for output_target, content_types in ALLOWED_CONTENT_TYPE_OUTPUT_MAP.items()
 }
 
+# media types whose body is parsed for links to follow
+LINK_MEDIA_TYPES = frozenset({"text/html"})
+
+# request meta key holding the output targets left for a response when its headers were received
+DOWNLOAD_OUTPUT_TARGETS_META = "download_output_targets"
+
+# request meta key holding the links followed from a url on an earlier run, replayed by the spider for a 304
+CRAWL_STATE_OUTLINKS_META = "crawl_state_outlinks"
+
 LINK_DENY_REGEX_STR = ["calendar", "location-contact", "DTMO-Site-Map/FileId/"]
 
-domain_spider_link_extractor = LinkExtractor(
-    allow=(),
+domain_spider_link_extractor = SearchGovLinkExtractor(
     deny=LINK_DENY_REGEX_STR,
     deny_extensions=FILTER_EXTENSIONS,
     tags=("a", "area", "va-link"),  # specified to account for custom link tags
-    unique=True,
 )
 
 
@@ -73,13 +90,63 @@ def split_allowed_domains(allowed_domains: str) -> list[str]:
     return host_only_domains
 
 
+@lru_cache(maxsize=1024)
+def parse_media_type(content_type_header: bytes | str | None) -> str:
+    """Return the lowercase media type of a raw content type header, without parameters such as charset"""
+    if not content_type_header:
+        return ""
+    if isinstance(content_type_header, bytes):
+        content_type_header = content_type_header.decode("latin-1")
+    return content_type_header.partition(";")[0].strip().lower()
+
+
 def is_valid_content_type(content_type_header: Any, output_target: str) -> bool:
-    """Check that content type header is in list of allowed values"""
-    content_type_header = str(content_type_header)
-    for type_regex in ALLOWED_CONTENT_TYPE_OUTPUT_MAP[output_target]:
-        if re.search(type_regex, content_type_header):
-            return True
-    return False
+    """Check that the media type of a content type header is allowed for the output target"""
+    return get_output_targets(content_type_header, (output_target,)) == (output_target,)
+
+
+@lru_cache(maxsize=1024)
+def _get_output_targets(content_type_header: bytes | str | None, output_targets: tuple[str, ...]) -> tuple[str, ...]:
+    media_type = parse_media_type(content_type_header)
+    return tuple(
+        output_target for output_target in output_targets if media_type in ALLOWED_MEDIA_TYPE_OUTPUT_MAP[output_target]
+    )
+
+
+def get_output_targets(content_type_header: Any, output_targets: tuple[str, ...]) -> tuple[str, ...]:
+    """
+    Return the output targets that accept the content type.  Only the headers are needed, so this can be
+    checked before the body is downloaded.  Results are cached by raw header value and output targets.
+    """
+    if not isinstance(content_type_header, (bytes, str, type(None))):
+        content_type_header = str(content_type_header)
+    return _get_output_targets(content_type_header, tuple(output_targets))
+
+
+def get_response_output_targets(response: Response, output_targets: tuple[str, ...]) -> tuple[str, ...]:
+    """
+    Return the output targets that accept a response, leaving out targets the download filter dropped
+    when the headers were received, such as those whose size cap the response exceeds, or the crawl state
+    middleware dropped because the page is unchanged
+    """
+    request = response.request
+    download_output_targets = request.meta.get(DOWNLOAD_OUTPUT_TARGETS_META) if request is not None else None
+
+    # a 304 has no content type, the crawl state middleware left the targets its url still goes to
+    if response.status == 304:
+        return tuple(download_output_targets or ())
+
+    accepted_output_targets = get_output_targets(response.headers.get("content-type", None), output_targets)
+    if download_output_targets is None:
+        return accepted_output_targets
+    return tuple(output_target for output_target in accepted_output_targets if output_target in download_output_targets)
+
+
+def is_body_needed(content_type_header: bytes | str | None, output_targets: tuple[str, ...]) -> bool:
+    """Return True if the response body is parsed for links or output as content by one of the targets"""
+    return parse_media_type(content_type_header) in LINK_MEDIA_TYPES or bool(
+        CONTENT_OUTPUT_TARGETS.intersection(output_targets)
+    )
 
 
 def get_crawl_sites(crawl_file_path: Optional[str] = None) -> list[dict]:
@@ -0,0 +1,109 @@
+"""
+Link extractor specialized for the domain spiders.  It follows the same rules as the generic scrapy
+`LinkExtractor` configured with `deny`, `deny_extensions` and `unique=True`, but does less work per link:
+- the deny patterns and the denied extensions are each combined into a single precompiled regex
+- only the wanted tags are visited in the parsed tree of the response, which scrapy caches on
+  `response.selector`, so the page is parsed once for every rule and any other use in the spider
+
+Links are made unique by their exact url, like the generic extractor.  The spiders then drop links that are the
+same page under their own canonicalization rules with `unique_requests`, since one extractor is shared by every
+spider and each can use different rules.
+"""
+
+import re
+from typing import Iterable, Iterator
+from urllib.parse import urljoin
+
+from scrapy.http import HtmlResponse, Request
+from scrapy.link import Link
+from scrapy.utils.misc import rel_has_nofollow
+from scrapy.utils.response import get_base_url
+from w3lib.html import strip_html5_whitespace
+from w3lib.url import safe_url_string
+
+from search_gov_crawler.search_gov_spiders.helpers.url_canonicalization import canonicalize_url
+
+# same schemes as the generic LinkExtractor, other links such as mailto: and javascript: are skipped
+ALLOWED_SCHEMES = frozenset({"http", "https", "file", "ftp"})
+
+
+def compile_deny_regex(deny: Iterable[str]) -> re.Pattern | None:
+    """Combine deny patterns into one regex that matches anywhere in a url"""
+    patterns = [f"(?:{pattern})" for pattern in deny]
+    return re.compile("|".join(patterns)) if patterns else None
+
+
+def compile_extension_regex(extensions: Iterable[str]) -> re.Pattern | None:
+    """Combine file extensions into one regex that matches the end of a url path, ignoring case"""
+    escaped_extensions = [re.escape(extension.lstrip(".")) for extension in extensions]
+    if not escaped_extensions:
+        return None
+    return re.compile(rf"\.(?:{'|'.join(escaped_extensions)})$", flags=re.IGNORECASE)
+
+
+def unique_requests(requests: Iterable[Request], canonicalization_rules: tuple[str, ...]) -> Iterator[Request]:
+    """Drop requests for a url that is the same as an earlier one under the canonicalization rules"""
+    seen_urls = set()
+    for request in requests:
+        canonical_url = canonicalize_url(request.url, canonicalization_rules)
+        if canonical_url not in seen_urls:
+            seen_urls.add(canonical_url)
+            yield request
+
+
+class SearchGovLinkExtractor:
+    """Extracts the links a domain spider follows from an html response, see module docstring"""
+
+    def __init__(
+        self,
+        deny: Iterable[str] = (),
+        deny_extensions: Iterable[str] = (),
+        tags: Iterable[str] = ("a", "area"),
+        attrs: Iterable[str] = ("href",),
+    ):
+        self.deny_regex = compile_deny_regex(deny)
+        self.deny_extension_regex = compile_extension_regex(deny_extensions)
+        self.tags = tuple(tags)
+        self.attrs = tuple(attrs)
+
+    def extract_links(self, response: HtmlResponse) -> list[Link]:
+        """Return the unique, allowed links of the response in document order"""
+        base_url = get_base_url(response)
+        seen_urls = set()
+        links = []
+
+        for element in response.selector.root.iter(*self.tags):
+            for attr in self.attrs:
+                if (value := element.get(attr)) is None:
+                    continue
+
+                url = self._make_url(value, base_url, response.encoding)
+                if url is None or not self._link_allowed(url):
+                    continue
+
+                if url in seen_urls:
+                    continue
+                seen_urls.add(url)
+
+                links.append(Link(url, "".join(element.itertext()), nofollow=rel_has_nofollow(element.get("rel"))))
+
+        return links
+
+    @staticmethod
+    def _make_url(value: str, base_url: str, encoding: str) -> str | None:
+        try:
+            return safe_url_string(urljoin(base_url, strip_html5_whitespace(value)), encoding=encoding)
+        except ValueError:
+            return None
+
+    def _link_allowed(self, url: str) -> bool:
+        scheme, _, rest = url.partition("://")
+        if scheme not in ALLOWED_SCHEMES:
+            return False
+        if self.deny_regex is not None and self.deny_regex.search(url):
+            return False
+        if self.deny_extension_regex is not None:
+            path = rest.partition("/")[2].partition("?")[0].partition("#")[0]
+            if self.deny_extension_regex.search(path):
+                return False
+        return True
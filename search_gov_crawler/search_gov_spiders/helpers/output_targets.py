@@ -0,0 +1,24 @@
+"""
+Output targets a crawl can feed.  A crawl can feed several targets in one pass by passing a comma separated
+list, e.g. `csv,elasticsearch`.  Each page is then fetched and decoded once and the pipeline hands the item to
+every target.
+"""
+
+OUTPUT_TARGETS = ("csv", "elasticsearch", "endpoint", "jsonl")
+
+# output targets that need the page content, all others only use the url
+CONTENT_OUTPUT_TARGETS = frozenset({"elasticsearch", "jsonl"})
+
+
+def parse_output_targets(output_target: str | list[str] | tuple[str, ...] | None) -> tuple[str, ...]:
+    """Split a comma separated string or list of output targets, dropping blanks and duplicates"""
+    if not output_target:
+        return ()
+
+    values = output_target.split(",") if isinstance(output_target, str) else output_target
+    return tuple(dict.fromkeys(value.strip() for value in values if value and value.strip()))
+
+
+def invalid_output_targets(output_targets: tuple[str, ...]) -> list[str]:
+    """Return the output targets that are not one of OUTPUT_TARGETS"""
+    return [output_target for output_target in output_targets if output_target not in OUTPUT_TARGETS]
@@ -0,0 +1,28 @@
+from typing import Any
+
+from scrapy.spiders import Spider
+from scrapy.statscollectors import StatsCollector
+
+
+def get_stats(spider: Spider) -> StatsCollector | None:
+    """Return the stats collector for a spider, or None if the spider is not attached to a crawler"""
+    crawler = getattr(spider, "crawler", None)
+    return getattr(crawler, "stats", None)
+
+
+def inc_value(spider: Spider, key: str, count: int | float = 1) -> None:
+    """Increment a crawl stat if stats are available for the spider"""
+    if stats := get_stats(spider):
+        stats.inc_value(key, count, spider=spider)
+
+
+def set_value(spider: Spider, key: str, value: Any) -> None:
+    """Set a crawl stat if stats are available for the spider"""
+    if stats := get_stats(spider):
+        stats.set_value(key, value, spider=spider)
+
+
+def max_value(spider: Spider, key: str, value: Any) -> None:
+    """Set a crawl stat to the max of its current value and value if stats are available for the spider"""
+    if stats := get_stats(spider):
+        stats.max_value(key, value, spider=spider)
@@ -0,0 +1,84 @@
+"""
+Wall and CPU time spent in each stage between download and output, recorded in the crawl stats as
+`timing/<stage>/count`, `timing/<stage>/wall_seconds` and `timing/<stage>/cpu_seconds`.  CPU time is that of
+the calling thread, so stages that run in the reactor thread pool or in conversion worker processes are
+measured on their own.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from scrapy.spiders import Spider
+
+from search_gov_crawler.search_gov_spiders.helpers import stats
+
+TIMING_PREFIX = "timing/"
+TIMING_FIELDS = ("count", "wall_seconds", "cpu_seconds")
+
+
+class StageTimer:
+    """
+    Context manager measuring the wall and CPU time of a block.  When given a timings dict, the
+    `(wall_seconds, cpu_seconds)` of the block are stored in it under the stage name, which lets code
+    running in another process return its timings instead of writing them to stats directly.
+    """
+
+    def __init__(self, timings: dict[str, tuple[float, float]] | None = None, stage: str = ""):
+        self.timings = timings
+        self.stage = stage
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self._wall_start = 0.0
+        self._cpu_start = 0.0
+
+    def __enter__(self) -> "StageTimer":
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        return self
+
+    def __exit__(self, *_exc_info) -> None:
+        self.wall_seconds = time.perf_counter() - self._wall_start
+        self.cpu_seconds = time.thread_time() - self._cpu_start
+        if self.timings is not None:
+            self.timings[self.stage] = (self.wall_seconds, self.cpu_seconds)
+
+
+def record_timing(spider: Spider, stage: str, wall_seconds: float, cpu_seconds: float, count: int = 1) -> None:
+    """Add the time spent in a stage to the crawl stats"""
+    stats.inc_value(spider, f"{TIMING_PREFIX}{stage}/count", count)
+    stats.inc_value(spider, f"{TIMING_PREFIX}{stage}/wall_seconds", wall_seconds)
+    stats.inc_value(spider, f"{TIMING_PREFIX}{stage}/cpu_seconds", cpu_seconds)
+
+
+def record_timings(spider: Spider, timings: dict[str, tuple[float, float]]) -> None:
+    """Add every stage of a timings dict filled by `StageTimer` to the crawl stats"""
+    for stage, (wall_seconds, cpu_seconds) in timings.items():
+        record_timing(spider, stage, wall_seconds, cpu_seconds)
+
+
+@contextmanager
+def timed(spider: Spider, stage: str) -> Iterator[StageTimer]:
+    """Time a block and add it to the crawl stats, also when the block raises"""
+    timer = StageTimer()
+    try:
+        with timer:
+            yield timer
+    finally:
+        record_timing(spider, stage, timer.wall_seconds, timer.cpu_seconds)
+
+
+def timing_snapshot(crawl_stats: dict[str, Any]) -> dict[str, dict[str, float]]:
+    """Group the timing stats by stage, adding the average wall time per call in milliseconds"""
+    snapshot: dict[str, dict[str, float]] = {}
+    for key, value in crawl_stats.items():
+        if not key.startswith(TIMING_PREFIX):
+            continue
+        stage, _, field = key[len(TIMING_PREFIX) :].rpartition("/")
+        if field in TIMING_FIELDS:
+            snapshot.setdefault(stage, {})[field] = value
+
+    for stage_timing in snapshot.values():
+        if count := stage_timing.get("count"):
+            stage_timing["avg_wall_ms"] = round(1000 * stage_timing.get("wall_seconds", 0) / count, 3)
+    return snapshot
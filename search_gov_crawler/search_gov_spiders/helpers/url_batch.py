@@ -0,0 +1,46 @@
+import time
+
+
+class UrlBatch:
+    """
+    Urls waiting to be flushed to an output target.  Running byte and count totals are kept as urls are
+    added so checking whether the batch should be flushed does not depend on its length.  A batch is full
+    once it reaches `max_bytes` or `max_count` urls and stale once `max_age` seconds pass without a new url.
+    A `max_count` or `max_age` of 0 disables that limit.
+    """
+
+    def __init__(self, max_bytes: int, max_count: int = 0, max_age: float = 0):
+        self.max_bytes = max_bytes
+        self.max_count = max_count
+        self.max_age = max_age
+        self.urls: list[str] = []
+        self.byte_size = 0
+        self._last_added = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def __iter__(self):
+        return iter(self.urls)
+
+    def add(self, url: str) -> bool:
+        """Add a url to the batch, returns True if the batch is now full"""
+        self.urls.append(url)
+        self.byte_size += len(url.encode("utf-8"))
+        self._last_added = time.monotonic()
+        return self.is_full
+
+    @property
+    def is_full(self) -> bool:
+        """True if the batch has reached its byte or count limit"""
+        return self.byte_size >= self.max_bytes or 0 < self.max_count <= len(self.urls)
+
+    @property
+    def is_stale(self) -> bool:
+        """True if the batch has urls and none were added in the last `max_age` seconds"""
+        return bool(self.urls) and 0 < self.max_age <= time.monotonic() - self._last_added
+
+    def take(self) -> list[str]:
+        """Empty the batch, returning the urls that were in it"""
+        urls, self.urls, self.byte_size = self.urls, [], 0
+        return urls
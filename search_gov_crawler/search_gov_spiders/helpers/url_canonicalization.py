@@ -0,0 +1,69 @@
+"""
+Canonical form of urls, shared by the request dupefilter, the dedup pipeline and Elasticsearch document ids,
+so the same page reached through slightly different urls is only fetched, converted and indexed once.
+
+Rules are applied per crawl site through the `canonicalization_rules` field of the crawl sites file, a comma
+separated list of rule names that replaces the defaults.  An empty value turns canonicalization off.  Document
+ids hash the raw url unless the rules are set explicitly, so the default rules do not change existing ids.
+
+- `lowercase_host`: lowercase the scheme and host
+- `strip_default_port`: remove :80 from http and :443 from https urls
+- `strip_fragment`: remove #fragments
+- `sort_query`: sort query string parameters
+- `strip_trailing_slash`: remove trailing slashes from paths other than the root
+- `strip_www`: treat www.example.gov and example.gov as the same host
+- `force_https`: treat http and https urls as the same page
+"""
+
+from functools import lru_cache
+from urllib.parse import urlsplit, urlunsplit
+
+CANONICALIZATION_RULES = (
+    "lowercase_host",
+    "strip_default_port",
+    "strip_fragment",
+    "sort_query",
+    "strip_trailing_slash",
+    "strip_www",
+    "force_https",
+)
+DEFAULT_CANONICALIZATION_RULES = ("lowercase_host", "sort_query", "strip_default_port", "strip_fragment")
+DEFAULT_PORTS = {"http": ":80", "https": ":443"}
+
+
+def parse_canonicalization_rules(rules: str | None) -> tuple[str, ...]:
+    """Parse a comma separated list of rule names, None returns the default rules"""
+    if rules is None:
+        return DEFAULT_CANONICALIZATION_RULES
+
+    parsed_rules = {rule.strip() for rule in rules.split(",") if rule.strip()}
+    if invalid_rules := parsed_rules.difference(CANONICALIZATION_RULES):
+        msg = f"Invalid canonicalization rules {sorted(invalid_rules)}! Must be in {list(CANONICALIZATION_RULES)}"
+        raise ValueError(msg)
+    return tuple(sorted(parsed_rules))
+
+
+@lru_cache(maxsize=65536)
+def canonicalize_url(url: str, rules: tuple[str, ...] = DEFAULT_CANONICALIZATION_RULES) -> str:
+    """Return the canonical form of a url according to the rules"""
+    if not rules:
+        return url
+
+    scheme, netloc, path, query, fragment = urlsplit(url)
+
+    if "lowercase_host" in rules:
+        scheme, netloc = scheme.lower(), netloc.lower()
+    if "strip_default_port" in rules and (default_port := DEFAULT_PORTS.get(scheme.lower())):
+        netloc = netloc.removesuffix(default_port)
+    if "force_https" in rules and scheme.lower() == "http":
+        scheme = "https"
+    if "strip_www" in rules and netloc.lower().startswith("www."):
+        netloc = netloc[4:]
+    if "strip_trailing_slash" in rules and len(path) > 1:
+        path = path.rstrip("/") or "/"
+    if "sort_query" in rules and query:
+        query = "&".join(sorted(query.split("&")))
+    if "strip_fragment" in rules:
+        fragment = ""
+
+    return urlunsplit((scheme, netloc, path or "/", query, fragment))
@@ -0,0 +1,199 @@
+"""
+Compact structures for remembering which urls a crawl has already seen.  All of them share the same small
+interface, `add` returns True when a url was not seen before, `len` is the number of unique urls added and
+`memory_bytes` is an estimate of the memory used, for reporting in crawl stats.
+
+- `set`: python set of url strings, exact but grows with the length of every url
+- `fingerprints`: sorted array of 64-bit url hashes, about 8 bytes per url with a negligible collision rate
+- `bloom`: scalable bloom filter, fixed bits per url for a configurable false positive rate
+"""
+
+import hashlib
+import math
+import sys
+from array import array
+from bisect import bisect_left
+
+DEDUP_BACKENDS = ("set", "fingerprints", "bloom")
+
+
+def url_fingerprint(url: str) -> int:
+    """64-bit hash of a url"""
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class UrlSet:
+    """Exact set of url strings"""
+
+    def __init__(self):
+        self._urls: set[str] = set()
+        self._url_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._urls
+
+    def add(self, url: str) -> bool:
+        """Add a url, returns True if it was not already in the set"""
+        if url in self._urls:
+            return False
+        self._urls.add(url)
+        self._url_bytes += sys.getsizeof(url)
+        return True
+
+    @property
+    def memory_bytes(self) -> int:
+        return sys.getsizeof(self._urls) + self._url_bytes
+
+
+class FingerprintArray:
+    """
+    Sorted array of 64-bit url fingerprints.  New fingerprints go into a small set that is merged into the
+    sorted array once it grows to 1/16th of the array, which keeps the number of merges logarithmic.
+    """
+
+    def __init__(self, min_buffer_size: int = 65536):
+        self._min_buffer_size = min_buffer_size
+        self._sorted = array("Q")
+        self._buffer: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._sorted) + len(self._buffer)
+
+    def __contains__(self, url: str) -> bool:
+        return self._contains(url_fingerprint(url))
+
+    def _contains(self, fingerprint: int) -> bool:
+        if fingerprint in self._buffer:
+            return True
+        index = bisect_left(self._sorted, fingerprint)
+        return index < len(self._sorted) and self._sorted[index] == fingerprint
+
+    def add(self, url: str) -> bool:
+        """Add a url, returns True if its fingerprint was not already in the array"""
+        fingerprint = url_fingerprint(url)
+        if self._contains(fingerprint):
+            return False
+
+        self._buffer.add(fingerprint)
+        if len(self._buffer) >= max(self._min_buffer_size, len(self._sorted) // 16):
+            self._merge()
+        return True
+
+    def _merge(self) -> None:
+        """
+        Merge the buffer into a new sorted array.  Only the buffer is sorted, runs of the sorted array between
+        the insertion points of buffered fingerprints are copied through memoryviews, so no python int is
+        created for the fingerprints already stored.
+        """
+        buffer = sorted(self._buffer)
+        merged = array("Q", [0]) * (len(self._sorted) + len(buffer))
+        start = 0
+        with memoryview(self._sorted) as source, memoryview(merged) as target:
+            for offset, fingerprint in enumerate(buffer):
+                end = bisect_left(self._sorted, fingerprint, start)
+                target[start + offset : end + offset] = source[start:end]
+                target[end + offset] = fingerprint
+                start = end
+            target[start + len(buffer) :] = source[start:]
+
+        self._sorted = merged
+        self._buffer.clear()
+
+    @property
+    def memory_bytes(self) -> int:
+        # ints in the buffer are separate 32 byte objects on top of the set slots
+        return sys.getsizeof(self._sorted) + sys.getsizeof(self._buffer) + 32 * len(self._buffer)
+
+
+class BloomFilter:
+    """Fixed size bloom filter sized for `capacity` items at `error_rate` false positives"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.num_bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.num_hashes = max(1, math.ceil(math.log2(1 / error_rate)))
+        self.count = 0
+        self._bits = bytearray(math.ceil(self.num_bits / 8))
+
+    def _positions(self, hash1: int, hash2: int):
+        return ((hash1 + i * hash2) % self.num_bits for i in range(self.num_hashes))
+
+    def contains(self, hash1: int, hash2: int) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(hash1, hash2))
+
+    def add(self, hash1: int, hash2: int) -> None:
+        for pos in self._positions(hash1, hash2):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    @property
+    def memory_bytes(self) -> int:
+        return sys.getsizeof(self._bits)
+
+
+class ScalableBloomFilter:
+    """
+    Bloom filter that adds larger, tighter filters as it fills so the overall false positive rate stays
+    under `error_rate` no matter how many urls are added.  A false positive drops a url that was never seen.
+    """
+
+    GROWTH = 2
+    TIGHTENING = 0.5
+
+    def __init__(self, initial_capacity: int = 100_000, error_rate: float = 0.0001):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self._filters: list[BloomFilter] = []
+        self._add_filter()
+
+    def _add_filter(self) -> None:
+        index = len(self._filters)
+        self._filters.append(
+            BloomFilter(
+                capacity=self.initial_capacity * self.GROWTH**index,
+                error_rate=self.error_rate * (1 - self.TIGHTENING) * self.TIGHTENING**index,
+            )
+        )
+
+    @staticmethod
+    def _hashes(url: str) -> tuple[int, int]:
+        digest = hashlib.blake2b(url.encode("utf-8"), digest_size=16).digest()
+        return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+    def __len__(self) -> int:
+        return sum(bloom_filter.count for bloom_filter in self._filters)
+
+    def __contains__(self, url: str) -> bool:
+        hashes = self._hashes(url)
+        return any(bloom_filter.contains(*hashes) for bloom_filter in self._filters)
+
+    def add(self, url: str) -> bool:
+        """Add a url, returns True if it was probably not already in the filter"""
+        hashes = self._hashes(url)
+        if any(bloom_filter.contains(*hashes) for bloom_filter in self._filters):
+            return False
+
+        if self._filters[-1].count >= self._filters[-1].capacity:
+            self._add_filter()
+        self._filters[-1].add(*hashes)
+        return True
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(bloom_filter.memory_bytes for bloom_filter in self._filters)
+
+
+def create_url_dedup(
+    backend: str, bloom_initial_capacity: int = 100_000, bloom_error_rate: float = 0.0001
+) -> UrlSet | FingerprintArray | ScalableBloomFilter:
+    """Create the url dedup structure for a backend name"""
+    if backend == "set":
+        return UrlSet()
+    if backend == "fingerprints":
+        return FingerprintArray()
+    if backend == "bloom":
+        return ScalableBloomFilter(initial_capacity=bloom_initial_capacity, error_rate=bloom_error_rate)
+    raise ValueError(f"Invalid dedup backend: {backend}, must be one of {list(DEDUP_BACKENDS)}")
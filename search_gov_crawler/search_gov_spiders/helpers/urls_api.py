@@ -0,0 +1,104 @@
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+from scrapy.spiders import Spider
+from twisted.internet import defer, threads
+from urllib3.util.retry import Retry
+
+from search_gov_crawler.search_gov_spiders.helpers import stats, timing
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class UrlsApiSender:
+    """
+    Posts batches of urls to the urls api from the reactor thread pool over a keep-alive session, so a
+    slow api does not stall the crawl.  Posts are retried by the session on connection errors and
+    429/5xx responses.  The number of posts in flight is bounded, additional batches wait their turn.
+    Stats of each post are recorded back on the reactor thread, the stats collector is not thread-safe.
+    """
+
+    def __init__(self, api_url: str):
+        self.api_url = api_url
+        self._env_max_in_flight = int(os.environ.get("SPIDER_URLS_API_MAX_IN_FLIGHT", "2"))
+        self._env_max_retries = int(os.environ.get("SPIDER_URLS_API_MAX_RETRIES", "3"))
+        self._env_backoff = float(os.environ.get("SPIDER_URLS_API_BACKOFF", "1"))
+        self._env_timeout = float(os.environ.get("SPIDER_URLS_API_TIMEOUT", "30"))
+        self._semaphore = defer.DeferredSemaphore(max(1, self._env_max_in_flight))
+        self._pending: set[defer.Deferred] = set()
+        self._session = None
+
+    @property
+    def pending(self) -> int:
+        """Number of posts that are either running or waiting to run"""
+        return len(self._pending)
+
+    def _get_session(self) -> requests.Session:
+        """Lazily create the session, its connection pool is sized to the number of posts in flight"""
+        if not self._session:
+            retry = Retry(
+                total=self._env_max_retries,
+                backoff_factor=self._env_backoff,
+                status_forcelist=RETRY_STATUS_CODES,
+                allowed_methods=frozenset({"POST"}),
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, self._env_max_in_flight), max_retries=retry)
+            self._session = requests.Session()
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+        return self._session
+
+    def post(self, urls: list[str], spider: Spider) -> defer.Deferred:
+        """
+        Queue a batch of urls to post.  Returns a deferred that fires once the post has started, which
+        waits while the maximum number of posts are already in flight.
+        """
+        started = defer.Deferred()
+        posted = self._semaphore.run(self._start_post, urls, spider, started)
+        posted.addErrback(lambda failure: spider.logger.error(f"Error posting URLs: {failure.getErrorMessage()}"))
+        self._pending.add(posted)
+        posted.addBoth(self._discard_pending, posted)
+        return started
+
+    def _start_post(self, urls: list[str], spider: Spider, started: defer.Deferred) -> defer.Deferred:
+        started.callback(None)
+        return threads.deferToThread(self._post, urls, spider).addCallback(self._record_post_stats, spider)
+
+    @staticmethod
+    def _record_post_stats(result: tuple[dict[str, int], dict[str, tuple[float, float]]], spider: Spider) -> None:
+        """Add the counts and timings returned by a post thread to the spider stats"""
+        counts, timings = result
+        for key, count in counts.items():
+            stats.inc_value(spider, key, count)
+        timing.record_timings(spider, timings)
+
+    def _discard_pending(self, result, posted: defer.Deferred):
+        self._pending.discard(posted)
+        return result
+
+    def _post(self, urls: list[str], spider: Spider) -> tuple[dict[str, int], dict[str, tuple[float, float]]]:
+        """Send a POST request with the batched URLs, runs in a thread.  Returns the counts and timings of the post."""
+        timings: dict[str, tuple[float, float]] = {}
+        try:
+            with timing.StageTimer(timings, "endpoint_post"):
+                response = self._get_session().post(self.api_url, json={"urls": urls}, timeout=self._env_timeout)
+                response.raise_for_status()
+            spider.logger.info(f"Successfully posted {len(urls)} URLs to {self.api_url}")
+            return {"urls_api/posts": 1, "urls_api/urls": len(urls)}, timings
+        except requests.RequestException as e:
+            spider.logger.error(f"Failed to send URLs to {self.api_url}: {e}")
+            return {"urls_api/failed_posts": 1, "urls_api/failed_urls": len(urls)}, timings
+
+    def close(self) -> defer.Deferred:
+        """Returns a deferred that fires once every queued post has finished and the session is closed"""
+        deferred = defer.DeferredList(list(self._pending), consumeErrors=True)
+        deferred.addBoth(self._close_session)
+        return deferred
+
+    def _close_session(self, result):
+        if self._session:
+            self._session.close()
+            self._session = None
+        return result
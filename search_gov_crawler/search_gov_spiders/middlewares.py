@@ -3,8 +3,10 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import hashlib
 import re
 import warnings
+from pathlib import Path
 from typing import Self
 from urllib.parse import urlparse
 
@@ -12,9 +14,23 @@ from scrapy import signals
 from scrapy.crawler import Crawler
 from scrapy.downloadermiddlewares.offsite import OffsiteMiddleware
 from scrapy.exceptions import IgnoreRequest
+from scrapy.http import Request
 from scrapy.spiders import Spider
 from scrapy.utils.httpobj import urlparse_cached
 
+from search_gov_crawler.search_gov_spiders.helpers import stats
+from search_gov_crawler.search_gov_spiders.helpers.crawl_state import CrawlStateStore
+from search_gov_crawler.search_gov_spiders.helpers.domain_spider import (
+    CRAWL_STATE_OUTLINKS_META,
+    DOWNLOAD_OUTPUT_TARGETS_META,
+)
+from search_gov_crawler.search_gov_spiders.helpers.host_path_matcher import HostPathMatcher
+from search_gov_crawler.search_gov_spiders.helpers.output_targets import CONTENT_OUTPUT_TARGETS
+from search_gov_crawler.search_gov_spiders.helpers.url_canonicalization import (
+    DEFAULT_CANONICALIZATION_RULES,
+    canonicalize_url,
+)
+
 
 class MiddlewareBase:
     """Base middleware class that spider middlewares extend"""
@@ -34,7 +50,9 @@ class MiddlewareBase:
 class SearchGovSpidersSpiderMiddleware(MiddlewareBase):
     """
     Custom search gov spider middleare.  Not all methods need to be defined. If a method is not defined,
-    scrapy acts as if the spider middleware does not modify the passed objects.
+    scrapy acts as if the spider middleware does not modify the passed objects.  Requests with query strings
+    and offsite requests are dropped from the spider output, before they are fingerprinted and queued.  The
+    offsite check is done by the `SearchGovSpidersOffsiteMiddleware` the spider shares.
     """
 
     # pylint: disable=unused-argument
@@ -50,10 +68,42 @@ class SearchGovSpidersSpiderMiddleware(MiddlewareBase):
 
     def process_spider_output(self, response, result, spider):
         """Called with the results returned from the Spider, after it has processed the response.
+        Drop requests that the downloader middlewares would ignore.  When the spider keeps crawl state, record
+        the links followed from the response so they can be replayed when a later run gets a 304 for it.
 
         Must return an iterable of Request, or item objects.
         """
-        yield from result
+        crawl_state = getattr(spider, "crawl_state", None)
+        outlinks = []
+        for request_or_item in result:
+            if isinstance(request_or_item, Request) and not self._should_follow(request_or_item, spider):
+                continue
+            if crawl_state is not None and isinstance(request_or_item, Request) and "rule" in request_or_item.meta:
+                outlinks.append(
+                    (request_or_item.meta["rule"], request_or_item.url, request_or_item.meta.get("link_text", ""))
+                )
+            yield request_or_item
+
+        # a 304 has no body to extract links from, keep the outlinks of the run that downloaded it
+        if crawl_state is not None and response.status != 304:
+            crawl_state.record_outlinks(crawl_state_key(response.url, spider), outlinks)
+
+    def _should_follow(self, request: Request, spider: Spider) -> bool:
+        """Apply the query string and offsite filters of the downloader middlewares to an extracted request"""
+        if not getattr(spider, "allow_query_string", False) and urlparse_cached(request).query:
+            stats.inc_value(spider, "spider_output/filtered/query_string")
+            return False
+
+        offsite = getattr(spider, "offsite_middleware", None)
+        if (
+            offsite is not None
+            and not request.dont_filter
+            and not request.meta.get("allow_offsite")
+            and not offsite.allows(request)
+        ):
+            stats.inc_value(spider, "spider_output/filtered/offsite")
+            return False
+        return True
 
     def process_spider_exception(self, response, exception, spider):
         """Called when a spider or process_spider_input() method
@@ -125,30 +175,173 @@ class SearchGovSpidersDownloaderMiddleware(MiddlewareBase):
         return
 
 
+# request meta key holding the crawl state of a downloaded url until its item has been scraped
+CRAWL_STATE_RESPONSE_META = "crawl_state_response"
+
+
+def crawl_state_key(url: str, spider: Spider) -> str:
+    """Crawl state is keyed by canonical url so it matches the dupefilter and document ids"""
+    return canonicalize_url(url, getattr(spider, "canonicalization_rules", DEFAULT_CANONICALIZATION_RULES))
+
+
+class SearchGovSpidersCrawlStateMiddleware(MiddlewareBase):
+    """
+    Makes scheduled crawls incremental.  Spiders started with a job_id keep per url state between runs in a
+    `CrawlStateStore`, requests for known urls are sent with `If-None-Match`/`If-Modified-Since` and urls
+    that come back 304, or 200 with the same content hash, are not converted again.  The spider only outputs
+    their url to the targets that take urls, or nothing when every output target needs the page content, but
+    still follows their links.  A 304 has no body, so the links followed from it on an earlier run are passed
+    to the spider to replay.  The state of a url is only stored once its item has been scraped, so pages that
+    failed in the pipeline are processed again on the next run.
+    """
+
+    def __init__(self, crawler: Crawler):
+        state_dir = crawler.settings.get("CRAWL_STATE_DIR")
+        self.state_dir = Path(state_dir) if state_dir else Path(__file__).parent.parent / "crawl_state"
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> Self:
+        s = cls(crawler)
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(s.item_scraped, signal=signals.item_scraped)
+        return s
+
+    def spider_opened(self, spider):
+        """Open the state store of scheduled crawls and share it with the spider"""
+        job_id = getattr(spider, "job_id", None)
+        spider.crawl_state = CrawlStateStore.for_job(self.state_dir, job_id) if job_id else None
+
+    def spider_closed(self, spider):
+        """Close the state store"""
+        if crawl_state := getattr(spider, "crawl_state", None):
+            stats.set_value(spider, "crawl_state/urls", len(crawl_state))
+            crawl_state.close()
+
+    def process_request(self, request, spider):
+        """Add conditional request headers for urls seen on an earlier run"""
+        crawl_state = getattr(spider, "crawl_state", None)
+        if crawl_state is None or request.method != "GET":
+            return
+
+        if url_state := crawl_state.get(crawl_state_key(request.url, spider)):
+            if url_state.etag:
+                request.headers.setdefault("If-None-Match", url_state.etag)
+            if url_state.last_modified:
+                request.headers.setdefault("If-Modified-Since", url_state.last_modified)
+
+    def item_scraped(self, item, response, spider):
+        """Store the validators and content hash of a url once its item made it through the pipeline"""
+        crawl_state = getattr(spider, "crawl_state", None)
+        if crawl_state is None or response is None or CRAWL_STATE_RESPONSE_META not in response.meta:
+            return
+
+        key, etag, last_modified, content_hash = response.meta[CRAWL_STATE_RESPONSE_META]
+        crawl_state.record_response(key, etag=etag, last_modified=last_modified, content_hash=content_hash)
+
+    def process_response(self, request, response, spider):
+        """Keep validators of downloaded urls for `item_scraped` and handle unchanged ones"""
+        crawl_state = getattr(spider, "crawl_state", None)
+        if crawl_state is None or request.method != "GET" or response.status not in {200, 304}:
+            return response
+
+        # a body that was not downloaded can not be compared with the stored content hash
+        if response.status == 200 and "download_stopped" in response.flags:
+            return response
+
+        key = crawl_state_key(request.url, spider)
+        url_state = crawl_state.get(key)
+
+        if response.status == 304:
+            if url_state is None:
+                return response
+            crawl_state.touch(key)
+            stats.inc_value(spider, "crawl_state/not_modified")
+            self._limit_unchanged_output(request, spider)
+
+            # let the 304 through the HttpErrorMiddleware so the spider can replay its outlinks
+            request.meta[CRAWL_STATE_OUTLINKS_META] = url_state.outlinks
+            request.meta["handle_httpstatus_list"] = [*request.meta.get("handle_httpstatus_list", ()), 304]
+            return response
+
+        content_hash = hashlib.sha256(response.body).hexdigest()
+        etag = self._header(response, "ETag")
+        last_modified = self._header(response, "Last-Modified")
+        if url_state is not None and url_state.content_hash == content_hash:
+            # the content was processed on an earlier run, only the validators can have changed
+            crawl_state.record_response(key, etag=etag, last_modified=last_modified, content_hash=content_hash)
+            stats.inc_value(spider, "crawl_state/unchanged")
+            self._limit_unchanged_output(request, spider)
+            return response
+
+        request.meta[CRAWL_STATE_RESPONSE_META] = (key, etag, last_modified, content_hash)
+        return response
+
+    @staticmethod
+    def _limit_unchanged_output(request, spider) -> None:
+        """Limit the output of an unchanged url to the targets that only take its url, possibly none"""
+        request.meta[DOWNLOAD_OUTPUT_TARGETS_META] = tuple(
+            output_target
+            for output_target in getattr(spider, "output_targets", ())
+            if output_target not in CONTENT_OUTPUT_TARGETS
+            and output_target in request.meta.get(DOWNLOAD_OUTPUT_TARGETS_META, (output_target,))
+        )
+
+    @staticmethod
+    def _header(response, name: str) -> str | None:
+        value = response.headers.get(name)
+        return value.decode("latin-1") if value else None
+
+
 class SearchGovSpidersOffsiteMiddleware(OffsiteMiddleware):
-    """Extend OffsiteMiddleware to enable filtering of paths as well as domains"""
+    """
+    Extend OffsiteMiddleware to enable filtering of paths as well as domains.  Paths are checked with a
+    `HostPathMatcher` of the spider's allowed_domain_paths and the number of requests that did and did not
+    match are kept in the `offsite/host_path/*` stats.
+    """
 
     host_regex: re.Pattern
-    host_path_regex: re.Pattern
+    host_path_matcher: HostPathMatcher | None
 
     def spider_opened(self, spider):
-        """Overridden to add assignment of host_path_regex"""
+        """Overridden to add assignment of host_path_matcher and share the filter with the spider middleware"""
         self.host_regex = self.get_host_regex(spider)
-        self.host_path_regex = self.get_host_path_regex(spider)
+        self.host_path_matcher = self.get_host_path_matcher(spider)
+        if self.host_path_matcher is not None:
+            stats.set_value(spider, "offsite/host_path/entries", len(self.host_path_matcher))
+        spider.offsite_middleware = self
 
     def should_follow(self, request, spider) -> bool:
-        """Overridden to add boolean condition on matching path regex"""
+        """Overridden to add boolean condition on matching allowed domain paths"""
         # hostname can be None for wrong urls (like javascript links)
-        cahched_request = urlparse_cached(request)
-        host = cahched_request.hostname or ""
+        cached_request = urlparse_cached(request)
+        host = cached_request.hostname or ""
+
+        if not self.host_regex.search(host):
+            return False
+        if self.host_path_matcher is None:
+            return True
 
-        return bool(self.host_regex.search(host) and self.host_path_regex.search(cahched_request.geturl()))
+        matched = self.host_path_matcher.match(host, cached_request.path)
+        stats.inc_value(spider, "offsite/host_path/matched" if matched else "offsite/host_path/unmatched")
+        return matched
 
-    def get_host_path_regex(self, spider: Spider) -> re.Pattern:
-        """New method, modified from 'get_host_regex' method to return path related regex"""
+    def allows(self, request) -> bool:
+        """
+        Same check as `should_follow` without recording stats, for the spider middleware to drop requests
+        early.  The stats are only kept when the request is downloaded, so each request is counted once.
+        """
+        cached_request = urlparse_cached(request)
+        host = cached_request.hostname or ""
+        if not self.host_regex.search(host):
+            return False
+        return self.host_path_matcher is None or self.host_path_matcher.match(host, cached_request.path)
+
+    def get_host_path_matcher(self, spider: Spider) -> HostPathMatcher | None:
+        """New method, modified from 'get_host_regex' method to return a matcher of domains and paths"""
         allowed_domain_paths = getattr(spider, "allowed_domain_paths", None)
         if not allowed_domain_paths:
-            return re.compile("")  # allow all by default
+            return None  # allow all by default
         url_pattern = re.compile(r"^https?://.*$")
         port_pattern = re.compile(r":\d+$")
         domains = []
@@ -169,6 +362,5 @@ class SearchGovSpidersOffsiteMiddleware(OffsiteMiddleware):
                 )
                 warnings.warn(message)
             else:
-                domains.append(re.escape(domain))
-        regex = rf'{"|".join(domains)}'
-        return re.compile(regex)
+                domains.append(domain)
+        return HostPathMatcher(domains) if domains else None
@@ -6,12 +6,31 @@ See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 import os
 from pathlib import Path
 
-import requests
+from scrapy.crawler import Crawler
 from scrapy.exceptions import DropItem
 from scrapy.spiders import Spider
+from twisted.internet import defer, task
+from twisted.internet.defer import Deferred, DeferredList, FirstError
+from twisted.python.failure import Failure
 
+from search_gov_crawler.search_gov_spiders.helpers import stats, timing
+from search_gov_crawler.search_gov_spiders.helpers.csv_writer import RotatingCsvWriter
+from search_gov_crawler.search_gov_spiders.helpers.output_targets import (
+    invalid_output_targets,
+    parse_output_targets,
+)
+from search_gov_crawler.search_gov_spiders.helpers.url_batch import UrlBatch
+from search_gov_crawler.search_gov_spiders.helpers.url_canonicalization import (
+    DEFAULT_CANONICALIZATION_RULES,
+    canonicalize_url,
+)
+from search_gov_crawler.search_gov_spiders.helpers.url_dedup import create_url_dedup
+from search_gov_crawler.search_gov_spiders.helpers.urls_api import UrlsApiSender
 from search_gov_crawler.search_gov_spiders.items import SearchGovSpidersItem
+from search_gov_crawler.elasticsearch.conversion_pool import ConversionPool, record_conversion_timings
+from search_gov_crawler.elasticsearch.convert_html_i14y import convert_html
 from search_gov_crawler.elasticsearch.es_batch_upload import SearchGovElasticsearch
+from search_gov_crawler.elasticsearch.jsonl_export import SearchGovJsonlExport
 
 def safe_del(item, key: str):
     """
@@ -27,6 +46,11 @@ class SearchGovSpidersPipeline:
     """
     Pipeline that writes items to files for manual upload, or sends batched POST
     requests (both rotated at ~100KB) to SPIDER_URLS_API if the environment variable is set.
+    Batches are also flushed after SPIDER_URLS_BATCH_MAX_COUNT urls or SPIDER_URLS_BATCH_MAX_AGE
+    seconds without a new url, when those are set.  Files are compressed when SPIDER_CSV_COMPRESSION
+    is set to gzip or zstd.  The jsonl output target writes converted documents to files for a later
+    bulk load into Elasticsearch, see `search_gov_crawler.elasticsearch.jsonl_export`.  The elasticsearch and
+    jsonl targets share one conversion pool and an item sent to both is converted once.
     """
 
     MAX_URL_BATCH_SIZE_BYTES = int(100 * 1024)  # 100KB in bytes
@@ -34,134 +58,257 @@ class SearchGovSpidersPipeline:
 
     def __init__(self):
         self.api_url = os.environ.get("SPIDER_URLS_API")
-        self.urls_batch = []
-        self.file_number = 1
-        self.file_path = None
-        self.current_file = None
-        self.file_open = False
+        self.urls_batch = self._new_url_batch()
+        self.file_batch = self._new_url_batch()
+        self._csv_writer = None
+        self._conversion_pool = None
         self._es = None
+        self._jsonl_export = None
+        self._urls_api = None
+        self._flush_loop = None
 
-    def process_item(self, item: SearchGovSpidersItem, spider: Spider) -> SearchGovSpidersItem:
-        """Handle each item by writing to file or batching URLs for an API POST."""
+    @classmethod
+    def _new_url_batch(cls) -> UrlBatch:
+        return UrlBatch(
+            max_bytes=cls.MAX_URL_BATCH_SIZE_BYTES,
+            max_count=int(os.environ.get("SPIDER_URLS_BATCH_MAX_COUNT", "0")),
+            max_age=float(os.environ.get("SPIDER_URLS_BATCH_MAX_AGE", "60")),
+        )
+
+    def open_spider(self, spider: Spider) -> Deferred | None:
+        """
+        Periodically flush batches that have not received a url in their max age and, for elasticsearch crawls,
+        check the index before any item reaches the pipeline.
+        """
+        max_age = max(self.urls_batch.max_age, self.file_batch.max_age)
+        if max_age > 0:
+            self._flush_loop = task.LoopingCall(self._flush_stale_batches, spider)
+            self._flush_loop.start(max_age, now=False)
+
+        if "elasticsearch" in parse_output_targets(getattr(spider, "output_target", None)):
+            return self._get_elasticsearch_client().open(spider)
+        return None
+
+    def _flush_stale_batches(self, spider: Spider) -> None:
+        if self.urls_batch.is_stale:
+            self._send_post_request(spider)
+        if self.file_batch.is_stale:
+            self._write_file_batch(spider)
+
+    def process_item(self, item: SearchGovSpidersItem, spider: Spider) -> SearchGovSpidersItem | Deferred:
+        """
+        Handle each item by writing to file, batching URLs for an API POST and/or sending it to Elasticsearch.
+        The output_target of an item can list several targets, the item is handed to each of them.
+        Elasticsearch items are converted off the reactor thread and API batches are posted off the reactor
+        thread, so a deferred that fires with the item is returned when either has to wait.
+        """
         url = item.get("url", None)
         output_target= item.get("output_target", None)
+        output_targets = parse_output_targets(output_target)
 
-        if output_target not in ["endpoint", "elasticsearch", "csv"]:
+        if not output_targets or invalid_output_targets(output_targets):
             raise DropItem(f"Not a valid output_target: {output_target}")
 
         if not url:
             raise DropItem("Missing URL in item")
-        
-        if output_target == "elasticsearch":
-            self._process_es_item(item, spider)
-        elif output_target == "endpoint":
-            if not self.api_url:
-                raise DropItem("Item 'endpoint' not resolved, env.SPIDER_URLS_API is not set")
-            self._process_api_item(url, spider)
-        else: # csv
-            self._process_file_item(url)
-        
+
+        if "endpoint" in output_targets and not self.api_url:
+            raise DropItem("Item 'endpoint' not resolved, env.SPIDER_URLS_API is not set")
+
+        # url targets go first so an item dropped by a content target still reaches them
+        deferreds = []
+        if "endpoint" in output_targets and (deferred := self._process_api_item(url, spider)):
+            deferreds.append(deferred)
+
+        if "csv" in output_targets:
+            self._process_file_item(url, spider)
+
+        if content_targets := [target for target in ("elasticsearch", "jsonl") if target in output_targets]:
+            deferreds.append(self._process_content_item(item, content_targets, spider))
+
         safe_del(item, "output_target")
         safe_del(item, "html_content")
 
-        return item
+        if not deferreds:
+            return item
+        if len(deferreds) == 1:
+            return deferreds[0].addCallback(lambda _: item)
+        deferred_list = DeferredList(deferreds, fireOnOneErrback=True, consumeErrors=True)
+        return deferred_list.addErrback(self._first_target_failure).addCallback(lambda _: item)
+
+    @staticmethod
+    def _first_target_failure(failure: Failure) -> Failure:
+        """Pass on the failure of the target that failed first, so a DropItem is handled as a dropped item"""
+        failure.trap(FirstError)
+        return failure.value.subFailure
     
+    def _get_conversion_pool(self) -> ConversionPool:
+        if not self._conversion_pool:
+            self._conversion_pool = ConversionPool.from_env(convert_html, timing_stage="convert_html")
+        return self._conversion_pool
+
     def _get_elasticsearch_client(self) -> SearchGovElasticsearch:
         if self._es:
             return self._es
-        self._es = SearchGovElasticsearch()
+        self._es = SearchGovElasticsearch(conversion_pool=self._get_conversion_pool())
         return self._es
+
+    def _get_jsonl_export(self) -> SearchGovJsonlExport:
+        if not self._jsonl_export:
+            self._jsonl_export = SearchGovJsonlExport(conversion_pool=self._get_conversion_pool())
+        return self._jsonl_export
+
+    def _get_urls_api_sender(self) -> UrlsApiSender:
+        if not self._urls_api:
+            self._urls_api = UrlsApiSender(self.api_url)
+        return self._urls_api
     
-    def _process_es_item(self, item: SearchGovSpidersItem, spider: Spider):
+    def _process_content_item(self, item: SearchGovSpidersItem, content_targets: list[str], spider: Spider) -> Deferred:
+        """Convert the html of an item once in the shared conversion pool and hand the document to each target."""
         url = item.get("url", None)
         html_content = item.get("html_content", None)
 
         if not html_content:
             spider.logger.error(f"Missing 'html_content' for url: {url}")
             raise DropItem("Missing URL or HTML in item")
-        try:
-            self._get_elasticsearch_client().add_to_batch(html_content=html_content, url=url, spider=spider)
-        except Exception as e:
-            raise DropItem(f"Item 'elasticsearch' add_to_batch() failed: {str(e)}")
 
-    def _process_api_item(self, url: str, spider: Spider) -> None:
-        """Batch URLs for API and send POST if size limit is reached."""
-        self.urls_batch.append(url)
-        if self._batch_size() >= self.MAX_URL_BATCH_SIZE_BYTES:
-            self._send_post_request(spider)
+        deferred = self._get_conversion_pool().submit(
+            html_content=html_content,
+            url=url,
+            canonicalization_rules=getattr(spider, "document_id_rules", ()),
+        )
+        deferred.addCallback(record_conversion_timings, spider=spider)
+        deferred.addCallback(self._add_doc_to_targets, content_targets=content_targets, url=url, spider=spider)
+        return deferred.addErrback(self._content_item_failed, content_targets=content_targets)
 
-    def _process_file_item(self, url: str) -> None:
-        """Write URL to file and rotate the file if size exceeds the limit."""
-
-        if not self.file_open:
-            self.file_open = True
-            output_dir = Path(__file__).parent.parent / "output"
-            output_dir.mkdir(parents=True, exist_ok=True)
-            base_filename = f"all-links-p{self.APP_PID}"
-            self.file_path = output_dir / f"{base_filename}.csv"
-            self.current_file = open(self.file_path, "a", encoding="utf-8")
-
-        self.current_file.write(f"{url}\n")
-        if self._file_size() >= self.MAX_URL_BATCH_SIZE_BYTES:
-            self._rotate_file()
-
-    def _batch_size(self) -> int:
-        """Calculate total size of the batched URLs."""
-        return sum(len(url.encode("utf-8")) for url in self.urls_batch)
-
-    def _file_size(self) -> int:
-        """Get the current file size."""
-        self.current_file.flush()  # Ensure the OS writes buffered data to disk
-        return self.file_path.stat().st_size
-
-    def _rotate_file(self) -> None:
-        """Close the current file, rename it, and open a new one."""
-        self.current_file.close()
-        rotated_file = self.file_path.with_name(f"{self.file_path.stem}-{self.file_number}.csv")
-        os.rename(self.file_path, rotated_file)
-        self.current_file = open(self.file_path, "a", encoding="utf-8")
-        self.file_number += 1
-
-    def _send_post_request(self, spider: Spider) -> None:
-        """Send a POST request with the batched URLs."""
-        try:
-            response = requests.post(self.api_url, json={"urls": self.urls_batch})
-            response.raise_for_status()
-            spider.logger.info(f"Successfully posted {len(self.urls_batch)} URLs to {self.api_url}")
-        except requests.RequestException as e:
-            spider.logger.error(f"Failed to send URLs to {self.api_url}: {e}")
-            raise DropItem(f"POST request failed: {e}")
-        finally:
-            self.urls_batch.clear()
-
-    def close_spider(self, spider: Spider) -> None:
-        """Finalize operations: close files or send remaining batched URLs."""
+    def _add_doc_to_targets(self, doc: dict | None, content_targets: list[str], url: str, spider: Spider) -> Deferred:
+        """Add a converted document to the elasticsearch batch and/or the jsonl export"""
+        deferreds = []
+        if "elasticsearch" in content_targets:
+            deferreds.append(defer.maybeDeferred(self._get_elasticsearch_client().add_doc_to_batch, doc, url, spider))
+        if "jsonl" in content_targets:
+            deferreds.append(defer.maybeDeferred(self._get_jsonl_export().write_doc, doc, url, spider))
+
+        deferred_list = DeferredList(deferreds, fireOnOneErrback=True, consumeErrors=True)
+        return deferred_list.addErrback(self._first_target_failure)
+
+    @staticmethod
+    def _content_item_failed(failure: Failure, content_targets: list[str]):
+        """Convert failures raised during conversion, batching or writing into dropped items"""
+        raise DropItem(f"Item '{','.join(content_targets)}' conversion failed: {failure.getErrorMessage()}")
+
+    def _process_api_item(self, url: str, spider: Spider) -> Deferred | None:
+        """Batch URLs for API and send POST if the batch is full."""
+        if self.urls_batch.add(url):
+            return self._send_post_request(spider)
+        return None
+
+    def _process_file_item(self, url: str, spider: Spider) -> None:
+        """Batch URLs for the file and write them once the batch is full."""
+        if self.file_batch.add(url):
+            self._write_file_batch(spider)
+
+    def _get_csv_writer(self) -> RotatingCsvWriter:
+        if not self._csv_writer:
+            self._csv_writer = RotatingCsvWriter(
+                output_dir=Path(__file__).parent.parent / "output",
+                base_name=f"all-links-p{self.APP_PID}",
+                max_bytes=self.MAX_URL_BATCH_SIZE_BYTES,
+                compression=os.environ.get("SPIDER_CSV_COMPRESSION", ""),
+            )
+        return self._csv_writer
+
+    def _write_file_batch(self, spider: Spider) -> None:
+        """Write batched URLs to file, the writer rotates files that reach the size limit."""
+        with timing.timed(spider, "csv_write"):
+            self._get_csv_writer().write_urls(self.file_batch.take())
+
+    def _send_post_request(self, spider: Spider) -> Deferred:
+        """Hand the batched URLs to the sender, returns a deferred that fires once the POST has started."""
+        return self._get_urls_api_sender().post(self.urls_batch.take(), spider)
+
+    def close_spider(self, spider: Spider) -> Deferred | None:
+        """
+        Finalize operations: close files and write the csv manifest, send remaining batched URLs and upload
+        the remaining Elasticsearch batch and finish the jsonl export.  Returns a deferred when waiting on
+        conversions or URL posts.
+        """
+
+        if self._flush_loop and self._flush_loop.running:
+            self._flush_loop.stop()
 
+        closing = []
         try:
             if self._es:
-                self._get_elasticsearch_client().batch_upload(spider)
+                es_closed = self._get_elasticsearch_client().close(spider)
+                es_closed.addErrback(lambda failure: spider.logger.error(failure.getErrorMessage()))
+                closing.append(es_closed)
         except Exception as e:
             spider.logger.error(str(e))
-        
+
+        if self._jsonl_export:
+            jsonl_closed = self._jsonl_export.close(spider)
+            jsonl_closed.addErrback(lambda failure: spider.logger.error(failure.getErrorMessage()))
+            closing.append(jsonl_closed)
+
         if len(self.urls_batch):
             self._send_post_request(spider)
+
+        if self._urls_api:
+            closing.append(self._urls_api.close())
+
+        if len(self.file_batch):
+            self._write_file_batch(spider)
         
-        if self.current_file:
-            self.current_file.close()
+        if self._csv_writer:
+            manifest_path = self._csv_writer.close()
+            spider.logger.info(f"Wrote {len(self._csv_writer.files)} csv files, manifest: {manifest_path}")
+
+        if not closing:
+            return None
+        closed = DeferredList(closing)
+        if self._conversion_pool:
+            closed.addBoth(self._close_conversion_pool)
+        return closed
+
+    def _close_conversion_pool(self, result: list) -> list:
+        """Shutdown the conversion pool once both content targets have drained it"""
+        self._conversion_pool.close()
+        return result
 
 
 class DeDeuplicatorPipeline:
-    """Class for pipeline that removes duplicate items"""
+    """
+    Class for pipeline that removes duplicate items.  Urls are compared in the canonical form given by the
+    spider's canonicalization rules.  Seen urls are kept in the structure named by the DEDUP_BACKEND setting,
+    see `helpers.url_dedup`, and its size is reported in the `dedup/*` stats.
+    """
 
-    def __init__(self):
-        self.urls_seen = set()
+    def __init__(
+        self, backend: str = "fingerprints", bloom_initial_capacity: int = 100_000, bloom_error_rate: float = 0.0001
+    ):
+        self.urls_seen = create_url_dedup(
+            backend, bloom_initial_capacity=bloom_initial_capacity, bloom_error_rate=bloom_error_rate
+        )
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        return cls(
+            backend=crawler.settings.get("DEDUP_BACKEND", "fingerprints"),
+            bloom_initial_capacity=crawler.settings.getint("DEDUP_BLOOM_INITIAL_CAPACITY", 100_000),
+            bloom_error_rate=crawler.settings.getfloat("DEDUP_BLOOM_ERROR_RATE", 0.0001),
+        )
 
-    def process_item(self, item, _spider):
+    def process_item(self, item, spider):
         """
         If item has already been seen, drop it otherwise add to
         """
-        if item["url"] in self.urls_seen:
+        rules = getattr(spider, "canonicalization_rules", DEFAULT_CANONICALIZATION_RULES)
+        with timing.timed(spider, "dedup"):
+            is_new_url = self.urls_seen.add(canonicalize_url(item["url"], rules))
+        if not is_new_url:
             raise DropItem("Item already seen!")
 
-        self.urls_seen.add(item["url"])
+        stats.set_value(spider, "dedup/urls_seen", len(self.urls_seen))
+        stats.set_value(spider, "dedup/memory_bytes", self.urls_seen.memory_bytes)
         return item
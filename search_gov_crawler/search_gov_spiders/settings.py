@@ -65,15 +65,32 @@ SPIDER_MIDDLEWARES = {
 DOWNLOADER_MIDDLEWARES = {
     "search_gov_spiders.middlewares.SearchGovSpidersOffsiteMiddleware": 100,
     "search_gov_spiders.middlewares.SearchGovSpidersDownloaderMiddleware": 543,
+    "search_gov_spiders.middlewares.SearchGovSpidersCrawlStateMiddleware": 580,
 }
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
 EXTENSIONS = {
     "search_gov_spiders.extensions.json_logging.JsonLogging": -1,
+    "search_gov_spiders.extensions.stage_timing.StageTiming": 500,
+    "search_gov_spiders.extensions.download_filter.DownloadFilter": 510,
     "spidermon.contrib.scrapy.extensions.Spidermon": 600,
 }
 
+# Seconds between snapshots of per stage timing stats in the log, 0 disables them
+STAGE_TIMING_LOG_INTERVAL = float(os.environ.get("SPIDER_STAGE_TIMING_LOG_INTERVAL", "60"))
+
+# Stop downloading response bodies that the spider's output targets do not need, see the DownloadFilter extension
+DOWNLOAD_FILTER_ENABLED = os.environ.get("SPIDER_DOWNLOAD_FILTER_ENABLED", "true").lower() == "true"
+
+# Size caps in bytes per output target, checked against Content-Length before the body is downloaded, 0 disables
+OUTPUT_TARGET_MAX_BYTES = {
+    "csv": int(os.environ.get("SPIDER_CSV_MAX_BYTES", "0")),
+    "endpoint": int(os.environ.get("SPIDER_ENDPOINT_MAX_BYTES", "0")),
+    "elasticsearch": int(os.environ.get("SPIDER_ES_MAX_BYTES", str(10 * 1024 * 1024))),
+    "jsonl": int(os.environ.get("SPIDER_JSONL_MAX_BYTES", str(10 * 1024 * 1024))),
+}
+
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 ITEM_PIPELINES = {
@@ -81,6 +98,17 @@ ITEM_PIPELINES = {
     "search_gov_spiders.pipelines.SearchGovSpidersPipeline": 200,
 }
 
+# Structure used by the dedup pipeline to remember seen urls: set, fingerprints (64-bit hashes) or bloom
+DEDUP_BACKEND = os.environ.get("SPIDER_DEDUP_BACKEND", "fingerprints")
+DEDUP_BLOOM_INITIAL_CAPACITY = int(os.environ.get("SPIDER_DEDUP_BLOOM_INITIAL_CAPACITY", "100000"))
+DEDUP_BLOOM_ERROR_RATE = float(os.environ.get("SPIDER_DEDUP_BLOOM_ERROR_RATE", "0.0001"))
+
+# Filter duplicate requests by canonical url, using each spider's canonicalization rules
+DUPEFILTER_CLASS = "search_gov_spiders.dupefilters.SearchGovDupeFilter"
+
+# Directory of per crawl site url state used to make scheduled crawls incremental, see crawl_state helper
+CRAWL_STATE_DIR = os.environ.get("SPIDER_CRAWL_STATE_DIR")
+
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
 AUTOTHROTTLE_ENABLED = False
@@ -1,8 +1,16 @@
 from scrapy.http import Response
+from scrapy.link import Link
 from scrapy.spiders import CrawlSpider, Rule
 
 import search_gov_crawler.search_gov_spiders.helpers.domain_spider as helpers
 import search_gov_crawler.search_gov_spiders.helpers.encoding as encoding
+from search_gov_crawler.search_gov_spiders.helpers import stats, timing
+from search_gov_crawler.search_gov_spiders.helpers.link_extractor import unique_requests
+from search_gov_crawler.search_gov_spiders.helpers.output_targets import (
+    CONTENT_OUTPUT_TARGETS,
+    parse_output_targets,
+)
+from search_gov_crawler.search_gov_spiders.helpers.url_canonicalization import parse_canonicalization_rules
 from search_gov_crawler.search_gov_spiders.items import SearchGovSpidersItem
 
 
@@ -17,7 +25,12 @@ class DomainSpider(CrawlSpider):
 
     To use the CLI for crawling domain/site follow the pattern below.  The desired domains and urls can
     be either single values or comma separated lists. An optional allow_query_string parameter can also
-    be passed. The default is false.
+    be passed. The default is false.  The output_target can be a comma separated list to feed several
+    targets from one crawl, each item goes to the targets that accept its content type.  An optional
+    canonicalization_rules parameter, a comma separated list of rule names from `helpers.url_canonicalization`,
+    controls how urls are compared for duplicates.  Elasticsearch document ids only use the canonical url when
+    the rules are passed explicitly, so existing document ids do not change.
+    Scheduled crawls pass a job_id, which keeps url state between runs so unchanged pages are skipped.
 
     `scrapy crawl domain_spider -a allowed_domains=<desired_domains> -a start_urls=<desired_urls>`
 
@@ -57,6 +70,8 @@ class DomainSpider(CrawlSpider):
         allowed_domains: str | None = None,
         start_urls: str | None = None,
         output_target: str | None = None,
+        canonicalization_rules: str | None = None,
+        job_id: str | None = None,
         **kwargs,
     ) -> None:
         if any([allowed_domains, start_urls]) and not all([allowed_domains, start_urls]):
@@ -67,6 +82,9 @@ class DomainSpider(CrawlSpider):
         self.allow_query_string = allow_query_string
 
         self.output_target = output_target
+        self.canonicalization_rules = parse_canonicalization_rules(canonicalization_rules)
+        self.document_id_rules = self.canonicalization_rules if canonicalization_rules is not None else ()
+        self.job_id = job_id
 
         self.allowed_domains = (
             helpers.split_allowed_domains(allowed_domains)
@@ -84,6 +102,33 @@ class DomainSpider(CrawlSpider):
             start_urls.split(",") if start_urls else helpers.default_starting_urls(handle_javascript=False)
         )
 
+    @property
+    def output_targets(self) -> tuple[str, ...]:
+        """Output targets from the comma separated output_target argument"""
+        return parse_output_targets(self.output_target)
+
+    def _requests_to_follow(self, response: Response):
+        """
+        Overridden to record the time spent extracting links in the crawl stats and to drop links to the same
+        page under the spider's canonicalization rules.  A 304 has no body, the links followed from it on an
+        earlier run are replayed instead.
+        """
+        with timing.timed(self, "link_extraction"):
+            if response.status == 304:
+                requests = self._replay_outlinks(response)
+            else:
+                requests = super()._requests_to_follow(response)
+            requests = list(unique_requests(requests, self.canonicalization_rules))
+        yield from requests
+
+    def _replay_outlinks(self, response: Response):
+        """Build requests for the stored outlinks of a url as if they were extracted from the response again"""
+        outlinks = response.meta.get(helpers.CRAWL_STATE_OUTLINKS_META, [])
+        stats.inc_value(self, "crawl_state/replayed_outlinks", len(outlinks))
+        for rule_index, url, link_text in outlinks:
+            request = self._build_request(rule_index, Link(url=url, text=link_text))
+            yield self._rules[rule_index].process_request(request, response)
+
     def parse_item(self, response: Response):
         """
         This method is called by spiders to gather the url.  Placed in the spider to assist with
@@ -94,6 +139,14 @@ class DomainSpider(CrawlSpider):
         @scrapes url
         """
 
-        if helpers.is_valid_content_type(response.headers.get("content-type", None), output_target=self.output_target):
-            html_content = encoding.decode_http_response(response_bytes=response.body)
-            yield SearchGovSpidersItem(url=response.url, html_content=html_content, output_target=self.output_target)
+        output_targets = helpers.get_response_output_targets(response, self.output_targets)
+        if not output_targets:
+            return
+
+        output_target = ",".join(output_targets)
+        if CONTENT_OUTPUT_TARGETS.intersection(output_targets):
+            with timing.timed(self, "decode"):
+                html_content = encoding.decode_http_response(response_bytes=response.body)
+            yield SearchGovSpidersItem(url=response.url, html_content=html_content, output_target=output_target)
+        else:
+            yield SearchGovSpidersItem(url=response.url, output_target=output_target)
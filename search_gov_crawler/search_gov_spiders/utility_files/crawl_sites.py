@@ -3,13 +3,19 @@ from dataclasses import asdict, dataclass, fields
 from pathlib import Path
 from typing import Self
 
+from search_gov_crawler.search_gov_spiders.helpers.output_targets import OUTPUT_TARGETS, parse_output_targets
+from search_gov_crawler.search_gov_spiders.helpers.url_canonicalization import parse_canonicalization_rules
+
 
 @dataclass
 class CrawlSite:
     """
-    Represents a single crawl site record.  All fields required except schedule.
+    Represents a single crawl site record.  All fields required except schedule and canonicalization_rules.
     In normal operations, When schedule is blank, a job will not be scheduled.  When running
-    a benchmark, schedule is ignored.
+    a benchmark, schedule is ignored.  When canonicalization_rules is omitted the default rules are used,
+    a blank value turns canonicalization off.
+    The output_target can be a list or a comma separated string of targets, it is stored as the
+    comma separated string passed to the spider.
     """
 
     name: str
@@ -17,15 +23,16 @@ class CrawlSite:
     allowed_domains: str
     handle_javascript: bool
     starting_urls: str
-    output_target: str
+    output_target: str | list
     schedule: str | None = None
+    canonicalization_rules: str | None = None
 
     def __post_init__(self):
         """Perform validation on record"""
         # check required fields
         missing_field_names = []
         for field in fields(self):
-            if field.name == "schedule":
+            if field.name in {"schedule", "canonicalization_rules"}:
                 pass
             elif getattr(self, field.name) is None:
                 missing_field_names.append(field.name)
@@ -43,10 +50,22 @@ class CrawlSite:
                 raise TypeError(msg)
         
         # validate output_target values
-        valid_output_targets = {"endpoint", "elasticsearch", "csv"}
-        if self.output_target not in valid_output_targets:
+        valid_output_targets = sorted(OUTPUT_TARGETS)
+        output_targets = parse_output_targets(self.output_target)
+        if not output_targets:
             msg = f"Invalid output_target value {self.output_target}! Must be one of {valid_output_targets}"
             raise TypeError(msg)
+        for output_target in output_targets:
+            if output_target not in valid_output_targets:
+                msg = f"Invalid output_target value {output_target}! Must be one of {valid_output_targets}"
+                raise TypeError(msg)
+        self.output_target = ",".join(output_targets)
+
+        # validate canonicalization_rules values
+        try:
+            parse_canonicalization_rules(self.canonicalization_rules)
+        except ValueError as err:
+            raise TypeError(str(err)) from err
 
     def to_dict(self, *, exclude: tuple = ()) -> dict:
         """Helper method to return dataclass as dictionary.  Exclude fields listed in exclude arg."""
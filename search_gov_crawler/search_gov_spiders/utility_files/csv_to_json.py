@@ -1,16 +1,17 @@
+"""
+Builds crawl-sites-production.json from the domains in domains_bing_all.csv, keeping the entries of
+crawl-sites-production-scrutiny.json and skipping domains they already cover.  Uses the shared domain extractor
+of the spiders, so run it as a module from the repo root:
+
+    $ python -m search_gov_crawler.search_gov_spiders.utility_files.csv_to_json
+"""
+
 import csv
 import json
 from pathlib import Path
-from urllib.parse import urlparse
 from datetime import datetime, timedelta
-import tldextract
 
-def extract_domain(url: str) -> str:
-    """Extracts the domain from a URL, removing www and ensuring consistency."""
-    parsed = urlparse(url if url.startswith(('http://', 'https://')) else f'https://{url}')
-    extracted = tldextract.extract(parsed.netloc)
-    domain = f"{extracted.subdomain}.{extracted.domain}.{extracted.suffix}".lstrip('.').replace("www.", "")
-    return domain
+from search_gov_crawler.search_gov_spiders.helpers.domain_extraction import get_domain_name as extract_domain
 
 def generate_cron_schedules(start_time="01:01 FRI", count=100, minute_interval=10):
     cron_schedules = []
@@ -121,8 +121,17 @@ def transform_crawl_sites(crawl_sites: list[dict]) -> list[dict]:
                         "allowed_domains": crawl_site["allowed_domains"],
                         "setting": [],
                         "start_urls": crawl_site["starting_urls"],
-                        "output_target": crawl_site["output_target"],
+                        "output_target": (
+                            crawl_site["output_target"]
+                            if isinstance(crawl_site["output_target"], str)
+                            else ",".join(crawl_site["output_target"])
+                        ),
                     }
+                    | (
+                        {"canonicalization_rules": crawl_site["canonicalization_rules"]}
+                        if crawl_site.get("canonicalization_rules") is not None
+                        else {}
+                    )
                 ).replace("'", '"'),
                 "selected_nodes": "[1]",
                 "year": "*",
@@ -60,6 +60,7 @@ def test_create_apscheduler_job(handle_javascript, spider_arg):
             test_args["allowed_domains"],
             test_args["starting_urls"],
             test_args["output_target"],
+            None,
         ],
     }
 
@@ -0,0 +1,148 @@
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from twisted.internet import defer
+
+from search_gov_crawler.elasticsearch.conversion_pool import ConversionPool
+
+
+def exit_worker_once(html_content: str, url: str) -> dict:
+    """Kill the worker process the first time it is called for a marker file, runs in a worker process"""
+    marker = Path(html_content)
+    if url.endswith("/kill") and not marker.exists():
+        marker.touch()
+        os._exit(1)
+    return {"url": url}
+
+
+def exit_worker(html_content: str, url: str) -> dict:
+    """Always kill the worker process for a kill url, runs in a worker process"""
+    if url.endswith("/kill"):
+        os._exit(1)
+    return {"url": url}
+
+
+def run_reactor_calls(reactor_calls: list, results: list, count: int, timeout: float = 60) -> None:
+    """Run the calls made from the executor threads on the test thread, the way the reactor would"""
+    deadline = time.monotonic() + timeout
+    while len(results) < count and time.monotonic() < deadline:
+        while reactor_calls:
+            func, args = reactor_calls.pop(0)
+            func(*args)
+        time.sleep(0.05)
+
+
+@pytest.fixture(name="pending_conversions")
+def fixture_pending_conversions() -> list[defer.Deferred]:
+    return []
+
+
+@pytest.fixture(name="inline_pool")
+def fixture_inline_pool(pending_conversions) -> ConversionPool:
+    def convert_func(html_content: str, url: str) -> defer.Deferred:
+        deferred = defer.Deferred()
+        pending_conversions.append(deferred)
+        return deferred
+
+    return ConversionPool(convert_func=convert_func, max_workers=0, max_pending=2)
+
+
+def test_conversion_pool_inline():
+    pool = ConversionPool(convert_func=lambda html_content, url: {"url": url}, max_workers=0, max_pending=1)
+
+    results = []
+    pool.submit(html_content="<html></html>", url="http://example.com").addCallback(results.append)
+
+    assert results == [{"url": "http://example.com"}]
+    assert pool.pending == 0
+
+
+def test_conversion_pool_bounds_pending(inline_pool, pending_conversions):
+    for idx in range(3):
+        inline_pool.submit(html_content="<html></html>", url=f"http://example.com/{idx}")
+
+    # only two conversions can run at once, the third waits for a free slot
+    assert len(pending_conversions) == 2
+    assert inline_pool.pending == 3
+
+    pending_conversions[0].callback(None)
+    assert len(pending_conversions) == 3
+
+
+def test_conversion_pool_drain(inline_pool, pending_conversions):
+    inline_pool.submit(html_content="<html></html>", url="http://example.com/1")
+    inline_pool.submit(html_content="<html></html>", url="http://example.com/2")
+
+    drained = []
+    inline_pool.drain().addCallback(drained.append)
+    assert not drained
+
+    for deferred in pending_conversions:
+        deferred.callback(None)
+
+    assert len(drained) == 1
+    assert inline_pool.pending == 0
+
+
+def test_conversion_pool_timing_stage():
+    def convert_func(html_content: str, url: str, timings: dict) -> dict:
+        timings["convert/parse"] = (0.5, 0.25)
+        return {"url": url}
+
+    pool = ConversionPool(convert_func=convert_func, max_workers=0, max_pending=1, timing_stage="convert")
+
+    results = []
+    pool.submit(html_content="<html></html>", url="http://example.com").addCallback(results.append)
+
+    doc, timings = results[0]
+    assert doc == {"url": "http://example.com"}
+    assert timings["convert/parse"] == (0.5, 0.25)
+    assert set(timings) == {"convert", "convert/parse"}
+
+
+@pytest.fixture(name="reactor_calls")
+def fixture_reactor_calls(mocker) -> list:
+    """
+    Collect calls from the executor threads, there is no running reactor in tests.  The reactor module is
+    not imported, importing it would install the default reactor for the tests that run a crawl.
+    """
+    reactor_calls = []
+    fake_reactor = SimpleNamespace(callFromThread=lambda func, *args: reactor_calls.append((func, args)))
+    mocker.patch("twisted.internet.reactor", fake_reactor, create=True)
+    return reactor_calls
+
+
+def test_conversion_pool_retries_after_worker_dies(reactor_calls, tmp_path):
+    pool = ConversionPool(convert_func=exit_worker_once, max_workers=1, max_pending=2)
+    broken_executor = pool._executor
+
+    results = []
+    try:
+        pool.submit(html_content=str(tmp_path / "killed"), url="http://example.com/kill").addBoth(results.append)
+        run_reactor_calls(reactor_calls, results, 1)
+        assert pool._executor is not broken_executor
+    finally:
+        pool.close()
+
+    assert (tmp_path / "killed").exists()
+    assert results == [{"url": "http://example.com/kill"}]
+
+
+def test_conversion_pool_fails_only_item_that_kills_worker(reactor_calls):
+    pool = ConversionPool(convert_func=exit_worker, max_workers=1, max_pending=1)
+
+    results = []
+    try:
+        pool.submit(html_content="<html></html>", url="http://example.com/kill").addBoth(results.append)
+        run_reactor_calls(reactor_calls, results, 1)
+        pool.submit(html_content="<html></html>", url="http://example.com/ok").addBoth(results.append)
+        run_reactor_calls(reactor_calls, results, 2)
+    finally:
+        pool.close()
+
+    assert results[0].check(BrokenProcessPool)
+    assert results[1] == {"url": "http://example.com/ok"}
@@ -1,3 +1,4 @@
+import re
 from pathlib import Path
 
 import pytest
@@ -30,7 +31,7 @@ def test_valid_crawl_site(schedule, base_crawl_site_args):
 def test_crawl_site_to_dict(base_crawl_site_args, exclude):
     cs = CrawlSite(**base_crawl_site_args)
     output = cs.to_dict(exclude=exclude)
-    expected_output = base_crawl_site_args | {"schedule": None}
+    expected_output = base_crawl_site_args | {"schedule": None, "canonicalization_rules": None}
 
     for field in exclude:
         expected_output.pop(field)
@@ -75,14 +76,41 @@ def test_invalid_crawl_site_wrong_type(base_crawl_site_args, field, new_value, e
 @pytest.mark.parametrize(
     ("field", "new_value", "expected_type"),
     [
-        ("output_target", "index", {"endpoint", "elasticsearch", "csv"}),
+        ("output_target", "index", ["csv", "elasticsearch", "endpoint", "jsonl"]),
     ],
 )
 def test_invalid_crawl_site_output_target(base_crawl_site_args, field, new_value, expected_type):
     test_args = base_crawl_site_args | {field: new_value}
 
     match = f"Invalid output_target value {new_value}! Must be one of {expected_type}"
-    with pytest.raises(TypeError, match=match):
+    with pytest.raises(TypeError, match=re.escape(match)):
+        CrawlSite(**test_args)
+
+
+@pytest.mark.parametrize("canonicalization_rules", [None, "", "strip_www,force_https"])
+def test_valid_crawl_site_canonicalization_rules(base_crawl_site_args, canonicalization_rules):
+    test_args = base_crawl_site_args | {"canonicalization_rules": canonicalization_rules}
+    assert CrawlSite(**test_args).canonicalization_rules == canonicalization_rules
+
+
+def test_invalid_crawl_site_canonicalization_rules(base_crawl_site_args):
+    test_args = base_crawl_site_args | {"canonicalization_rules": "strip_www,lowercase_path"}
+
+    with pytest.raises(TypeError, match=r"Invalid canonicalization rules \['lowercase_path'\]!"):
+        CrawlSite(**test_args)
+
+
+@pytest.mark.parametrize("output_target", [["csv", "elasticsearch"], "csv,elasticsearch", "csv, elasticsearch"])
+def test_valid_crawl_site_multiple_output_targets(base_crawl_site_args, output_target):
+    test_args = base_crawl_site_args | {"output_target": output_target}
+    assert CrawlSite(**test_args).output_target == "csv,elasticsearch"
+
+
+@pytest.mark.parametrize("output_target", [["csv", "index"], "csv,index"])
+def test_invalid_crawl_site_multiple_output_targets(base_crawl_site_args, output_target):
+    test_args = base_crawl_site_args | {"output_target": output_target}
+
+    with pytest.raises(TypeError, match="Invalid output_target value index!"):
         CrawlSite(**test_args)
 
 
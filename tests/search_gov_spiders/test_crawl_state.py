@@ -0,0 +1,39 @@
+from search_gov_crawler.search_gov_spiders.helpers.crawl_state import CrawlStateStore
+
+
+def test_crawl_state_store_round_trip(tmp_path):
+    crawl_state = CrawlStateStore.for_job(tmp_path / "crawl_state", "test-job")
+    crawl_state.record_response(
+        "https://www.example.gov/", etag='"abc"', last_modified="Mon, 01 Jan 2024 00:00:00 GMT", content_hash="123"
+    )
+    crawl_state.record_outlinks("https://www.example.gov/", [(0, "https://www.example.gov/1", "One")])
+    crawl_state.close()
+
+    reopened_crawl_state = CrawlStateStore.for_job(tmp_path / "crawl_state", "test-job")
+    url_state = reopened_crawl_state.get("https://www.example.gov/")
+
+    assert len(reopened_crawl_state) == 1
+    assert url_state.etag == '"abc"'
+    assert url_state.last_modified == "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert url_state.content_hash == "123"
+    assert url_state.outlinks == [(0, "https://www.example.gov/1", "One")]
+    assert reopened_crawl_state.get("https://www.example.gov/not-seen") is None
+
+
+def test_crawl_state_store_record_response_keeps_outlinks(tmp_path):
+    crawl_state = CrawlStateStore(tmp_path / "test-job.sqlite3")
+    crawl_state.record_outlinks("https://www.example.gov/", [(0, "https://www.example.gov/1", "")])
+    crawl_state.record_response("https://www.example.gov/", etag=None, last_modified=None, content_hash="456")
+
+    url_state = crawl_state.get("https://www.example.gov/")
+    assert url_state.content_hash == "456"
+    assert url_state.outlinks == [(0, "https://www.example.gov/1", "")]
+
+
+def test_crawl_state_store_touch(tmp_path):
+    crawl_state = CrawlStateStore(tmp_path / "test-job.sqlite3")
+    crawl_state.record_response("https://www.example.gov/", etag=None, last_modified=None, content_hash="123")
+    last_seen = crawl_state.get("https://www.example.gov/").last_seen
+
+    crawl_state.touch("https://www.example.gov/")
+    assert crawl_state.get("https://www.example.gov/").last_seen >= last_seen
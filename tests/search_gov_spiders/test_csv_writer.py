@@ -0,0 +1,58 @@
+import gzip
+import json
+
+import pytest
+import zstandard
+
+from search_gov_crawler.search_gov_spiders.helpers.csv_writer import RotatingCsvWriter
+
+URLS = [f"https://www.example.com/page-{i}" for i in range(10)]  # 31 bytes per line
+
+
+def test_rotating_csv_writer_rotates_before_max_bytes(tmp_path):
+    csv_writer = RotatingCsvWriter(output_dir=tmp_path, base_name="all-links-p1234", max_bytes=100)
+    csv_writer.write_urls(URLS)
+    manifest_path = csv_writer.close()
+
+    assert sorted(path.name for path in tmp_path.glob("*.csv")) == [
+        "all-links-p1234-1.csv",
+        "all-links-p1234-2.csv",
+        "all-links-p1234-3.csv",
+        "all-links-p1234-4.csv",
+    ]
+    assert all(path.stat().st_size <= 100 for path in tmp_path.glob("*.csv"))
+    assert (tmp_path / "all-links-p1234-4.csv").read_text(encoding="utf-8") == f"{URLS[9]}\n"
+
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    assert manifest["total_urls"] == 10
+    assert [entry["urls"] for entry in manifest["files"]] == [3, 3, 3, 1]
+    assert manifest["compression"] is None
+
+
+def test_rotating_csv_writer_gzip(tmp_path):
+    csv_writer = RotatingCsvWriter(output_dir=tmp_path, base_name="all-links-p1234", max_bytes=1000, compression="gzip")
+    csv_writer.write_urls(URLS)
+    csv_writer.close()
+
+    with gzip.open(tmp_path / "all-links-p1234-1.csv.gz", "rt", encoding="utf-8") as csv_file:
+        assert csv_file.read().splitlines() == URLS
+
+
+def test_rotating_csv_writer_zstd(tmp_path):
+    csv_writer = RotatingCsvWriter(output_dir=tmp_path, base_name="all-links-p1234", max_bytes=1000, compression="zstd")
+    csv_writer.write_urls(URLS)
+    csv_writer.close()
+
+    with zstandard.open(tmp_path / "all-links-p1234-1.csv.zst", "rt", encoding="utf-8") as csv_file:
+        assert csv_file.read().splitlines() == URLS
+
+
+def test_rotating_csv_writer_no_urls(tmp_path):
+    csv_writer = RotatingCsvWriter(output_dir=tmp_path, base_name="all-links-p1234", max_bytes=1000)
+    assert csv_writer.close() is None
+    assert not list(tmp_path.iterdir())
+
+
+def test_rotating_csv_writer_invalid_compression(tmp_path):
+    with pytest.raises(ValueError, match="Invalid csv compression: bz2"):
+        RotatingCsvWriter(output_dir=tmp_path, base_name="all-links-p1234", max_bytes=1000, compression="bz2")
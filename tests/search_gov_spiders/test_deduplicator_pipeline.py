@@ -3,8 +3,11 @@ from contextlib import suppress
 from unittest.mock import MagicMock, patch
 
 import pytest
+from scrapy import Spider
 from scrapy.exceptions import DropItem
+from scrapy.utils.test import get_crawler
 
+from search_gov_crawler.search_gov_spiders.helpers.url_dedup import DEDUP_BACKENDS, ScalableBloomFilter
 from search_gov_crawler.search_gov_spiders.items import SearchGovSpidersItem
 from search_gov_crawler.search_gov_spiders.pipelines import (
     DeDeuplicatorPipeline,
@@ -146,11 +149,51 @@ def test_deduplicator_pipeline_clean_state():
         ),
     ],
 )
-def test_deduplicator_pipeline(items, urls_seen_length):
-    pl = DeDeuplicatorPipeline()
+@pytest.mark.parametrize("backend", DEDUP_BACKENDS)
+def test_deduplicator_pipeline(items, urls_seen_length, backend):
+    pl = DeDeuplicatorPipeline(backend=backend)
 
     with suppress(DropItem):
         for item in items:
             pl.process_item(item, None)
 
     assert len(pl.urls_seen) == urls_seen_length
+
+
+def test_deduplicator_pipeline_from_crawler_stats():
+    crawler = get_crawler(Spider, settings_dict={"DEDUP_BACKEND": "bloom", "DEDUP_BLOOM_INITIAL_CAPACITY": 1000})
+    spider = crawler._create_spider(name="dedup_test")
+    pl = DeDeuplicatorPipeline.from_crawler(crawler)
+
+    pl.process_item({"url": "https://www.example.com/1"}, spider)
+
+    assert isinstance(pl.urls_seen, ScalableBloomFilter)
+    assert crawler.stats.get_value("dedup/urls_seen") == 1
+    assert crawler.stats.get_value("dedup/memory_bytes") == pl.urls_seen.memory_bytes
+
+
+@pytest.mark.parametrize(
+    ("canonicalization_rules", "urls_seen_length"),
+    [
+        (("lowercase_host", "sort_query", "strip_default_port", "strip_fragment"), 1),
+        ((), 3),
+    ],
+)
+def test_deduplicator_pipeline_canonicalization(canonicalization_rules, urls_seen_length):
+    class SpiderMock:
+        pass
+
+    spider = SpiderMock()
+    spider.canonicalization_rules = canonicalization_rules
+    pl = DeDeuplicatorPipeline()
+
+    urls = [
+        "https://www.example.com/?a=1&b=2",
+        "https://WWW.EXAMPLE.COM:443/?b=2&a=1",
+        "https://www.example.com/?a=1&b=2#top",
+    ]
+    with suppress(DropItem):
+        for url in urls:
+            pl.process_item({"url": url}, spider)
+
+    assert len(pl.urls_seen) == urls_seen_length
@@ -0,0 +1,33 @@
+import pytest
+
+from search_gov_crawler.search_gov_spiders.helpers import domain_extraction
+
+
+@pytest.mark.parametrize(
+    ("url", "domain"),
+    [
+        ("https://www.example.com/path/page.html", "example.com"),
+        ("http://sub.example.gov:8080/path", "sub.example.gov"),
+        ("www.example.co.uk", "example.co.uk"),
+        ("https://sub.www.example.com", "sub.example.com"),
+    ],
+)
+def test_get_domain_name(url, domain):
+    assert domain_extraction.get_domain_name(url) == domain
+
+
+def test_get_domain_name_offline(mocker):
+    mock_get = mocker.patch("requests.Session.get")
+    domain_extraction.domain_from_netloc.cache_clear()
+
+    assert domain_extraction.get_domain_name("https://www.nasa.gov/") == "nasa.gov"
+    mock_get.assert_not_called()
+
+
+def test_get_domain_name_cached():
+    domain_extraction.domain_from_netloc.cache_clear()
+    for page in range(10):
+        domain_extraction.get_domain_name(f"https://www.example.gov/page/{page}")
+
+    cache_info = domain_extraction.domain_from_netloc.cache_info()
+    assert (cache_info.hits, cache_info.misses) == (9, 1)
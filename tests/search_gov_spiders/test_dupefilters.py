@@ -0,0 +1,51 @@
+import pytest
+from scrapy import Request, Spider
+from scrapy.utils.test import get_crawler
+
+from search_gov_crawler.search_gov_spiders.dupefilters import SearchGovDupeFilter
+
+
+@pytest.fixture(name="crawler")
+def fixture_crawler():
+    crawler = get_crawler(Spider)
+    crawler.spider = crawler._create_spider(name="dupefilter_test")
+    return crawler
+
+
+def test_dupefilter_canonical_urls(crawler):
+    dupefilter = SearchGovDupeFilter.from_crawler(crawler)
+
+    assert not dupefilter.request_seen(Request("https://www.example.gov/page?b=2&a=1"))
+    assert dupefilter.request_seen(Request("https://WWW.EXAMPLE.GOV:443/page?a=1&b=2#top"))
+    assert not dupefilter.request_seen(Request("https://example.gov/page?a=1&b=2"))
+
+
+def test_dupefilter_spider_rules(crawler):
+    crawler.spider.canonicalization_rules = ("strip_www",)
+    dupefilter = SearchGovDupeFilter.from_crawler(crawler)
+
+    assert not dupefilter.request_seen(Request("https://www.example.gov/page"))
+    assert dupefilter.request_seen(Request("https://example.gov/page"))
+    assert not dupefilter.request_seen(Request("https://example.gov/page#top"))
+
+
+def test_dupefilter_non_get_requests(crawler):
+    dupefilter = SearchGovDupeFilter.from_crawler(crawler)
+
+    assert not dupefilter.request_seen(Request("https://www.example.gov/form", method="POST", body=b"a=1"))
+    assert not dupefilter.request_seen(Request("https://www.example.gov/form", method="POST", body=b"a=2"))
+    assert dupefilter.request_seen(Request("https://www.example.gov/form", method="POST", body=b"a=1"))
+
+
+def test_dupefilter_job_dir(tmp_path):
+    crawler = get_crawler(Spider, settings_dict={"JOBDIR": str(tmp_path)})
+    dupefilter = SearchGovDupeFilter.from_crawler(crawler)
+    dupefilter.request_seen(Request("https://www.example.gov/page"))
+    dupefilter.close("finished")
+
+    assert (tmp_path / "requests.seen").read_text(encoding="utf-8") == "https://www.example.gov/page\n"
+    assert crawler.stats.get_value("dupefilter/fingerprints") == 1
+
+    resumed_dupefilter = SearchGovDupeFilter.from_crawler(get_crawler(Spider, settings_dict={"JOBDIR": str(tmp_path)}))
+    assert resumed_dupefilter.request_seen(Request("https://www.example.gov/page"))
+    resumed_dupefilter.close("finished")
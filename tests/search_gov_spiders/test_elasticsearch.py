@@ -1,7 +1,8 @@
 import os
-import asyncio
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import ANY, patch, MagicMock
+from elasticsearch import ConnectionError as EsConnectionError
+from twisted.internet import defer
 from search_gov_crawler.elasticsearch.es_batch_upload import SearchGovElasticsearch
 
 html_content = """
@@ -31,13 +32,16 @@ def sample_spider():
 
 # Mock environment variables
 @pytest.fixture(autouse=True)
-def mock_env_vars():
+def mock_env_vars(tmp_path):
     with patch.dict(os.environ, {
         "ES_HOSTS": "http://localhost:9200",
         "SPIDER_ES_INDEX_NAME": "test_index",
         "SPIDER_ES_INDEX_ALIAS": "test_alias",
         "ES_USER": "test_user",
-        "ES_PASSWORD": "test_password"
+        "ES_PASSWORD": "test_password",
+        "SPIDER_ES_CONVERT_WORKERS": "0",
+        "SPIDER_ES_FINGERPRINT_DB": "",
+        "SPIDER_ES_DEAD_LETTER_DIR": str(tmp_path / "dead-letter"),
     }):
         yield
 
@@ -48,19 +52,21 @@ def mock_convert_html():
         yield mock
 
 @pytest.fixture
-def mock_asyncio_loop():
-    with patch("search_gov_crawler.elasticsearch.es_batch_upload.asyncio.get_event_loop") as mock_get_loop:
-        mock_loop = asyncio.new_event_loop()
-        mock_get_loop.return_value = mock_loop
-
-        with patch("search_gov_crawler.elasticsearch.es_batch_upload.asyncio.new_event_loop") as mock_new_loop:
-            mock_new_loop.return_value = mock_loop
-            yield mock_loop
-            mock_loop.close()
-
-# Test add_to_batch (Corrected)
-@pytest.mark.asyncio(loop_scope="module")
-async def test_add_to_batch(mock_convert_html, sample_spider):
+def mock_defer_to_thread():
+    """Run uploads as deferreds controlled by the test instead of in the reactor thread pool"""
+    uploads = []
+
+    def _defer_to_thread(*_args, **_kwargs):
+        uploads.append(defer.Deferred())
+        return uploads[-1]
+
+    with patch(
+        "search_gov_crawler.elasticsearch.es_batch_upload.threads.deferToThread", side_effect=_defer_to_thread
+    ) as mock:
+        mock.uploads = uploads
+        yield mock
+
+def test_add_to_batch(mock_convert_html, mock_defer_to_thread, sample_spider):
     es_uploader = SearchGovElasticsearch(batch_size=2)
     mock_convert_html.return_value = {"_id": "1", "title": "Test Document"}
 
@@ -69,33 +75,247 @@ async def test_add_to_batch(mock_convert_html, sample_spider):
 
     es_uploader.add_to_batch(html_content, "http://example.com/2", sample_spider)
     assert len(es_uploader._current_batch) == 0
+    assert mock_defer_to_thread.call_count == 1
 
-@pytest.mark.asyncio(loop_scope="module")
-async def test_batch_upload(mock_convert_html, sample_spider):  # Use pytest-asyncio's event loop
+def test_batch_upload(mock_defer_to_thread, sample_spider):
     es_uploader = SearchGovElasticsearch(batch_size=2)
-    mock_convert_html.return_value = {"_id": "1", "title": "Test Document"}
-    es_uploader._current_batch = [{"_id": "1", "title": "Test Document"}, {"_id": "2", "title": "Test Document"}]
+    docs = [{"_id": "1", "title": "Test Document"}, {"_id": "2", "title": "Test Document"}]
+    es_uploader._current_batch = docs.copy()
 
     es_uploader.batch_upload(sample_spider)
     assert len(es_uploader._current_batch) == 0
+    mock_defer_to_thread.assert_called_once_with(es_uploader._bulk_upload, docs, sample_spider, {})
 
-@pytest.mark.asyncio(loop_scope="module")
-async def test_batch_upload_empty(sample_spider):
+def test_batch_upload_empty(sample_spider):
     es_uploader = SearchGovElasticsearch(batch_size=2)
     es_uploader._current_batch = []
-    es_uploader._batch_elasticsearch_upload = MagicMock()
+    es_uploader._start_upload = MagicMock()
     es_uploader.batch_upload(sample_spider)
-    es_uploader._batch_elasticsearch_upload.assert_not_called()  # Ensure it is not called when the batch is empty
+    es_uploader._start_upload.assert_not_called()  # Ensure it is not called when the batch is empty
+
+def test_batch_upload_max_in_flight(mock_defer_to_thread, sample_spider, monkeypatch):
+    monkeypatch.setenv("SPIDER_ES_MAX_UPLOADS_IN_FLIGHT", "1")
+    es_uploader = SearchGovElasticsearch(batch_size=2)
+
+    started = []
+    for doc_id in ("1", "2"):
+        es_uploader._current_batch = [{"_id": doc_id, "title": "Test Document"}]
+        es_uploader.batch_upload(sample_spider).addCallback(started.append)
+
+    # second upload waits for the first to finish
+    assert len(started) == 1
+    assert mock_defer_to_thread.call_count == 1
+
+    mock_defer_to_thread.uploads[0].callback(({}, {}))
+    assert len(started) == 2
+    assert mock_defer_to_thread.call_count == 2
+
+def test_close_waits_for_uploads(mock_convert_html, mock_defer_to_thread, sample_spider):
+    es_uploader = SearchGovElasticsearch(batch_size=2)
+    mock_convert_html.return_value = {"_id": "1", "title": "Test Document"}
+    es_uploader.add_to_batch(html_content, "http://example.com/1", sample_spider)
+
+    closed = []
+    es_uploader.close(sample_spider).addCallback(closed.append)
+
+    # final batch is uploaded but close does not finish until the upload does
+    assert mock_defer_to_thread.call_count == 1
+    assert not closed
+
+    mock_defer_to_thread.uploads[0].callback(({}, {}))
+    assert len(closed) == 1
 
-# Test _batch_elasticsearch_upload
-@pytest.mark.asyncio(loop_scope="module")
-async def test_batch_elasticsearch_upload(mock_convert_html, mock_asyncio_loop, sample_spider):
+def test_upload_stats_recorded_on_reactor_thread(mock_defer_to_thread, sample_spider):
+    sample_spider.crawler = MagicMock()
+    es_uploader = SearchGovElasticsearch(batch_size=2)
+    es_uploader._current_batch = [{"_id": "1", "title": "Test Document"}]
+    es_uploader.batch_upload(sample_spider)
+
+    counts = {
+        "elasticsearch/bulk/batches": 1,
+        "elasticsearch/bulk/docs_succeeded": 3,
+        "elasticsearch/bulk/docs_failed": 1,
+        "elasticsearch/bulk/seconds": 2.0,
+    }
+    mock_defer_to_thread.uploads[0].callback((counts, {"elasticsearch_bulk": (2.0, 0.5)}))
+
+    crawler_stats = sample_spider.crawler.stats
+    crawler_stats.inc_value.assert_any_call("elasticsearch/bulk/docs_succeeded", 3, spider=sample_spider)
+    crawler_stats.inc_value.assert_any_call("timing/elasticsearch_bulk/wall_seconds", 2.0, spider=sample_spider)
+    crawler_stats.set_value.assert_called_once_with(
+        "elasticsearch/bulk/last_batch_docs_per_second", 2.0, spider=sample_spider
+    )
+
+def test_bulk_upload_create_actions(sample_spider):
     es_uploader = SearchGovElasticsearch(batch_size=2)
     docs = [{"_id": "1", "title": "Test Document"}]
-    mock_convert_html.return_value = docs[0]
-    es_uploader._create_actions = MagicMock()
-    await es_uploader._batch_elasticsearch_upload(docs, mock_asyncio_loop, sample_spider)
-    es_uploader._create_actions.assert_called_once()
+    es_uploader._get_client = MagicMock()
+    es_uploader._create_actions = MagicMock(return_value=[])
+    with patch("search_gov_crawler.elasticsearch.es_batch_upload.helpers.streaming_bulk", return_value=[]):
+        es_uploader._bulk_upload(docs, sample_spider)
+    es_uploader._create_actions.assert_called_once_with(docs)
+
+def test_add_to_batch_returns_deferred(mock_convert_html, sample_spider):
+    es_uploader = SearchGovElasticsearch(batch_size=2)
+    mock_convert_html.return_value = {"_id": "1", "title": "Test Document"}
+
+    results = []
+    es_uploader.add_to_batch(html_content, "http://example.com/1", sample_spider).addCallback(results.append)
+    mock_convert_html.assert_called_once_with(
+        html_content=html_content,
+        url="http://example.com/1",
+        canonicalization_rules=(),
+        timings={"convert_html": ANY},
+    )
+    assert len(results) == 1
+
+@pytest.mark.parametrize(("index_created", "expected_batch_size"), [(False, 2), (True, 3)])
+def test_add_to_batch_skips_unchanged(
+    mock_convert_html, sample_spider, tmp_path, monkeypatch, index_created, expected_batch_size
+):
+    monkeypatch.setenv("SPIDER_ES_FINGERPRINT_DB", str(tmp_path / "fingerprints.sqlite"))
+    es_uploader = SearchGovElasticsearch(batch_size=10)
+    mock_convert_html.side_effect = lambda **_kwargs: {"_id": "1", "title": "Test Document"}
+
+    es_uploader.add_to_batch(html_content, "http://example.com/1", sample_spider)
+    es_uploader._get_fingerprint_store().update(es_uploader._env_es_index_name, es_uploader._current_fingerprints)
+
+    # fingerprints are not trusted until the index has been checked
+    es_uploader.add_to_batch(html_content, "http://example.com/1", sample_spider)
+    assert len(es_uploader._current_batch) == 2
+
+    with (
+        patch("search_gov_crawler.elasticsearch.es_batch_upload.get_es_client"),
+        patch("search_gov_crawler.elasticsearch.es_batch_upload.ensure_index", return_value=index_created),
+    ):
+        es_uploader._get_client(sample_spider)
+
+    es_uploader.add_to_batch(html_content, "http://example.com/1", sample_spider)
+    assert len(es_uploader._current_batch) == expected_batch_size
+
+
+@pytest.mark.parametrize("doc", [None, {"_id": "1", "title": "Test Document"}])
+def test_add_doc_to_batch_returns_fired_deferred(sample_spider, doc):
+    es_uploader = SearchGovElasticsearch(batch_size=10)
+    results = []
+
+    es_uploader.add_doc_to_batch(doc, "http://example.com/1", sample_spider).addCallback(results.append)
+    assert results == [None]
+
+
+def test_close_closes_fingerprint_store(sample_spider, tmp_path, monkeypatch):
+    monkeypatch.setenv("SPIDER_ES_FINGERPRINT_DB", str(tmp_path / "fingerprints.sqlite"))
+    es_uploader = SearchGovElasticsearch(batch_size=10)
+    fingerprint_store = es_uploader._get_fingerprint_store()
+
+    with patch.object(fingerprint_store, "close") as mock_close:
+        es_uploader.close(sample_spider)
+
+    mock_close.assert_called_once_with()
+    assert es_uploader._fingerprint_store is None
+
+def test_add_to_batch_max_bytes(mock_convert_html, sample_spider, monkeypatch):
+    monkeypatch.setenv("SPIDER_ES_BATCH_MAX_BYTES", "100")
+    es_uploader = SearchGovElasticsearch(batch_size=10)
+    es_uploader.batch_upload = MagicMock()
+    mock_convert_html.side_effect = lambda url, **_kwargs: {"_id": url, "content_en": "x" * 60}
+
+    es_uploader.add_to_batch(html_content, "http://example.com/1", sample_spider)
+    es_uploader.batch_upload.assert_not_called()
+
+    es_uploader.add_to_batch(html_content, "http://example.com/2", sample_spider)
+    es_uploader.batch_upload.assert_called_once_with(sample_spider)
+
+@pytest.mark.parametrize(
+    ("doc", "expected_bytes"),
+    [
+        ({"_id": "1", "content_en": "abc"}, 4),
+        ({"_id": "1", "content_en": "\u00e9\u00e9", "content_zh": "\u4e2d\u6587"}, 11),
+        ({"_id": "1", "tags": ["one", "\u00e9"], "searchgov_custom1": None}, 6),
+    ],
+    ids=["ascii", "non-ascii", "list"],
+)
+def test_estimate_doc_bytes(doc, expected_bytes):
+    assert SearchGovElasticsearch._estimate_doc_bytes(doc) == expected_bytes
+
+@pytest.mark.parametrize(("thread_count", "bulk_helper"), [("1", "streaming_bulk"), ("4", "parallel_bulk")])
+def test_bulk_upload(sample_spider, monkeypatch, thread_count, bulk_helper):
+    monkeypatch.setenv("SPIDER_ES_BULK_THREAD_COUNT", thread_count)
+    sample_spider.crawler = MagicMock()
+    es_uploader = SearchGovElasticsearch(batch_size=2)
+    es_uploader._get_client = MagicMock()
+    fingerprint_store = MagicMock()
+    es_uploader._get_fingerprint_store = MagicMock(return_value=fingerprint_store)
+
+    results = [
+        (True, {"index": {"_id": "1", "status": 201}}),
+        (False, {"index": {"_id": "2", "status": 400, "error": "mapper_parsing_exception"}}),
+    ]
+    with patch(f"search_gov_crawler.elasticsearch.es_batch_upload.helpers.{bulk_helper}", return_value=results):
+        counts, timings = es_uploader._bulk_upload(
+            [{"_id": "1", "title": "Document 1"}, {"_id": "2", "title": "Document 2"}],
+            sample_spider,
+            fingerprints={"1": "abc", "2": "def"},
+        )
+
+    assert counts["elasticsearch/bulk/docs_succeeded"] == 1
+    assert counts["elasticsearch/bulk/docs_failed"] == 1
+    assert set(timings) == {"elasticsearch_bulk"}
+    sample_spider.crawler.stats.inc_value.assert_not_called()
+    fingerprint_store.update.assert_called_once_with("test_index", {"1": "abc"})
+    sample_spider.logger.error.assert_any_call("Failed to load document 2: mapper_parsing_exception")
+    assert es_uploader._dead_letter_spool.file_path.exists()
+
+@pytest.fixture
+def mock_sleep():
+    with patch("search_gov_crawler.elasticsearch.es_batch_upload.time.sleep") as mock:
+        yield mock
+
+def test_bulk_with_retries_retryable_status(sample_spider, mock_sleep):
+    es_uploader = SearchGovElasticsearch(batch_size=2)
+    actions = [{"_index": "test_index", "_id": "1", "_source": {}}, {"_index": "test_index", "_id": "2", "_source": {}}]
+    es_uploader._bulk_results = MagicMock(
+        side_effect=[
+            [(True, {"index": {"_id": "1"}}), (False, {"index": {"_id": "2", "status": 429, "error": "busy"}})],
+            [(True, {"index": {"_id": "2"}})],
+        ]
+    )
+
+    uploaded_ids, dead_letters, retries = es_uploader._bulk_with_retries(MagicMock(), actions, sample_spider)
+
+    assert uploaded_ids == ["1", "2"]
+    assert dead_letters == []
+    assert retries == 1
+    assert es_uploader._bulk_results.call_args.args[1] == [actions[1]]
+    mock_sleep.assert_called_once_with(2.0)
+
+def test_bulk_with_retries_connection_error(sample_spider, mock_sleep, monkeypatch):
+    monkeypatch.setenv("SPIDER_ES_MAX_RETRIES", "2")
+    es_uploader = SearchGovElasticsearch(batch_size=2)
+    actions = [{"_index": "test_index", "_id": "1", "_source": {"title": "Document 1"}}]
+    es_uploader._bulk_results = MagicMock(side_effect=EsConnectionError("Connection refused"))
+
+    uploaded_ids, dead_letters, retries = es_uploader._bulk_with_retries(MagicMock(), actions, sample_spider)
+
+    assert uploaded_ids == []
+    assert [(entry["_id"], entry["_source"]) for entry in dead_letters] == [("1", {"title": "Document 1"})]
+    assert retries == 2
+    assert es_uploader._bulk_results.call_count == 3
+    assert [call.args[0] for call in mock_sleep.call_args_list] == [2.0, 4.0]
+
+def test_bulk_with_retries_permanent_failure(sample_spider, mock_sleep):
+    es_uploader = SearchGovElasticsearch(batch_size=2)
+    actions = [{"_index": "test_index", "_id": "1", "_source": {}}]
+    es_uploader._bulk_results = MagicMock(
+        return_value=[(False, {"index": {"_id": "1", "status": 400, "error": "mapper_parsing_exception"}})]
+    )
+
+    uploaded_ids, dead_letters, retries = es_uploader._bulk_with_retries(MagicMock(), actions, sample_spider)
+
+    assert uploaded_ids == []
+    assert dead_letters[0]["status"] == 400
+    assert retries == 0
+    mock_sleep.assert_not_called()
 
 def test_add_to_batch_no_doc(mock_convert_html, sample_spider):
     es_uploader = SearchGovElasticsearch(batch_size=2)
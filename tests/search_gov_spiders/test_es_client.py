@@ -0,0 +1,48 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from search_gov_crawler.elasticsearch import es_client
+
+
+@pytest.fixture(name="mock_elasticsearch")
+def fixture_mock_elasticsearch(mocker):
+    mocker.patch.object(es_client, "_clients", {})
+    mocker.patch.object(es_client, "_checked_indices", set())
+    return mocker.patch("search_gov_crawler.elasticsearch.es_client.Elasticsearch", side_effect=lambda **_: MagicMock())
+
+
+def test_get_es_client_shared(mock_elasticsearch):
+    client_1 = es_client.get_es_client(hosts="http://localhost:9200", username="user", password="pass")
+    client_2 = es_client.get_es_client(hosts="http://localhost:9200", username="user", password="pass")
+    client_3 = es_client.get_es_client(hosts="http://localhost:9300", username="user", password="pass")
+
+    assert client_1 is client_2
+    assert client_1 is not client_3
+    assert mock_elasticsearch.call_count == 2
+
+
+def test_get_es_client_settings(mock_elasticsearch, monkeypatch):
+    monkeypatch.setenv("SPIDER_ES_CONNECTIONS_PER_NODE", "25")
+    monkeypatch.setenv("SPIDER_ES_HTTP_COMPRESS", "false")
+    es_client.get_es_client(hosts="http://localhost:9200", username="user", password="pass")
+
+    assert mock_elasticsearch.call_args.kwargs["connections_per_node"] == 25
+    assert mock_elasticsearch.call_args.kwargs["http_compress"] is False
+
+
+@pytest.mark.parametrize(("exists", "created"), [(True, False), (False, True)])
+def test_ensure_index_checked_once(mock_elasticsearch, exists, created):
+    client = es_client.get_es_client(hosts="http://localhost:9200", username="user", password="pass")
+    client.indices.exists.return_value = exists
+
+    assert es_client.ensure_index(client, index_name="test_index", index_alias="test_alias") is created
+    assert es_client.ensure_index(client, index_name="test_index", index_alias="test_alias") is False
+
+    client.indices.exists.assert_called_once_with(index="test_index")
+    assert client.indices.create.call_count == int(created)
+
+
+def test_parse_es_urls_invalid_url():
+    with pytest.raises(ValueError, match="Invalid Elasticsearch URL"):
+        es_client.parse_es_urls("invalid-url")
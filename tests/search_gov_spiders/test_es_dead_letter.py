@@ -0,0 +1,99 @@
+from unittest.mock import MagicMock
+
+import pytest
+from elasticsearch import ConnectionError as EsConnectionError
+
+from search_gov_crawler.elasticsearch.es_dead_letter import (
+    DeadLetterSpool,
+    dead_letter_entry,
+    read_dead_letters,
+    replay_dead_letters,
+)
+
+
+@pytest.fixture(name="spool")
+def fixture_spool(tmp_path) -> DeadLetterSpool:
+    return DeadLetterSpool(directory=tmp_path)
+
+
+@pytest.fixture(name="entries")
+def fixture_entries() -> list[dict]:
+    return [
+        dead_letter_entry(
+            {"_index": "test_index", "_id": str(doc_id), "_source": {"title": f"Document {doc_id}"}},
+            {"status": 503, "error": "unavailable"},
+        )
+        for doc_id in range(3)
+    ]
+
+
+def test_dead_letter_spool_append(spool, entries):
+    spool.append(entries[:2])
+    spool.append(entries[2:])
+    spool.append([])
+
+    records = list(read_dead_letters(spool.file_path))
+    assert [record["_id"] for record in records] == ["0", "1", "2"]
+    assert records[0]["_source"] == {"title": "Document 0"}
+    assert records[0]["status"] == 503
+
+
+def test_replay_dead_letters(spool, entries, mocker, monkeypatch, tmp_path):
+    monkeypatch.setenv("SPIDER_ES_DEAD_LETTER_DIR", str(tmp_path / "replay"))
+    spool.append(entries)
+
+    mock_bulk = mocker.patch(
+        "search_gov_crawler.elasticsearch.es_dead_letter.helpers.streaming_bulk",
+        return_value=[
+            (True, {"index": {"_id": "0"}}),
+            (True, {"index": {"_id": "1"}}),
+            (False, {"index": {"_id": "2", "status": 400, "error": "mapper_parsing_exception"}}),
+        ],
+    )
+
+    loaded, failed = replay_dead_letters(file_paths=[spool.file_path], es_client=MagicMock())
+
+    assert (loaded, failed) == (2, 1)
+    assert not spool.file_path.exists()
+    assert len(mock_bulk.call_args.args[1]) == 3
+
+    replay_failures = list((tmp_path / "replay").glob("es-dead-letter-*.jsonl"))
+    assert [record["_id"] for record in read_dead_letters(replay_failures[0])] == ["2"]
+
+
+def test_replay_dead_letters_retries_connection_errors(spool, entries, mocker, monkeypatch, tmp_path):
+    monkeypatch.setenv("SPIDER_ES_DEAD_LETTER_DIR", str(tmp_path / "replay"))
+    monkeypatch.setenv("SPIDER_ES_INITIAL_BACKOFF", "0")
+    spool.append(entries)
+
+    def bulk_then_fail(*_args, **_kwargs):
+        yield True, {"index": {"_id": "0"}}
+        raise EsConnectionError("connection refused")
+
+    mock_bulk = mocker.patch(
+        "search_gov_crawler.elasticsearch.es_dead_letter.helpers.streaming_bulk",
+        side_effect=[bulk_then_fail(), [(True, {"index": {"_id": "1"}}), (True, {"index": {"_id": "2"}})]],
+    )
+
+    assert replay_dead_letters(file_paths=[spool.file_path], es_client=MagicMock()) == (3, 0)
+    assert [action["_id"] for action in mock_bulk.call_args.args[1]] == ["1", "2"]
+    assert not list(tmp_path.glob("*.replaying"))
+
+
+def test_replay_dead_letters_keeps_file_on_connection_errors(spool, entries, mocker, monkeypatch, tmp_path):
+    monkeypatch.setenv("SPIDER_ES_MAX_RETRIES", "1")
+    monkeypatch.setenv("SPIDER_ES_INITIAL_BACKOFF", "0")
+    spool.append(entries)
+    other_file = tmp_path / "es-dead-letter-p1.jsonl"
+    other_file.write_text(spool.file_path.read_text(encoding="utf-8"), encoding="utf-8")
+
+    mock_bulk = mocker.patch(
+        "search_gov_crawler.elasticsearch.es_dead_letter.helpers.streaming_bulk",
+        side_effect=EsConnectionError("connection refused"),
+    )
+
+    assert replay_dead_letters(file_paths=[spool.file_path, other_file], es_client=MagicMock()) == (0, 0)
+    assert mock_bulk.call_count == 4
+    assert [record["_id"] for record in read_dead_letters(spool.file_path)] == ["0", "1", "2"]
+    assert other_file.exists()
+    assert not list(tmp_path.glob("*.replaying"))
@@ -0,0 +1,44 @@
+import json
+import urllib.request
+
+import pytest
+from elasticsearch import helpers
+
+from search_gov_crawler.benchmarks.es_pipeline import peak_rss_mb, start_fake_elasticsearch
+from search_gov_crawler.elasticsearch.es_client import clear_clients, ensure_index, get_es_client
+
+BULK_BODY = b'{"index": {"_index": "benchmark", "_id": "1"}}\n{"title_en": "doc"}\n'
+
+
+@pytest.fixture(name="fake_es_hosts")
+def fixture_fake_es_hosts():
+    server = start_fake_elasticsearch(bulk_latency_seconds=0)
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    clear_clients()
+
+
+def test_fake_elasticsearch_bulk(fake_es_hosts):
+    es_client = get_es_client(hosts=fake_es_hosts, username="user", password="pass")
+    actions = [{"_index": "benchmark", "_id": str(i), "_source": {"title_en": f"doc {i}"}} for i in range(5)]
+
+    assert ensure_index(es_client, "benchmark", "benchmark-alias") is False
+    assert helpers.bulk(es_client, actions) == (5, [])
+
+
+@pytest.mark.parametrize(
+    ("method", "path", "body", "expected_key"),
+    [
+        ("POST", "/benchmark/_bulk", BULK_BODY, "items"),
+        ("PUT", "/_bulk?refresh=false", BULK_BODY, "items"),
+        ("PUT", "/benchmark", b"{}", "acknowledged"),
+    ],
+)
+def test_fake_elasticsearch_routes(fake_es_hosts, method, path, body, expected_key):
+    request = urllib.request.Request(f"{fake_es_hosts}{path}", data=body, method=method)
+    with urllib.request.urlopen(request) as response:  # nosec - local stand-in
+        assert expected_key in json.loads(response.read())
+
+
+def test_peak_rss_mb():
+    assert peak_rss_mb()["self"] > 0
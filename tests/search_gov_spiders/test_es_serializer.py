@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import pytest
+from elasticsearch.serializer import JsonSerializer
+
+from search_gov_crawler.benchmarks.es_serializer import benchmark_serializer
+from search_gov_crawler.benchmarks.httpcache_corpus import load_cached_pages
+from search_gov_crawler.elasticsearch.es_serializer import OrjsonSerializer, get_serializer
+
+
+@pytest.fixture(name="i14y_doc")
+def fixture_i14y_doc() -> dict:
+    return {"title_en": "Test Article Title", "content_en": "Some content – with unicode", "updated": datetime(2024, 3, 15)}
+
+
+def test_orjson_serializer_matches_json(i14y_doc):
+    assert OrjsonSerializer().loads(OrjsonSerializer().dumps(i14y_doc)) == JsonSerializer().loads(
+        JsonSerializer().dumps(i14y_doc)
+    )
+
+
+def test_orjson_serializer_bytes_passthrough():
+    assert OrjsonSerializer().dumps(b'{"already":"serialized"}') == b'{"already":"serialized"}'
+
+
+@pytest.mark.parametrize(("name", "serializer_cls"), [("orjson", OrjsonSerializer), ("json", JsonSerializer)])
+def test_get_serializer(name, serializer_cls):
+    assert type(get_serializer(name)) is serializer_cls
+
+
+def test_get_serializer_invalid():
+    with pytest.raises(ValueError, match="Invalid serializer value pickle!"):
+        get_serializer("pickle")
+
+
+def test_load_cached_pages():
+    pages = load_cached_pages()
+    assert pages
+    assert all(page.body for page in pages)
+
+
+def test_benchmark_serializer(i14y_doc):
+    lines = [{"index": {"_index": "benchmark", "_id": "1"}}, i14y_doc]
+    result = benchmark_serializer("orjson", lines, iterations=2)
+
+    assert result["serializer"] == "OrjsonSerializer"
+    assert result["documents"] == 1
+    assert 0 < result["gzip_body_bytes"] and 0 < result["body_bytes"]
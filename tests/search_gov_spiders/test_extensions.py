@@ -5,15 +5,20 @@ import tempfile
 
 import pytest
 from scrapy.crawler import Crawler
-from scrapy.exceptions import NotConfigured
+from scrapy.exceptions import NotConfigured, StopDownload
+from scrapy.http import Headers, Request
+from scrapy.http.request import NO_CALLBACK
 from scrapy.spiders import Spider
 from scrapy.utils.project import get_project_settings
+from scrapy.utils.test import get_crawler
 
 from search_gov_crawler.search_gov_spiders.extensions.json_logging import (
     JsonLogging,
     SearchGovSpiderFileHandler,
     SearchGovSpiderStreamHandler,
 )
+from search_gov_crawler.search_gov_spiders.extensions.download_filter import DownloadFilter
+from search_gov_crawler.search_gov_spiders.extensions.stage_timing import StageTiming
 
 
 class SpiderForTest(Spider):
@@ -146,3 +151,83 @@ def test_extension_spider_opened(caplog):
         "Starting spider test_spider with following args: allowed_domains=domain 1,domain 2 start_urls=url 1,url 2"
         in caplog.messages
     )
+
+
+def test_stage_timing_not_configured():
+    crawler = get_crawler(Spider, settings_dict={"STAGE_TIMING_LOG_INTERVAL": 0})
+
+    with pytest.raises(NotConfigured, match="StageTiming Extension is listed in Extension but is not enabled."):
+        StageTiming.from_crawler(crawler)
+
+
+def test_stage_timing_log_snapshot(caplog):
+    crawler = get_crawler(Spider, settings_dict={"STAGE_TIMING_LOG_INTERVAL": 60})
+    spider = crawler._create_spider(name="test_spider")  # pylint: disable=protected-access
+    extension = StageTiming.from_crawler(crawler)
+    crawler.stats.set_value("timing/dedup/count", 10)
+    crawler.stats.set_value("timing/dedup/wall_seconds", 0.01)
+
+    with caplog.at_level(logging.INFO):
+        snapshot = extension.log_snapshot(spider)
+
+    assert snapshot["dedup"]["count"] == 10
+    assert snapshot["dedup"]["avg_wall_ms"] == 1.0
+    assert "per_second" in snapshot["dedup"]
+    assert caplog.records[-1].stage_timings == snapshot
+
+
+def test_download_filter_not_enabled():
+    crawler = get_crawler(Spider, settings_dict={"DOWNLOAD_FILTER_ENABLED": False})
+    with pytest.raises(NotConfigured, match="DownloadFilter Extension is listed in Extension but is not enabled."):
+        DownloadFilter.from_crawler(crawler)
+
+
+DOWNLOAD_FILTER_TEST_CASES = [
+    (("csv",), b"text/html", 1000, False, ("csv",), None),
+    (("csv",), b"application/pdf", 1000, True, ("csv",), "body_not_needed"),
+    (("elasticsearch",), b"application/pdf", 1000, True, (), "content_type"),
+    (("elasticsearch",), b"text/html", 2000, False, (), None),
+    (("endpoint",), b"application/pdf", 2000, True, (), "max_bytes"),
+    (("elasticsearch",), b"text/html", -1, False, ("elasticsearch",), None),
+    (("csv", "elasticsearch"), b"text/html; charset=utf-8", 2000, False, ("csv",), None),
+]
+
+
+@pytest.mark.parametrize(
+    ("output_targets", "content_type", "body_length", "stopped", "download_output_targets", "reason"),
+    DOWNLOAD_FILTER_TEST_CASES,
+)
+def test_download_filter_headers_received(
+    output_targets, content_type, body_length, stopped, download_output_targets, reason
+):
+    crawler = get_crawler(
+        Spider,
+        settings_dict={
+            "DOWNLOAD_FILTER_ENABLED": True,
+            "OUTPUT_TARGET_MAX_BYTES": {"csv": 0, "endpoint": 1000, "elasticsearch": 1000},
+        },
+    )
+    # pylint: disable=protected-access
+    spider = crawler._create_spider(name="test_spider", output_targets=output_targets)
+    extension = DownloadFilter.from_crawler(crawler)
+    request = Request("https://www.example.com/file", callback=lambda response: None)
+
+    if stopped:
+        with pytest.raises(StopDownload) as stop_download:
+            extension.headers_received(Headers({"Content-Type": content_type}), body_length, request, spider)
+        assert stop_download.value.fail is False
+        assert crawler.stats.get_value(f"download_filter/stopped/{reason}") == 1
+    else:
+        extension.headers_received(Headers({"Content-Type": content_type}), body_length, request, spider)
+
+    assert request.meta["download_output_targets"] == download_output_targets
+
+
+def test_download_filter_skips_requests_not_handled_by_spider():
+    crawler = get_crawler(Spider, settings_dict={"DOWNLOAD_FILTER_ENABLED": True})
+    # pylint: disable=protected-access
+    spider = crawler._create_spider(name="test_spider", output_targets=("elasticsearch",))
+    extension = DownloadFilter.from_crawler(crawler)
+    robots_request = Request("https://www.example.com/robots.txt", callback=NO_CALLBACK)
+
+    assert extension.headers_received(Headers({"Content-Type": "text/plain"}), 100, robots_request, spider) is None
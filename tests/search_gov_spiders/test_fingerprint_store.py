@@ -0,0 +1,38 @@
+import pytest
+
+from search_gov_crawler.elasticsearch.fingerprint_store import FingerprintStore, document_fingerprint
+
+
+@pytest.fixture(name="fingerprint_store")
+def fixture_fingerprint_store(tmp_path):
+    store = FingerprintStore(tmp_path / "output" / "fingerprints.sqlite")
+    yield store
+    store.close()
+
+
+def test_document_fingerprint_ignores_volatile_fields():
+    doc = {"_id": "1", "content_en": "Some content", "created_at": "2024-01-01", "updated_at": "2024-01-01"}
+    same_doc = doc | {"_id": "2", "created_at": "2025-01-01", "updated_at": "2025-01-01"}
+    changed_doc = doc | {"content_en": "Other content"}
+
+    assert document_fingerprint(doc) == document_fingerprint(same_doc)
+    assert document_fingerprint(doc) != document_fingerprint(changed_doc)
+
+
+def test_fingerprint_store_unchanged(fingerprint_store):
+    assert not fingerprint_store.is_unchanged("index-1", "1", "abc")
+
+    fingerprint_store.update("index-1", {"1": "abc"})
+
+    assert fingerprint_store.is_unchanged("index-1", "1", "abc")
+    assert not fingerprint_store.is_unchanged("index-1", "1", "def")
+    assert not fingerprint_store.is_unchanged("index-2", "1", "abc")
+
+
+def test_fingerprint_store_clear(fingerprint_store):
+    fingerprint_store.update("index-1", {"1": "abc", "2": "def"})
+    fingerprint_store.update("index-2", {"1": "abc"})
+    fingerprint_store.clear("index-1")
+
+    assert not fingerprint_store.is_unchanged("index-1", "1", "abc")
+    assert fingerprint_store.is_unchanged("index-2", "1", "abc")
@@ -7,6 +7,8 @@ import pytest
 from scrapy.crawler import CrawlerProcess
 from scrapy.utils.project import get_project_settings
 
+from search_gov_crawler.search_gov_spiders.helpers.csv_writer import RotatingCsvWriter
+from search_gov_crawler.search_gov_spiders.helpers.url_batch import UrlBatch
 from search_gov_crawler.search_gov_spiders.spiders.domain_spider import DomainSpider
 from search_gov_crawler.search_gov_spiders.spiders.domain_spider_js import DomainSpiderJs
 
@@ -27,9 +29,14 @@ def fixture_mock_scrapy_settings(monkeypatch):
         "DOWNLOADER_MIDDLEWARES",
         {f"search_gov_crawler.{k}": v for k, v in dict(settings.get("DOWNLOADER_MIDDLEWARES").attributes).items()},
     )
+    settings.set("DUPEFILTER_CLASS", f"search_gov_crawler.{settings.get('DUPEFILTER_CLASS')}")
     settings.set(
         "EXTENSIONS",
-        {k: v for k, v in dict(settings.get("EXTENSIONS").attributes).items() if "json_logging" not in k},
+        {
+            f"search_gov_crawler.{k}" if k.startswith("search_gov_spiders.") else k: v
+            for k, v in dict(settings.get("EXTENSIONS").attributes).items()
+            if "json_logging" not in k
+        },
     )
     settings.set("HTTPCACHE_ENABLED", True)
     settings.set("HTTPCACHE_DBM_MODULE", "dbm.dumb")
@@ -117,13 +124,15 @@ def test_full_crawl(mock_scrapy_settings, monkeypatch, spider, use_dedup, crawl_
 
         def mock_init(pipeline_cls, *_args, temp_dir=temp_dir, **_kwargs):
             pipeline_cls.api_url = None
-            pipeline_cls.file_number = 1
-            pipeline_cls.parent_file_path = temp_dir
-            pipeline_cls.base_file_name = temp_dir / "output" / "all-links-p1234.csv"
-            pipeline_cls.file_path = pipeline_cls.base_file_name
-            pipeline_cls.current_file = open(pipeline_cls.file_path, "w", encoding="utf-8")
-            pipeline_cls.file_open = False
+            pipeline_cls.urls_batch = UrlBatch(max_bytes=max_file_size)
+            pipeline_cls.file_batch = UrlBatch(max_bytes=max_file_size)
+            pipeline_cls._conversion_pool = None
+            pipeline_cls._csv_writer = RotatingCsvWriter(
+                output_dir=temp_dir / "output", base_name="all-links-p1234", max_bytes=max_file_size
+            )
             pipeline_cls._es = None
+            pipeline_cls._urls_api = None
+            pipeline_cls._flush_loop = None
 
         monkeypatch.setattr(
             "search_gov_crawler.search_gov_spiders.pipelines.SearchGovSpidersPipeline.__init__", mock_init
@@ -1,19 +1,61 @@
 from collections import namedtuple
 
 import pytest
+from scrapy.http import HtmlResponse
+from scrapy.http import Request as ScrapyRequest
 
 from search_gov_crawler.search_gov_spiders.helpers import domain_spider as helpers
 from search_gov_crawler.search_gov_spiders.spiders.domain_spider_js import should_abort_request
 
 @pytest.mark.parametrize(
     ("content_type_header", "result"),
-    [("text/html", True), ("application/msword.more.and.more", True), ("Something/Else", False)],
-    ids=["good", "regex", "bad"],
+    [
+        ("text/html", True),
+        (b"Text/HTML; charset=utf-8", True),
+        ("application/msword.more.and.more", False),
+        ("application/vnd_ms-excel", False),
+        ("Something/Else", False),
+        (None, False),
+    ],
+    ids=["good", "bytes-params", "suffix", "unescaped-dot", "bad", "missing"],
 )
 def test_is_valid_content_type(content_type_header, result):
-    helpers._use_content_type = helpers.ALLOWED_CONTENT_TYPE
     assert helpers.is_valid_content_type(content_type_header, "csv") is result
 
+
+@pytest.mark.parametrize(
+    ("content_type_header", "expected_output_targets"),
+    [
+        (b"text/html", ("csv", "elasticsearch")),
+        (b"application/pdf", ("csv",)),
+        (b"image/png", ()),
+    ],
+)
+def test_get_output_targets(content_type_header, expected_output_targets):
+    assert helpers.get_output_targets(content_type_header, ("csv", "elasticsearch")) == expected_output_targets
+
+@pytest.mark.parametrize(
+    ("content_type_header", "output_targets", "result"),
+    [
+        (b"text/html", ("csv",), True),
+        (b"application/pdf", ("csv",), False),
+        (b"application/pdf", ("csv", "elasticsearch"), True),
+    ],
+)
+def test_is_body_needed(content_type_header, output_targets, result):
+    assert helpers.is_body_needed(content_type_header, output_targets) is result
+
+
+@pytest.mark.parametrize(
+    ("meta", "expected_output_targets"),
+    [({}, ("csv", "elasticsearch")), ({"download_output_targets": ("csv",)}, ("csv",))],
+)
+def test_get_response_output_targets(meta, expected_output_targets):
+    request = ScrapyRequest("https://www.example.com", meta=meta)
+    response = HtmlResponse(url=request.url, request=request, headers={"Content-Type": "text/html"}, body=b"")
+    assert helpers.get_response_output_targets(response, ("csv", "elasticsearch")) == expected_output_targets
+
+
 def test_get_crawl_sites_test_file(crawl_sites_test_file):
     assert len(helpers.get_crawl_sites(str(crawl_sites_test_file.resolve()))) == 4
 
@@ -0,0 +1,29 @@
+import pytest
+
+from search_gov_crawler.search_gov_spiders.helpers.host_path_matcher import HostPathMatcher
+
+HOST_PATH_MATCHER_TEST_CASES = [
+    (["example.com"], "www.example.com", "/1", True),
+    (["example.com"], "example.com", "", True),
+    (["Example.com"], "EXAMPLE.COM", "/1", True),
+    (["example.com"], "notexample.com", "/1", False),
+    (["example.com"], "example.com.evil.org", "/1", False),
+    (["sub.example.com"], "example.com", "/1", False),
+    (["example.com/path"], "example.com", "/1", False),
+    (["example.com/path"], "www.example.com", "/path/1", True),
+    (["example.com/path/"], "example.com", "/other/example.com/path/", False),
+    (["example.com/path/", "example.com/other/"], "example.com", "/other/1", True),
+    (["example.com/path/", "sub.example.com"], "sub.example.com", "/1", True),
+    (["example.com/"], "example.com", "", True),
+]
+
+
+@pytest.mark.parametrize(("domain_paths", "host", "path", "expected"), HOST_PATH_MATCHER_TEST_CASES)
+def test_host_path_matcher(domain_paths, host, path, expected):
+    assert HostPathMatcher(domain_paths).match(host, path) is expected
+
+
+def test_host_path_matcher_len():
+    matcher = HostPathMatcher(["example.com/path/", "example.com/other/"])
+    matcher.add("example.gov")
+    assert len(matcher) == 3
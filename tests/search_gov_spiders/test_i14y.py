@@ -1,3 +1,7 @@
+from types import SimpleNamespace
+
+import pytest
+
 from search_gov_crawler.elasticsearch import convert_html_i14y as conversion
 from search_gov_crawler.search_gov_spiders.helpers import content
 
@@ -33,6 +37,34 @@ def test_convert_html_valid_article():
     assert result["url_path"] == "/test-article"
     assert len(result["_id"]) == 64  # SHA256 hash
 
+@pytest.mark.parametrize(
+    ("canonicalization_rules", "id_url"),
+    [
+        ((), "https://Example.com/test-article?b=2&a=1"),
+        (("lowercase_host", "sort_query"), "https://example.com/test-article?a=1&b=2"),
+    ],
+)
+def test_convert_html_document_id(canonicalization_rules, id_url):
+    html_content = """
+    <html lang="en">
+    <head>
+        <title>Test Article Title</title>
+        <meta name="description" content="Test article description.">
+    </head>
+    <body>
+        <p>This is the main content of the test article.</p>
+    </body>
+    </html>
+    """
+    result = conversion.convert_html(
+        html_content,
+        "https://Example.com/test-article?b=2&a=1",
+        nlp_mode="off",
+        canonicalization_rules=canonicalization_rules,
+    )
+
+    assert result["_id"] == conversion.generate_url_sha256(id_url)
+
 def test_convert_html_no_content():
     html_content = """
     <html lang="en">
@@ -116,3 +148,93 @@ def test_convert_html_languages():
     assert result is not None
     assert result["title_zh"] == "Some Title"
     assert result["description_zh"] == content.sanitize_text("这是一个测试描述")
+
+@pytest.mark.parametrize(
+    ("nlp_mode", "meta_description", "tags", "expected"),
+    [
+        ("always", "description", {"tag"}, True),
+        ("off", None, set(), False),
+        ("lazy", "description", {"tag"}, False),
+        ("lazy", None, {"tag"}, True),
+        ("lazy", "description", set(), False),
+    ],
+)
+def test_needs_nlp(nlp_mode, meta_description, tags, expected):
+    article = SimpleNamespace(meta_description=meta_description, tags=tags)
+    assert conversion.needs_nlp(article, nlp_mode) is expected
+
+@pytest.mark.parametrize(
+    ("nlp_mode", "tags", "meta_keywords", "expected"),
+    [
+        ("lazy", set(), [""], True),
+        ("lazy", {"tag"}, [""], False),
+        ("lazy", set(), ["keyword"], False),
+        ("off", set(), [""], False),
+        ("always", set(), [""], False),
+    ],
+)
+def test_needs_keywords(nlp_mode, tags, meta_keywords, expected):
+    article = SimpleNamespace(tags=tags, meta_keywords=meta_keywords)
+    assert conversion.needs_keywords(article, nlp_mode) is expected
+
+def test_convert_html_keywords_only(mocker):
+    html_content = """
+    <html lang="en">
+    <head>
+        <title>Fish Market News</title>
+        <meta name="description" content="Test article description.">
+    </head>
+    <body>
+        <p>The fish market opened today with record fish sales across the harbor.</p>
+    </body>
+    </html>
+    """
+    mock_nlp = mocker.patch("newspaper.Article.nlp")
+    timings = {}
+    result = conversion.convert_html(
+        html_content, "https://example.com/test-article", nlp_mode="lazy", timings=timings
+    )
+
+    mock_nlp.assert_not_called()
+    assert "convert_html/keywords" in timings
+    assert result["tags"][0] == "fish"
+
+def test_convert_html_nlp_off(mocker):
+    html_content = """
+    <html lang="en">
+    <head>
+        <title>Test Article Title</title>
+    </head>
+    <body>
+        <p>This is the main content of the test article.</p>
+    </body>
+    </html>
+    """
+    mock_nlp = mocker.patch("newspaper.Article.nlp")
+    result = conversion.convert_html(html_content, "https://example.com/test-article", nlp_mode="off")
+
+    mock_nlp.assert_not_called()
+    assert result["description_en"] is None
+    assert "This is the main content of the test article." in result["content_en"]
+
+def test_convert_html_invalid_nlp_mode():
+    with pytest.raises(ValueError, match="Invalid nlp_mode value sometimes!"):
+        conversion.convert_html("<html></html>", "https://example.com", nlp_mode="sometimes")
+
+def test_convert_html_timings():
+    html_content = """
+    <html lang="en">
+    <head>
+        <title>Test Article Title</title>
+        <meta name="description" content="Test article description.">
+    </head>
+    <body>
+        <p>This is the main content of the test article.</p>
+    </body>
+    </html>
+    """
+    timings = {}
+    conversion.convert_html(html_content, "https://example.com/test-article", nlp_mode="off", timings=timings)
+
+    assert set(timings) == {"convert_html/parse", "convert_html/sanitize"}
+    assert all(wall_seconds >= 0 and cpu_seconds >= 0 for wall_seconds, cpu_seconds in timings.values())
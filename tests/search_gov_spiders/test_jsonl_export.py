@@ -0,0 +1,131 @@
+import json
+import os
+from unittest.mock import MagicMock
+
+import pytest
+from elasticsearch import ConnectionError as EsConnectionError
+
+from search_gov_crawler.elasticsearch.es_dead_letter import read_dead_letters
+from search_gov_crawler.elasticsearch.jsonl_export import (
+    EXPORT_GLOB,
+    RotatingJsonlWriter,
+    SearchGovJsonlExport,
+    load_jsonl_files,
+    read_jsonl_docs,
+)
+
+DOCS = [{"_id": str(doc_id), "title": f"Document {doc_id}", "content": "x" * 40} for doc_id in range(5)]
+
+
+@pytest.fixture(name="sample_spider")
+def fixture_sample_spider():
+    spider = MagicMock()
+    spider.crawler.stats.get_stats.return_value = {}
+    return spider
+
+
+@pytest.fixture(name="export_env")
+def fixture_export_env(tmp_path, mocker):
+    mocker.patch.dict(
+        os.environ,
+        {
+            "SPIDER_JSONL_EXPORT_DIR": str(tmp_path / "jsonl-export"),
+            "SPIDER_JSONL_EXPORT_MAX_BYTES": "200",
+            "SPIDER_ES_CONVERT_WORKERS": "0",
+            "SPIDER_ES_DEAD_LETTER_DIR": str(tmp_path / "dead-letter"),
+        },
+    )
+    return tmp_path / "jsonl-export"
+
+
+@pytest.mark.parametrize(("compression", "suffix"), [("", ".jsonl"), ("gzip", ".jsonl.gz"), ("zstd", ".jsonl.zst")])
+def test_rotating_jsonl_writer(tmp_path, compression, suffix):
+    jsonl_writer = RotatingJsonlWriter(
+        output_dir=tmp_path, base_name="i14y-documents-p1234", max_bytes=200, compression=compression
+    )
+    jsonl_writer.write_docs(DOCS)
+    manifest_path = jsonl_writer.close()
+
+    export_files = sorted(tmp_path.glob(EXPORT_GLOB))
+    assert [path.name for path in export_files] == [f"i14y-documents-p1234-{n}{suffix}" for n in (1, 2, 3)]
+    assert [doc for path in export_files for doc in read_jsonl_docs(path)] == DOCS
+
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    assert manifest["total_docs"] == 5
+    assert [entry["docs"] for entry in manifest["files"]] == [2, 2, 1]
+
+
+def test_jsonl_export(export_env, sample_spider, mocker):
+    mocker.patch("search_gov_crawler.elasticsearch.jsonl_export.convert_html", side_effect=[*DOCS[:3], None])
+    jsonl_export = SearchGovJsonlExport()
+
+    for doc_id in range(4):
+        jsonl_export.add_to_export(
+            html_content="<html></html>", url=f"https://example.com/{doc_id}", spider=sample_spider
+        )
+    jsonl_export.close(sample_spider)
+
+    export_files = sorted(export_env.glob(EXPORT_GLOB))
+    assert [doc for path in export_files for doc in read_jsonl_docs(path)] == DOCS[:3]
+    assert all(path.suffix == ".gz" for path in export_files)
+    sample_spider.logger.warning.assert_called_once_with("Did not create i14y document for URL: https://example.com/3")
+    sample_spider.crawler.stats.inc_value.assert_any_call("jsonl_export/docs", 1, spider=sample_spider)
+
+
+def test_load_jsonl_files(export_env, mocker):
+    jsonl_writer = RotatingJsonlWriter(
+        output_dir=export_env, base_name="i14y-documents-p1234", max_bytes=200, compression="gzip"
+    )
+    jsonl_writer.write_docs(DOCS)
+    jsonl_writer.close()
+
+    def _streaming_bulk(_client, actions, **_kwargs):
+        for action in actions:
+            if action["_id"] == "3":
+                yield False, {"index": {"_id": "3", "status": 400, "error": "mapper_parsing_exception"}}
+            else:
+                yield True, {"index": {"_id": action["_id"]}}
+
+    mock_bulk = mocker.patch(
+        "search_gov_crawler.elasticsearch.jsonl_export.helpers.streaming_bulk", side_effect=_streaming_bulk
+    )
+    export_files = sorted(export_env.glob(EXPORT_GLOB))
+
+    loaded, failed = load_jsonl_files(export_files, es_client=MagicMock(), index_name="test_index", workers=2)
+
+    assert (loaded, failed) == (4, 1)
+    assert mock_bulk.call_count == 3
+    assert not list(export_env.glob(EXPORT_GLOB))
+    assert sorted(path.name for path in (export_env / "loaded").iterdir()) == [path.name for path in export_files]
+
+    dead_letters = [
+        record
+        for path in (export_env.parent / "dead-letter").glob("*.jsonl")
+        for record in read_dead_letters(path)
+    ]
+    assert [(record["_index"], record["_id"], record["_source"]) for record in dead_letters] == [
+        ("test_index", "3", {"title": "Document 3", "content": "x" * 40})
+    ]
+
+
+def test_load_jsonl_files_keeps_files_that_fail(export_env, mocker):
+    jsonl_writer = RotatingJsonlWriter(
+        output_dir=export_env, base_name="i14y-documents-p1234", max_bytes=200, compression="gzip"
+    )
+    jsonl_writer.write_docs(DOCS)
+    jsonl_writer.close()
+    export_files = sorted(export_env.glob(EXPORT_GLOB))
+
+    def _streaming_bulk(_client, actions, **_kwargs):
+        for action in actions:
+            if action["_id"] == "0":
+                raise EsConnectionError("connection refused")
+            yield True, {"index": {"_id": action["_id"]}}
+
+    mocker.patch("search_gov_crawler.elasticsearch.jsonl_export.helpers.streaming_bulk", side_effect=_streaming_bulk)
+
+    loaded, failed = load_jsonl_files(export_files, es_client=MagicMock(), index_name="test_index", workers=1)
+
+    assert (loaded, failed) == (3, 0)
+    assert [path.name for path in export_env.glob(EXPORT_GLOB)] == [export_files[0].name]
+    assert len(list((export_env / "loaded").iterdir())) == len(export_files) - 1
@@ -0,0 +1,127 @@
+import pytest
+from scrapy.http import HtmlResponse, Request
+from scrapy.linkextractors import LinkExtractor
+
+from search_gov_crawler.benchmarks.httpcache_corpus import DEFAULT_HTTPCACHE_DIR
+from search_gov_crawler.benchmarks.link_extractor import (
+    benchmark_link_extractor,
+    build_responses,
+    generic_link_extractor,
+)
+from search_gov_crawler.search_gov_spiders.helpers.domain_spider import domain_spider_link_extractor
+from search_gov_crawler.search_gov_spiders.helpers.link_extractor import (
+    SearchGovLinkExtractor,
+    compile_deny_regex,
+    compile_extension_regex,
+    unique_requests,
+)
+from search_gov_crawler.search_gov_spiders.helpers.url_canonicalization import DEFAULT_CANONICALIZATION_RULES
+
+HTML_BODY = b"""
+<html>
+  <head><base href="https://www.example.gov/base/"></head>
+  <body>
+    <a href="page.html">Page <span>One</span></a>
+    <a href="page.html#section">Page Fragment</a>
+    <a href="/calendar/event">Calendar</a>
+    <a href="/files/report.PDF">Report</a>
+    <a href="mailto:someone@example.gov">Email</a>
+    <a href="javascript:void(0)">Script</a>
+    <a href=" /padded ">Padded</a>
+    <a href="/nofollow" rel="nofollow">No Follow</a>
+    <area href="/area">
+    <va-link href="/va-link"></va-link>
+    <a>No Href</a>
+  </body>
+</html>
+"""
+
+
+@pytest.fixture(name="html_response")
+def fixture_html_response() -> HtmlResponse:
+    return HtmlResponse(url="https://www.example.gov/start", body=HTML_BODY, encoding="utf-8")
+
+
+@pytest.fixture(name="link_extractor")
+def fixture_link_extractor() -> SearchGovLinkExtractor:
+    return SearchGovLinkExtractor(deny=["calendar"], deny_extensions=["pdf"], tags=("a", "area", "va-link"))
+
+
+def test_extract_links(link_extractor, html_response):
+    assert [link.url for link in link_extractor.extract_links(html_response)] == [
+        "https://www.example.gov/base/page.html",
+        "https://www.example.gov/base/page.html#section",
+        "https://www.example.gov/padded",
+        "https://www.example.gov/nofollow",
+        "https://www.example.gov/area",
+        "https://www.example.gov/va-link",
+    ]
+
+
+def test_extract_links_text_and_nofollow(link_extractor, html_response):
+    links = {link.url: link for link in link_extractor.extract_links(html_response)}
+    assert links["https://www.example.gov/base/page.html"].text == "Page One"
+    assert links["https://www.example.gov/nofollow"].nofollow is True
+    assert links["https://www.example.gov/padded"].nofollow is False
+
+
+def test_extract_links_matches_generic_link_extractor(link_extractor, html_response):
+    generic = LinkExtractor(deny=["calendar"], deny_extensions=["pdf"], tags=("a", "area", "va-link"), unique=True)
+    assert link_extractor.extract_links(html_response) == generic.extract_links(html_response)
+
+
+@pytest.mark.parametrize(
+    ("canonicalization_rules", "expected_urls"),
+    [
+        (DEFAULT_CANONICALIZATION_RULES, ["https://example.gov/a?x=1&y=2", "https://example.gov/b"]),
+        ((), ["https://example.gov/a?x=1&y=2", "https://example.gov/a?y=2&x=1", "https://example.gov/b"]),
+    ],
+)
+def test_unique_requests(canonicalization_rules, expected_urls):
+    requests = [
+        Request("https://example.gov/a?x=1&y=2"),
+        Request("https://example.gov/a?y=2&x=1"),
+        Request("https://example.gov/a?x=1&y=2"),
+        Request("https://example.gov/b"),
+    ]
+    assert [request.url for request in unique_requests(requests, canonicalization_rules)] == expected_urls
+
+
+@pytest.mark.parametrize(
+    ("deny", "url", "result"),
+    [
+        (["calendar", "location-contact"], "https://example.gov/events/calendar", True),
+        (["calendar", "location-contact"], "https://example.gov/events", False),
+        ([], "https://example.gov/events", None),
+    ],
+)
+def test_compile_deny_regex(deny, url, result):
+    deny_regex = compile_deny_regex(deny)
+    assert (deny_regex if deny_regex is None else bool(deny_regex.search(url))) is result
+
+
+@pytest.mark.parametrize(
+    ("path", "result"),
+    [("files/report.pdf", True), ("files/report.PDF", True), ("files/report.pdf.html", False), ("pdf", False)],
+)
+def test_compile_extension_regex(path, result):
+    assert bool(compile_extension_regex([".pdf", "doc"]).search(path)) is result
+
+
+@pytest.fixture(name="cached_responses", scope="module")
+def fixture_cached_responses() -> list[HtmlResponse]:
+    return build_responses(cache_dir=DEFAULT_HTTPCACHE_DIR)
+
+
+def test_same_links_as_generic_link_extractor(cached_responses):
+    assert cached_responses
+    for response in cached_responses:
+        assert domain_spider_link_extractor.extract_links(response) == generic_link_extractor.extract_links(response)
+
+
+def test_benchmark_link_extractor(cached_responses):
+    result = benchmark_link_extractor("search_gov", domain_spider_link_extractor, cached_responses[:5], iterations=1)
+    assert result["link_extractor"] == "search_gov"
+    assert result["pages"] == 5
+    assert result["links"] == sum(len(page_links) for page_links in result["link_urls"])
+    assert result["seconds_per_page"] >= 0
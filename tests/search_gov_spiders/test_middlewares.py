@@ -1,12 +1,19 @@
+import hashlib
+
 import pytest
 
 from scrapy import Request, Spider
 from scrapy.exceptions import IgnoreRequest
+from scrapy.http import HtmlResponse
 from scrapy.utils.test import get_crawler
+from search_gov_crawler.search_gov_spiders.helpers.domain_spider import CRAWL_STATE_OUTLINKS_META
 from search_gov_crawler.search_gov_spiders.middlewares import (
+    SearchGovSpidersCrawlStateMiddleware,
     SearchGovSpidersOffsiteMiddleware,
     SearchGovSpidersDownloaderMiddleware,
+    SearchGovSpidersSpiderMiddleware,
 )
+from search_gov_crawler.search_gov_spiders.spiders.domain_spider import DomainSpider
 
 
 MIDDLEWARE_TEST_CASES = [
@@ -18,6 +25,9 @@ MIDDLEWARE_TEST_CASES = [
     (["sub.example.com"], ["sub.example.com/path/"], "http://sub.example.com/path/1", True),
     (["example.com"], None, "http://www.example.com/2", True),
     (["example.com"], [None], "http://www.example.com/2", True),
+    (["example.com"], ["example.com/path"], "http://example.com/other/example.com/path", False),
+    (["example.com"], ["example.com/path"], "http://example.com/1?next=example.com/path", False),
+    (["example.com"], ["sub.example.com", "example.com/path"], "http://sub.example.com/1", True),
 ]
 
 
@@ -38,6 +48,26 @@ def test_offsite_process_request_domain_filtering(allowed_domain, allowed_domain
             mw.process_request(request, spider)
 
 
+def test_offsite_host_path_stats():
+    # pylint: disable=protected-access
+    crawler = get_crawler(Spider)
+    spider = crawler._create_spider(
+        name="offsite_test", allowed_domains=["example.com"], allowed_domain_paths=["example.com/path/"]
+    )
+    mw = SearchGovSpidersOffsiteMiddleware.from_crawler(crawler)
+    mw.spider_opened(spider)
+
+    assert mw.process_request(Request("http://example.com/path/1"), spider) is None
+    with pytest.raises(IgnoreRequest):
+        mw.process_request(Request("http://example.com/other/1"), spider)
+    with pytest.raises(IgnoreRequest):
+        mw.process_request(Request("http://example.org/path/1"), spider)
+
+    assert crawler.stats.get_value("offsite/host_path/entries") == 1
+    assert crawler.stats.get_value("offsite/host_path/matched") == 1
+    assert crawler.stats.get_value("offsite/host_path/unmatched") == 1
+
+
 INVALID_DOMAIN_TEST_CASES = [
     (
         ["example.com"],
@@ -97,3 +127,157 @@ def test_spider_downloader_middleware_allow_query_string():
     request = Request("http://www.example.com/test?parm=value")
 
     assert mw.process_request(request=request, spider=spider) is None
+
+
+@pytest.mark.parametrize(
+    ("allow_query_string", "expected_urls"),
+    [
+        (False, ["http://www.example.com/path/1", "http://other.com/allowed"]),
+        (True, ["http://www.example.com/path/1", "http://www.example.com/path/2?page=2", "http://other.com/allowed"]),
+    ],
+)
+def test_spider_middleware_filters_output(allow_query_string, expected_urls):
+    # pylint: disable=protected-access
+    crawler = get_crawler(Spider)
+    spider = crawler._create_spider(
+        name="test",
+        allow_query_string=allow_query_string,
+        allowed_domains=["example.com"],
+        allowed_domain_paths=["example.com/path/"],
+    )
+    offsite_mw = SearchGovSpidersOffsiteMiddleware.from_crawler(crawler)
+    offsite_mw.spider_opened(spider)
+    mw = SearchGovSpidersSpiderMiddleware.from_crawler(crawler)
+    mw.spider_opened(spider)
+    assert spider.offsite_middleware is offsite_mw
+
+    item = {"url": "http://www.example.com/path/"}
+    result = [
+        Request("http://www.example.com/path/1"),
+        Request("http://www.example.com/path/2?page=2"),
+        Request("http://www.example.com/other/1"),
+        Request("http://other.com/1"),
+        Request("http://other.com/allowed", dont_filter=True),
+        item,
+    ]
+    response = HtmlResponse(url="http://www.example.com/path/", body=b"")
+    output = list(mw.process_spider_output(response, result, spider))
+
+    assert [request.url for request in output if isinstance(request, Request)] == expected_urls
+    assert output[-1] is item
+    assert crawler.stats.get_value("spider_output/filtered/query_string") == (None if allow_query_string else 1)
+    assert crawler.stats.get_value("spider_output/filtered/offsite") == 2
+    assert crawler.stats.get_value("offsite/host_path/matched") is None
+    assert crawler.stats.get_value("offsite/host_path/unmatched") is None
+
+
+@pytest.fixture(name="crawl_state_spider")
+def fixture_crawl_state_spider(tmp_path, mocker, request):
+    # pylint: disable=protected-access
+    crawler = get_crawler(DomainSpider, settings_dict={"CRAWL_STATE_DIR": str(tmp_path)})
+    spider = crawler._create_spider(
+        allowed_domains="example.com",
+        start_urls="https://www.example.com/",
+        output_target=getattr(request, "param", "csv"),
+        job_id="test-job",
+    )
+    mw = SearchGovSpidersCrawlStateMiddleware.from_crawler(crawler)
+    mw.spider_opened(spider)
+    yield spider, mw
+    mw.spider_closed(spider)
+
+
+def test_crawl_state_middleware_records_and_sends_conditional_requests(crawl_state_spider):
+    spider, mw = crawl_state_spider
+    request = Request("https://www.example.com/page")
+    response = HtmlResponse(
+        url=request.url, request=request, body=b"<html></html>", headers={"ETag": '"abc"'}, status=200
+    )
+    assert mw.process_response(request, response, spider) is response
+    assert spider.crawl_state.get("https://www.example.com/page") is None
+
+    mw.item_scraped({"url": request.url}, response, spider)
+    assert spider.crawl_state.get("https://www.example.com/page").etag == '"abc"'
+
+    outlink_request = Request("https://www.example.com/next", meta={"rule": 0, "link_text": "Next"})
+    output = SearchGovSpidersSpiderMiddleware().process_spider_output(response, [outlink_request], spider)
+    assert list(output) == [outlink_request]
+
+    conditional_request = Request("https://www.example.com/page#top")
+    assert mw.process_request(conditional_request, spider) is None
+    assert conditional_request.headers.get("If-None-Match") == b'"abc"'
+
+
+def test_crawl_state_middleware_records_only_scraped_items(crawl_state_spider):
+    spider, mw = crawl_state_spider
+    request = Request("https://www.example.com/page")
+    response = HtmlResponse(url=request.url, request=request, body=b"<html></html>", status=200)
+
+    # the item was dropped or failed in the pipeline, so item_scraped is never sent
+    assert mw.process_response(request, response, spider) is response
+    assert spider.crawl_state.get("https://www.example.com/page") is None
+
+
+@pytest.mark.parametrize("crawl_state_spider", ["elasticsearch"], indirect=True)
+@pytest.mark.parametrize(("status", "body"), [(304, b""), (200, b'<html><a href="/next">Next</a></html>')])
+def test_crawl_state_middleware_follows_unchanged_urls(crawl_state_spider, status, body):
+    # pylint: disable=protected-access
+    spider, mw = crawl_state_spider
+    request = Request("https://www.example.com/page")
+    content_hash = hashlib.sha256(b'<html><a href="/next">Next</a></html>').hexdigest()
+    spider.crawl_state.record_response("https://www.example.com/page", '"abc"', None, content_hash)
+    spider.crawl_state.record_outlinks("https://www.example.com/page", [(0, "https://www.example.com/next", "Next")])
+
+    response = HtmlResponse(url=request.url, request=request, body=body, status=status)
+    assert mw.process_response(request, response, spider) is response
+    assert not list(spider.parse_item(response))
+
+    follow_requests = list(spider._requests_to_follow(response))
+    assert [follow_request.url for follow_request in follow_requests] == ["https://www.example.com/next"]
+    assert follow_requests[0].callback == spider._callback
+    assert follow_requests[0].meta["link_text"] == "Next"
+    assert spider.crawler.stats.get_value("crawl_state/replayed_outlinks") == (1 if status == 304 else None)
+
+
+@pytest.mark.parametrize("crawl_state_spider", ["csv", "csv,elasticsearch"], indirect=True)
+@pytest.mark.parametrize(("status", "body"), [(304, b""), (200, b"<html></html>")])
+def test_crawl_state_middleware_outputs_unchanged_urls(crawl_state_spider, status, body):
+    spider, mw = crawl_state_spider
+    request = Request("https://www.example.com/page")
+    content_hash = hashlib.sha256(b"<html></html>").hexdigest()
+    spider.crawl_state.record_response("https://www.example.com/page", '"abc"', None, content_hash)
+    spider.crawl_state.record_outlinks("https://www.example.com/page", [(0, "https://www.example.com/next", "Next")])
+
+    response = HtmlResponse(
+        url=request.url, request=request, body=body, status=status, headers={"Content-Type": "text/html"}
+    )
+    assert mw.process_response(request, response, spider) is response
+
+    items = list(spider.parse_item(response))
+    assert [(item["url"], item["output_target"]) for item in items] == [(request.url, "csv")]
+    assert (CRAWL_STATE_OUTLINKS_META in response.meta) is (status == 304)
+    assert (304 in response.meta.get("handle_httpstatus_list", ())) is (status == 304)
+
+
+def test_crawl_state_middleware_skips_stopped_downloads(crawl_state_spider):
+    spider, mw = crawl_state_spider
+    request = Request("https://www.example.com/file.pdf")
+    response = HtmlResponse(url=request.url, request=request, body=b"", flags=["download_stopped"])
+
+    assert mw.process_response(request, response, spider) is response
+    assert spider.crawl_state.get("https://www.example.com/file.pdf") is None
+
+
+def test_crawl_state_middleware_disabled_without_job_id(tmp_path):
+    # pylint: disable=protected-access
+    crawler = get_crawler(DomainSpider, settings_dict={"CRAWL_STATE_DIR": str(tmp_path)})
+    spider = crawler._create_spider(
+        allowed_domains="example.com", start_urls="https://www.example.com/", output_target="csv"
+    )
+    mw = SearchGovSpidersCrawlStateMiddleware.from_crawler(crawler)
+    mw.spider_opened(spider)
+
+    request = Request("https://www.example.com/page")
+    response = HtmlResponse(url=request.url, request=request, body=b"", status=304)
+    assert mw.process_response(request, response, spider) is response
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,25 @@
+import pytest
+
+from search_gov_crawler.search_gov_spiders.helpers.output_targets import (
+    invalid_output_targets,
+    parse_output_targets,
+)
+
+
+@pytest.mark.parametrize(
+    ("output_target", "expected_output_targets"),
+    [
+        ("csv", ("csv",)),
+        ("csv,elasticsearch", ("csv", "elasticsearch")),
+        (" elasticsearch , csv,elasticsearch,", ("elasticsearch", "csv")),
+        (["endpoint", "csv"], ("endpoint", "csv")),
+        ("", ()),
+        (None, ()),
+    ],
+)
+def test_parse_output_targets(output_target, expected_output_targets):
+    assert parse_output_targets(output_target) == expected_output_targets
+
+
+def test_invalid_output_targets():
+    assert invalid_output_targets(("csv", "index", "elasticsearch", "file")) == ["index", "file"]
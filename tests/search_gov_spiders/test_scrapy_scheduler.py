@@ -27,6 +27,33 @@ def test_run_scrapy_crawl(caplog, monkeypatch):
     ) in caplog.messages
 
 
+@pytest.mark.parametrize(
+    ("canonicalization_rules", "expected_arg"),
+    [(None, ""), ("strip_www,force_https", " -a canonicalization_rules='strip_www,force_https'")],
+)
+def test_run_scrapy_crawl_canonicalization_rules(mocker, canonicalization_rules, expected_arg):
+    mock_run = mocker.patch.object(subprocess, "run")
+    run_scrapy_crawl(
+        "test_spider",
+        False,
+        "test-domain.example.com",
+        "http://starting-url.example.com/",
+        "csv",
+        canonicalization_rules,
+    )
+
+    assert mock_run.call_args.args[0].endswith(f"-a output_target=csv{expected_arg}")
+
+
+def test_run_scrapy_crawl_job_id(mocker):
+    mock_run = mocker.patch.object(subprocess, "run")
+    run_scrapy_crawl(
+        "test_spider", False, "test-domain.example.com", "http://starting-url.example.com/", "csv", job_id="test-job"
+    )
+
+    assert mock_run.call_args.args[0].endswith("-a output_target=csv -a job_id=test-job")
+
+
 def test_transform_crawl_sites(crawl_sites_test_file_dataclass):
     transformed_crawl_sites = transform_crawl_sites(crawl_sites_test_file_dataclass)
 
@@ -49,13 +76,29 @@ def test_transform_crawl_sites(crawl_sites_test_file_dataclass):
             "func": run_scrapy_crawl,
             "id": "quotes-1",
             "name": "Quotes 1",
-            "args": ["domain_spider", False, "quotes.toscrape.com", "https://quotes.toscrape.com/", "csv"],
+            "args": [
+                "domain_spider",
+                False,
+                "quotes.toscrape.com",
+                "https://quotes.toscrape.com/",
+                "csv",
+                None,
+                "quotes-1",
+            ],
         },
         {
             "func": run_scrapy_crawl,
             "id": "quotes-2",
             "name": "Quotes 2",
-            "args": ["domain_spider_js", False, "quotes.toscrape.com", "https://quotes.toscrape.com/js/", "csv"],
+            "args": [
+                "domain_spider_js",
+                False,
+                "quotes.toscrape.com",
+                "https://quotes.toscrape.com/js/",
+                "csv",
+                None,
+                "quotes-2",
+            ],
         },
         {
             "func": run_scrapy_crawl,
@@ -67,13 +110,23 @@ def test_transform_crawl_sites(crawl_sites_test_file_dataclass):
                 "quotes.toscrape.com",
                 "https://quotes.toscrape.com/js-delayed/",
                 "endpoint",
+                None,
+                "quotes-3",
             ],
         },
         {
             "func": run_scrapy_crawl,
             "id": "quotes-4",
             "name": "Quotes 4",
-            "args": ["domain_spider", False, "quotes.toscrape.com/tag/", "https://quotes.toscrape.com/", "endpoint"],
+            "args": [
+                "domain_spider",
+                False,
+                "quotes.toscrape.com/tag/",
+                "https://quotes.toscrape.com/",
+                "endpoint",
+                None,
+                "quotes-4",
+            ],
         },
     ]
 
@@ -1,5 +1,5 @@
 import pytest
-from scrapy.http import Response, Request
+from scrapy.http import HtmlResponse, Request, Response
 
 from search_gov_crawler.search_gov_spiders.spiders.domain_spider import DomainSpider
 from search_gov_crawler.search_gov_spiders.spiders.domain_spider_js import DomainSpiderJs
@@ -12,12 +12,12 @@ def fixture_spider(request):
     return request.param
 
 
-def get_results(spider, content: str):
+def get_results(spider, content: str, output_target: str = "csv"):
     request = Request(url=TEST_URL, encoding="utf-8")
 
-    response = Response(url=TEST_URL, request=request, headers={"content-type": content})
+    response = Response(url=TEST_URL, request=request, headers={"content-type": content}, body=b"<html></html>")
 
-    spider.output_target = "csv"
+    spider.output_target = output_target
     spider.allowed_domains = ["example.com"]
     return next(spider.parse_item(response), None)
 
@@ -32,6 +32,35 @@ def test_valid_content_plus(spider):
     assert results is not None and results.get("url") == TEST_URL
 
 
+@pytest.mark.parametrize(
+    ("output_target", "html_content"),
+    [("csv", None), ("endpoint", None), ("elasticsearch", "<html></html>"), ("jsonl", "<html></html>")],
+)
+def test_html_content_only_for_content_targets(spider, mocker, output_target, html_content):
+    mock_decode = mocker.patch(
+        "search_gov_crawler.search_gov_spiders.helpers.encoding.decode_http_response", return_value="<html></html>"
+    )
+    results = get_results(spider, "text/html", output_target=output_target)
+
+    assert results.get("html_content") == html_content
+    assert mock_decode.called == (html_content is not None)
+
+
+@pytest.mark.parametrize(
+    ("content_type", "output_target", "expected_output_target", "has_html_content"),
+    [
+        ("text/html", "csv,elasticsearch", "csv,elasticsearch", True),
+        ("application/pdf", "csv,elasticsearch", "csv", False),
+        ("text/html", "csv,endpoint", "csv,endpoint", False),
+    ],
+)
+def test_multiple_output_targets(spider, content_type, output_target, expected_output_target, has_html_content):
+    results = get_results(spider, content_type, output_target=output_target)
+
+    assert results.get("output_target") == expected_output_target
+    assert ("html_content" in results) is has_html_content
+
+
 def test_invalid_content(spider):
     results = get_results(spider, "media/image")
     assert results is None
@@ -43,3 +72,30 @@ def test_invalid_args(spider_cls):
         ValueError, match="Invalid arguments: allowed_domains and start_urls must be used together or not at all."
     ):
         spider_cls(allowed_domains="test.example.com")
+
+
+@pytest.mark.parametrize(
+    ("canonicalization_rules", "expected_document_id_rules"),
+    [(None, ()), ("", ()), ("strip_www,lowercase_host", ("lowercase_host", "strip_www"))],
+)
+@pytest.mark.parametrize("spider_cls", [DomainSpider, DomainSpiderJs])
+def test_document_id_rules(spider_cls, canonicalization_rules, expected_document_id_rules):
+    spider = spider_cls(canonicalization_rules=canonicalization_rules)
+    assert spider.document_id_rules == expected_document_id_rules
+
+
+@pytest.mark.parametrize(
+    ("canonicalization_rules", "expected_urls"),
+    [
+        (None, ["http://example.com/page"]),
+        ("", ["http://example.com/page", "http://example.com/page#section"]),
+    ],
+)
+@pytest.mark.parametrize("spider_cls", [DomainSpider, DomainSpiderJs])
+def test_requests_to_follow_canonicalization_rules(spider_cls, canonicalization_rules, expected_urls):
+    spider = spider_cls(canonicalization_rules=canonicalization_rules)
+    body = b'<html><body><a href="/page">Page</a><a href="/page#section">Section</a></body></html>'
+    response = HtmlResponse(url=TEST_URL, body=body, encoding="utf-8")
+
+    # pylint: disable=protected-access
+    assert [request.url for request in spider._requests_to_follow(response)] == expected_urls
@@ -0,0 +1,60 @@
+import pytest
+from scrapy import Spider
+from scrapy.utils.test import get_crawler
+
+from search_gov_crawler.search_gov_spiders.helpers.timing import StageTimer, timed, timing_snapshot
+
+
+@pytest.fixture(name="spider")
+def fixture_spider():
+    crawler = get_crawler(Spider)
+    return crawler._create_spider(name="timing_test")  # pylint: disable=protected-access
+
+
+def test_stage_timer_stores_timings():
+    timings = {}
+    with StageTimer(timings, "parse") as timer:
+        sum(range(1000))
+
+    assert timings == {"parse": (timer.wall_seconds, timer.cpu_seconds)}
+    assert timer.wall_seconds > 0
+
+
+def test_timed_records_stats(spider):
+    for _ in range(2):
+        with timed(spider, "dedup"):
+            pass
+
+    assert spider.crawler.stats.get_value("timing/dedup/count") == 2
+    assert spider.crawler.stats.get_value("timing/dedup/wall_seconds") > 0
+    assert spider.crawler.stats.get_value("timing/dedup/cpu_seconds") >= 0
+
+
+def test_timed_records_stats_on_error(spider):
+    with pytest.raises(ValueError), timed(spider, "csv_write"):
+        raise ValueError("write failed")
+
+    assert spider.crawler.stats.get_value("timing/csv_write/count") == 1
+
+
+def test_timed_without_stats():
+    with timed(None, "dedup") as timer:
+        pass
+
+    assert timer.wall_seconds > 0
+
+
+def test_timing_snapshot():
+    crawl_stats = {
+        "timing/convert_html/count": 4,
+        "timing/convert_html/wall_seconds": 2.0,
+        "timing/convert_html/cpu_seconds": 1.5,
+        "timing/convert_html/parse/count": 4,
+        "timing/convert_html/parse/wall_seconds": 1.0,
+        "item_scraped_count": 4,
+    }
+
+    assert timing_snapshot(crawl_stats) == {
+        "convert_html": {"count": 4, "wall_seconds": 2.0, "cpu_seconds": 1.5, "avg_wall_ms": 500.0},
+        "convert_html/parse": {"count": 4, "wall_seconds": 1.0, "avg_wall_ms": 250.0},
+    }
@@ -0,0 +1,55 @@
+import pytest
+
+from search_gov_crawler.search_gov_spiders.helpers.url_batch import UrlBatch
+
+
+@pytest.mark.parametrize(
+    ("max_bytes", "max_count", "urls", "expected"),
+    [
+        (100, 0, ["http://example.com"], False),
+        (18, 0, ["http://example.com"], True),
+        (100, 2, ["http://example.com/1"], False),
+        (100, 2, ["http://example.com/1", "http://example.com/2"], True),
+    ],
+)
+def test_url_batch_is_full(max_bytes, max_count, urls, expected):
+    batch = UrlBatch(max_bytes=max_bytes, max_count=max_count)
+    for url in urls:
+        batch.add(url)
+    assert batch.is_full is expected
+
+
+def test_url_batch_byte_size():
+    batch = UrlBatch(max_bytes=100)
+    batch.add("http://example.com/á")
+    batch.add("http://example.com")
+    assert batch.byte_size == 39
+    assert len(batch) == 2
+
+
+def test_url_batch_take():
+    batch = UrlBatch(max_bytes=100)
+    batch.add("http://example.com")
+    assert batch.take() == ["http://example.com"]
+    assert len(batch) == 0
+    assert batch.byte_size == 0
+
+
+@pytest.mark.parametrize(
+    ("max_age", "urls", "elapsed", "expected"),
+    [
+        (0, ["http://example.com"], 1000, False),
+        (60, [], 1000, False),
+        (60, ["http://example.com"], 59, False),
+        (60, ["http://example.com"], 60, True),
+    ],
+)
+def test_url_batch_is_stale(mocker, max_age, urls, elapsed, expected):
+    mock_monotonic = mocker.patch("search_gov_crawler.search_gov_spiders.helpers.url_batch.time.monotonic")
+    mock_monotonic.return_value = 1000
+    batch = UrlBatch(max_bytes=100, max_age=max_age)
+    for url in urls:
+        batch.add(url)
+
+    mock_monotonic.return_value = 1000 + elapsed
+    assert batch.is_stale is expected
@@ -0,0 +1,47 @@
+import pytest
+
+from search_gov_crawler.search_gov_spiders.helpers.url_canonicalization import (
+    DEFAULT_CANONICALIZATION_RULES,
+    canonicalize_url,
+    parse_canonicalization_rules,
+)
+
+
+@pytest.mark.parametrize(
+    ("rules", "expected_rules"),
+    [
+        (None, DEFAULT_CANONICALIZATION_RULES),
+        ("", ()),
+        (" strip_www , force_https,strip_www", ("force_https", "strip_www")),
+    ],
+)
+def test_parse_canonicalization_rules(rules, expected_rules):
+    assert parse_canonicalization_rules(rules) == expected_rules
+
+
+def test_parse_canonicalization_rules_invalid():
+    with pytest.raises(ValueError, match=r"Invalid canonicalization rules \['lowercase_path'\]!"):
+        parse_canonicalization_rules("lowercase_path,strip_www")
+
+
+@pytest.mark.parametrize(
+    ("url", "rules", "expected_url"),
+    [
+        (
+            "HTTP://WWW.Example.gov:80/a/b/?z=1&a=2#frag",
+            DEFAULT_CANONICALIZATION_RULES,
+            "http://www.example.gov/a/b/?a=2&z=1",
+        ),
+        ("https://www.example.gov:443", DEFAULT_CANONICALIZATION_RULES, "https://www.example.gov/"),
+        ("https://www.example.gov:8443/A", DEFAULT_CANONICALIZATION_RULES, "https://www.example.gov:8443/A"),
+        (
+            "http://www.example.gov/a/b/",
+            ("force_https", "strip_trailing_slash", "strip_www"),
+            "https://example.gov/a/b",
+        ),
+        ("https://www.example.gov/", ("strip_trailing_slash",), "https://www.example.gov/"),
+        ("HTTP://WWW.Example.gov/?b=1&a=2#frag", (), "HTTP://WWW.Example.gov/?b=1&a=2#frag"),
+    ],
+)
+def test_canonicalize_url(url, rules, expected_url):
+    assert canonicalize_url(url, rules) == expected_url
@@ -0,0 +1,67 @@
+from array import array
+
+import pytest
+
+from search_gov_crawler.search_gov_spiders.helpers.url_dedup import (
+    DEDUP_BACKENDS,
+    FingerprintArray,
+    ScalableBloomFilter,
+    create_url_dedup,
+    url_fingerprint,
+)
+
+URLS = [f"https://www.example.gov/section/{i}" for i in range(1000)]
+
+
+@pytest.mark.parametrize("backend", DEDUP_BACKENDS)
+def test_url_dedup_add(backend):
+    urls_seen = create_url_dedup(backend)
+
+    assert all(urls_seen.add(url) for url in URLS)
+    assert not any(urls_seen.add(url) for url in URLS)
+    assert len(urls_seen) == len(URLS)
+    assert URLS[0] in urls_seen
+    assert "https://www.example.gov/not-seen" not in urls_seen
+    assert urls_seen.memory_bytes > 0
+
+
+def test_url_dedup_invalid_backend():
+    with pytest.raises(ValueError, match="Invalid dedup backend: list"):
+        create_url_dedup("list")
+
+
+def test_url_fingerprint():
+    assert url_fingerprint("https://www.example.gov/") == url_fingerprint("https://www.example.gov/")
+    assert url_fingerprint("https://www.example.gov/") != url_fingerprint("https://www.example.gov")
+    assert 0 <= url_fingerprint("https://www.example.gov/") < 2**64
+
+
+def test_fingerprint_array_merges_buffer():
+    urls_seen = FingerprintArray(min_buffer_size=100)
+    for url in URLS:
+        urls_seen.add(url)
+
+    assert len(urls_seen._sorted) == 1000
+    assert list(urls_seen._sorted) == sorted(urls_seen._sorted)
+    assert all(url in urls_seen for url in URLS)
+
+
+def test_fingerprint_array_merge_interleaves_buffer():
+    urls_seen = FingerprintArray(min_buffer_size=100)
+    urls_seen._sorted = array("Q", [10, 20, 30, 40])
+    urls_seen._buffer = {5, 25, 26, 50}
+    urls_seen._merge()
+
+    assert list(urls_seen._sorted) == [5, 10, 20, 25, 26, 30, 40, 50]
+    assert not urls_seen._buffer
+
+
+def test_scalable_bloom_filter_grows():
+    urls = [f"https://www.example.gov/section/{i}" for i in range(3500)]
+    urls_seen = ScalableBloomFilter(initial_capacity=500, error_rate=0.001)
+
+    assert all(urls_seen.add(url) for url in urls)
+    assert len(urls_seen._filters) == 3  # capacities 500, 1000, 2000
+    assert all(url in urls_seen for url in urls)
+    false_positives = sum(f"https://www.example.gov/other/{i}" in urls_seen for i in range(20000))
+    assert false_positives / 20000 <= 0.001
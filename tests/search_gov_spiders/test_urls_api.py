@@ -0,0 +1,85 @@
+import pytest
+import requests
+from scrapy import Spider
+from scrapy.utils.test import get_crawler
+from twisted.internet import defer
+
+from search_gov_crawler.search_gov_spiders.helpers.urls_api import RETRY_STATUS_CODES, UrlsApiSender
+
+
+@pytest.fixture(name="sample_spider")
+def fixture_sample_spider():
+    crawler = get_crawler(Spider)
+    return crawler._create_spider(name="urls_api_test")
+
+
+@pytest.fixture(name="mock_defer_to_thread")
+def fixture_mock_defer_to_thread(mocker):
+    """Hold each post in an unfired deferred until the test fires it"""
+    posts = []
+
+    def defer_to_thread(func, *args, **kwargs):
+        deferred = defer.Deferred()
+        deferred.addCallback(lambda _: func(*args, **kwargs))
+        posts.append(deferred)
+        return deferred
+
+    mocker.patch("search_gov_crawler.search_gov_spiders.helpers.urls_api.threads.deferToThread", defer_to_thread)
+    return posts
+
+
+@pytest.fixture(name="sender")
+def fixture_sender(monkeypatch) -> UrlsApiSender:
+    monkeypatch.setenv("SPIDER_URLS_API_MAX_IN_FLIGHT", "1")
+    return UrlsApiSender("http://mockapi.com")
+
+
+def test_session_retries(sender):
+    adapter = sender._get_session().get_adapter("http://mockapi.com")
+    assert adapter.max_retries.total == 3
+    assert set(adapter.max_retries.status_forcelist) == set(RETRY_STATUS_CODES)
+    assert "POST" in adapter.max_retries.allowed_methods
+
+
+def test_post_waits_for_slot(sender, sample_spider, mock_defer_to_thread, mocker):
+    mock_post = mocker.patch.object(requests.Session, "post")
+
+    first = sender.post(["http://example.com/1"], sample_spider)
+    second = sender.post(["http://example.com/2"], sample_spider)
+    assert first.called
+    assert not second.called
+    assert sender.pending == 2
+
+    closed = sender.close()
+    mock_defer_to_thread[0].callback(None)
+    assert second.called
+    assert not closed.called
+
+    mock_defer_to_thread[1].callback(None)
+    assert closed.called
+    assert sender.pending == 0
+    assert mock_post.call_count == 2
+    assert sample_spider.crawler.stats.get_value("urls_api/urls") == 2
+
+
+def test_post_failure(sender, sample_spider, mock_defer_to_thread, mocker, caplog):
+    mocker.patch.object(requests.Session, "post", side_effect=requests.ConnectionError("refused"))
+
+    sender.post(["http://example.com/1", "http://example.com/2"], sample_spider)
+    mock_defer_to_thread[0].callback(None)
+
+    assert "Failed to send URLs to http://mockapi.com: refused" in caplog.messages
+    assert sample_spider.crawler.stats.get_value("urls_api/failed_posts") == 1
+    assert sample_spider.crawler.stats.get_value("urls_api/failed_urls") == 2
+    assert sample_spider.crawler.stats.get_value("timing/endpoint_post/count") == 1
+    assert sender.pending == 0
+
+
+def test_post_returns_stats_to_reactor_thread(sender, sample_spider, mocker):
+    mocker.patch.object(requests.Session, "post")
+
+    counts, timings = sender._post(["http://example.com/1", "http://example.com/2"], sample_spider)
+
+    assert counts == {"urls_api/posts": 1, "urls_api/urls": 2}
+    assert set(timings) == {"endpoint_post"}
+    assert sample_spider.crawler.stats.get_value("urls_api/urls") is None
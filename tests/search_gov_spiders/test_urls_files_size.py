@@ -1,9 +1,15 @@
 import os
 import copy
+import json
 import pytest
+import requests
 from scrapy import Spider
+from scrapy.exceptions import DropItem
 from scrapy.utils.test import get_crawler
+from twisted.internet import defer
 
+from search_gov_crawler.search_gov_spiders.helpers.csv_writer import RotatingCsvWriter
+from search_gov_crawler.search_gov_spiders.helpers.url_batch import UrlBatch
 from search_gov_crawler.search_gov_spiders.items import SearchGovSpidersItem
 from search_gov_crawler.search_gov_spiders.pipelines import SearchGovSpidersPipeline
 
@@ -34,16 +40,23 @@ def fixture_sample_item_long() -> SearchGovSpidersItem:
     return item
 
 
-@pytest.fixture(name="mock_open")
-def fixture_mock_open(mocker):
-    return mocker.patch("builtins.open", mocker.mock_open())
+@pytest.fixture(name="mock_csv_writer")
+def fixture_mock_csv_writer(tmp_path, mocker) -> RotatingCsvWriter:
+    """Write csv files to a temp directory"""
+    csv_writer = RotatingCsvWriter(
+        output_dir=tmp_path, base_name="all-links-p1234", max_bytes=SearchGovSpidersPipeline.MAX_URL_BATCH_SIZE_BYTES
+    )
+    mocker.patch.object(SearchGovSpidersPipeline, "_get_csv_writer", return_value=csv_writer)
+    return csv_writer
 
 
 @pytest.fixture(name="pipeline_no_api")
-def fixture_pipeline_no_api(mock_open, mocker) -> SearchGovSpidersPipeline:
+def fixture_pipeline_no_api(mock_csv_writer, mocker) -> SearchGovSpidersPipeline:
     mocker.patch.dict(os.environ, {})
     mocker.patch("search_gov_crawler.search_gov_spiders.pipelines.SearchGovSpidersPipeline.APP_PID", 1234)
-    return SearchGovSpidersPipeline()
+    pipeline = SearchGovSpidersPipeline()
+    pipeline._csv_writer = mock_csv_writer
+    return pipeline
 
 
 @pytest.fixture(name="pipeline_with_api")
@@ -55,24 +68,36 @@ def fixture_pipeline_with_api(mocker) -> SearchGovSpidersPipeline:
     return SearchGovSpidersPipeline()
 
 
-def test_write_to_file(pipeline_no_api, mock_open, sample_item, sample_spider, mocker):
+@pytest.fixture(name="mock_post")
+def fixture_mock_post(mocker):
+    """Post on the calling thread and return the mocked session post"""
+    mocker.patch(
+        "search_gov_crawler.search_gov_spiders.helpers.urls_api.threads.deferToThread",
+        side_effect=lambda func, *args, **kwargs: defer.maybeDeferred(func, *args, **kwargs),
+    )
+    return mocker.patch.object(requests.Session, "post")
+
+
+def test_write_to_file(pipeline_no_api, mock_csv_writer, sample_item, sample_spider):
     """Test that URLs are written to files when SPIDER_URLS_API is not set."""
     sample_item_copy = copy.deepcopy(sample_item)
     sample_item_copy["output_target"] = "csv"
-    mocker.patch.object(SearchGovSpidersPipeline, "_file_size", return_value=100)
     pipeline_no_api.process_item(sample_item_copy, sample_spider)
+    assert not mock_csv_writer.file_path.exists()
+    pipeline_no_api.close_spider(sample_spider)
 
     assert "html_content" not in sample_item_copy, f"Key 'html_content' should not be in the item after it's processed"
     assert "output_target" not in sample_item_copy, f"Key 'output_target' should not be in the item after it's processed"
 
-    # Ensure file is opened and written to
-    mock_open.assert_called_once_with(pipeline_no_api.file_path, "a", encoding="utf-8")
-    mock_open().write.assert_any_call(sample_item_copy["url"] + "\n")
+    # Ensure file is written, renamed and listed in the manifest
+    output_file = mock_csv_writer.output_dir / "all-links-p1234-1.csv"
+    assert output_file.read_text(encoding="utf-8") == sample_item_copy["url"] + "\n"
+    manifest = json.loads((mock_csv_writer.output_dir / "all-links-p1234-manifest.json").read_text(encoding="utf-8"))
+    assert manifest["files"] == [{"file": output_file.name, "urls": 1, "bytes": 19}]
 
 
-def test_post_to_api(pipeline_with_api, sample_item, sample_spider, mocker):
+def test_post_to_api(pipeline_with_api, sample_item, sample_spider, mocker, mock_post):
     """Test that URLs are batched and sent via POST when SPIDER_URLS_API is set."""
-    mock_post = mocker.patch("requests.post")
     sample_item_copy = copy.deepcopy(sample_item)
     pipeline_with_api.process_item(sample_item_copy, sample_spider)
     sample_item_copy["output_target"] = "endpoint"
@@ -81,38 +106,33 @@ def test_post_to_api(pipeline_with_api, sample_item, sample_spider, mocker):
     assert sample_item_copy["url"] in pipeline_with_api.urls_batch
 
     # Simulate max size to force post
-    mocker.patch.object(
-        SearchGovSpidersPipeline,
-        "_batch_size",
-        return_value=SearchGovSpidersPipeline.MAX_URL_BATCH_SIZE_BYTES,
-    )
-    pipeline_with_api.process_item(sample_item_copy, sample_spider)
+    mocker.patch.object(UrlBatch, "is_full", new_callable=mocker.PropertyMock, return_value=True)
+    result = pipeline_with_api.process_item(sample_item_copy, sample_spider)
 
-    # Ensure POST request was made
-    mock_post.assert_called_once_with("http://mockapi.com", json={"urls": pipeline_with_api.urls_batch})
+    # Ensure POST request was made with the batch and the item is returned once it has started
+    mock_post.assert_called_once_with(
+        "http://mockapi.com", json={"urls": ["http://example.com", "http://example.com"]}, timeout=30
+    )
+    assert isinstance(result, defer.Deferred)
+    assert result.result is sample_item_copy
+    assert len(pipeline_with_api.urls_batch) == 0
 
 
-def test_rotate_file(pipeline_no_api, mock_open, sample_item, mocker):
+def test_rotate_file(pipeline_no_api, mock_csv_writer, sample_item_long):
     """Test that file rotation occurs when max size is exceeded."""
-    sample_item["output_target"] = "csv"
-    mock_rename = mocker.patch("os.rename")
-    mocker.patch.object(
-        SearchGovSpidersPipeline,
-        "_file_size",
-        return_value=SearchGovSpidersPipeline.MAX_URL_BATCH_SIZE_BYTES,
-    )
-    pipeline_no_api.process_item(sample_item, None)
+    for _ in range(101):
+        sample_item_long["output_target"] = "csv"
+        pipeline_no_api.process_item(sample_item_long, None)
 
-    # Check if the file was rotated
-    mock_open.assert_called_with(pipeline_no_api.file_path, "a", encoding="utf-8")
-    mock_open().close.assert_called()
-    mock_rename.assert_called_once()
+    # Check if the file was rotated before it went over the max size
+    rotated_file = mock_csv_writer.output_dir / "all-links-p1234-1.csv"
+    assert rotated_file.stat().st_size == 99 * 1025
+    assert mock_csv_writer.file_path.exists()
+    assert len(pipeline_no_api.file_batch) == 1
 
 
-def test_post_to_api_size_limit(pipeline_with_api, mocker, sample_spider, sample_item_long):
+def test_post_to_api_size_limit(pipeline_with_api, mocker, sample_spider, sample_item_long, mock_post):
     """Validate size limit checking with API calls enabled"""
-    mock_post = mocker.patch("requests.post")
-
     for _ in range(200):
         pipeline_with_api.process_item(sample_item_long, sample_spider)
         sample_item_long["output_target"] = "endpoint"
@@ -120,21 +140,167 @@ def test_post_to_api_size_limit(pipeline_with_api, mocker, sample_spider, sample
     pipeline_with_api.close_spider(sample_spider)
     # Ensure POST request was made
     calls = [
-        mocker.call("http://mockapi.com", json=mocker.ANY),
+        mocker.call("http://mockapi.com", json=mocker.ANY, timeout=30),
         mocker.call().raise_for_status(),
-        mocker.call("http://mockapi.com", json=mocker.ANY),
+        mocker.call("http://mockapi.com", json=mocker.ANY, timeout=30),
         mocker.call().raise_for_status(),
     ]
     mock_post.assert_has_calls(calls)
 
 
-def test_post_urls_on_spider_close(pipeline_with_api, sample_spider, mocker):
+def test_post_urls_on_spider_close(pipeline_with_api, sample_spider, mocker, mock_post):
     """Test that remaining URLs are posted when spider closes and SPIDER_URLS_API is set."""
-    mock_post = mocker.patch("requests.post")
+    pipeline_with_api.urls_batch.add("http://example.com")
 
-    pipeline_with_api.urls_batch = ["http://example.com"]
+    closed = pipeline_with_api.close_spider(sample_spider)
 
-    pipeline_with_api.close_spider(sample_spider)
+    # Ensure POST request was made on spider close and close waits for it
+    mock_post.assert_called_once_with("http://mockapi.com", json={"urls": ["http://example.com"]}, timeout=30)
+    assert closed.called
+
+
+def test_flush_stale_batches(pipeline_with_api, mock_csv_writer, sample_spider, mocker, mock_post):
+    """Test that batches are flushed once they have not received a url in their max age."""
+    pipeline_with_api.urls_batch.add("http://example.com/api")
+    pipeline_with_api.file_batch.add("http://example.com/file")
+
+    pipeline_with_api._flush_stale_batches(sample_spider)
+    mock_post.assert_not_called()
+
+    mocker.patch.object(UrlBatch, "is_stale", new_callable=mocker.PropertyMock, return_value=True)
+    pipeline_with_api._flush_stale_batches(sample_spider)
+    mock_csv_writer.close()
+
+    mock_post.assert_called_once_with("http://mockapi.com", json={"urls": ["http://example.com/api"]}, timeout=30)
+    output_file = mock_csv_writer.output_dir / "all-links-p1234-1.csv"
+    assert output_file.read_text(encoding="utf-8") == "http://example.com/file\n"
+
+
+def test_multiple_output_targets(pipeline_with_api, mock_csv_writer, sample_item, sample_spider, mocker):
+    """Test that an item with several output targets is handed to each of them"""
+    es_deferred = defer.Deferred()
+    mock_process_content_item = mocker.patch.object(
+        pipeline_with_api, "_process_content_item", return_value=es_deferred
+    )
+    sample_item_copy = copy.deepcopy(sample_item)
+    sample_item_copy["output_target"] = "csv,endpoint,elasticsearch"
+
+    results = []
+    pipeline_with_api.process_item(sample_item_copy, sample_spider).addCallback(results.append)
+
+    mock_process_content_item.assert_called_once_with(sample_item_copy, ["elasticsearch"], sample_spider)
+    assert sample_item_copy["url"] in pipeline_with_api.urls_batch
+    assert sample_item_copy["url"] in pipeline_with_api.file_batch
+    assert not results
+
+    es_deferred.callback(None)
+    assert results == [sample_item_copy]
+
+
+@pytest.fixture(name="mock_convert_html")
+def fixture_mock_convert_html(mocker):
+    mocker.patch.dict(os.environ, {"SPIDER_ES_CONVERT_WORKERS": "0"})
+    return mocker.patch(
+        "search_gov_crawler.search_gov_spiders.pipelines.convert_html", return_value={"_id": "1", "title": "Test"}
+    )
+
+
+def test_jsonl_output_target(pipeline_no_api, sample_item, sample_spider, mocker, mock_convert_html):
+    """Test that jsonl items are converted, handed to the export and closed with the pipeline"""
+    export_deferred = defer.Deferred()
+    mock_export = mocker.patch("search_gov_crawler.search_gov_spiders.pipelines.SearchGovJsonlExport").return_value
+    mock_export.write_doc.return_value = export_deferred
+    mock_export.close.return_value = defer.succeed(None)
+    sample_item_copy = copy.deepcopy(sample_item)
+    sample_item_copy["output_target"] = "jsonl"
+    sample_item_copy["html_content"] = "<html></html>"
+
+    results = []
+    pipeline_no_api.process_item(sample_item_copy, sample_spider).addCallback(results.append)
+    mock_export.write_doc.assert_called_once_with({"_id": "1", "title": "Test"}, "http://example.com", sample_spider)
+
+    export_deferred.callback(None)
+    assert results == [sample_item_copy]
+
+    pipeline_no_api.close_spider(sample_spider)
+    mock_export.close.assert_called_once_with(sample_spider)
+
+
+def test_content_targets_share_conversion(pipeline_no_api, sample_item, sample_spider, mocker, mock_convert_html):
+    """Test that an item sent to elasticsearch and jsonl is converted once and both share the conversion pool"""
+    mock_es_class = mocker.patch("search_gov_crawler.search_gov_spiders.pipelines.SearchGovElasticsearch")
+    mock_export_class = mocker.patch("search_gov_crawler.search_gov_spiders.pipelines.SearchGovJsonlExport")
+    mock_es_class.return_value.close.return_value = defer.succeed(None)
+    mock_export_class.return_value.close.return_value = defer.succeed(None)
+    sample_item_copy = copy.deepcopy(sample_item)
+    sample_item_copy["output_target"] = "elasticsearch,jsonl"
+    sample_item_copy["html_content"] = "<html></html>"
+
+    results = []
+    pipeline_no_api.process_item(sample_item_copy, sample_spider).addCallback(results.append)
+
+    assert results == [sample_item_copy]
+    mock_convert_html.assert_called_once()
+    doc = {"_id": "1", "title": "Test"}
+    mock_es_class.return_value.add_doc_to_batch.assert_called_once_with(doc, "http://example.com", sample_spider)
+    mock_export_class.return_value.write_doc.assert_called_once_with(doc, "http://example.com", sample_spider)
+    conversion_pool = pipeline_no_api._conversion_pool
+    mock_es_class.assert_called_once_with(conversion_pool=conversion_pool)
+    mock_export_class.assert_called_once_with(conversion_pool=conversion_pool)
+
+    close_pool = mocker.patch.object(conversion_pool, "close")
+    pipeline_no_api.close_spider(sample_spider)
+    close_pool.assert_called_once_with()
+
+
+@pytest.mark.parametrize("output_target", ["csv,index", "", None])
+def test_invalid_output_targets(pipeline_no_api, sample_item, sample_spider, output_target):
+    sample_item_copy = copy.deepcopy(sample_item)
+    sample_item_copy["output_target"] = output_target
+
+    with pytest.raises(DropItem, match="Not a valid output_target"):
+        pipeline_no_api.process_item(sample_item_copy, sample_spider)
+
+
+def test_multiple_output_targets_drop_item(pipeline_with_api, mock_csv_writer, sample_item, sample_spider, mocker):
+    """Test that a target dropping the item fails with its DropItem, after the url targets got the item"""
+    mocker.patch.object(
+        pipeline_with_api, "_process_content_item", return_value=defer.fail(DropItem("conversion failed"))
+    )
+    mocker.patch.object(pipeline_with_api, "_process_api_item", return_value=defer.Deferred())
+    sample_item_copy = copy.deepcopy(sample_item)
+    sample_item_copy["output_target"] = "csv,endpoint,elasticsearch,jsonl"
+
+    failures = []
+    pipeline_with_api.process_item(sample_item_copy, sample_spider).addErrback(failures.append)
+
+    assert sample_item_copy["url"] in pipeline_with_api.file_batch
+    assert failures[0].check(DropItem)
+    assert failures[0].getErrorMessage() == "conversion failed"
+
+
+def test_missing_html_content_keeps_url_targets(pipeline_with_api, mock_csv_writer, sample_item, sample_spider):
+    """Test that an item without html content is dropped by the content targets after reaching the url targets"""
+    sample_item_copy = copy.deepcopy(sample_item)
+    sample_item_copy["output_target"] = "csv,endpoint,elasticsearch"
+
+    with pytest.raises(DropItem, match="Missing URL or HTML in item"):
+        pipeline_with_api.process_item(sample_item_copy, sample_spider)
+
+    assert sample_item_copy["url"] in pipeline_with_api.urls_batch
+    assert sample_item_copy["url"] in pipeline_with_api.file_batch
+
+
+@pytest.mark.parametrize(("output_target", "expected_open_calls"), [("elasticsearch,csv", 1), ("csv", 0)])
+def test_open_spider_checks_elasticsearch_index(
+    pipeline_no_api, sample_spider, mocker, output_target, expected_open_calls
+):
+    """Test that the elasticsearch index is checked when the spider opens, before any item is compared"""
+    mock_es = mocker.patch("search_gov_crawler.search_gov_spiders.pipelines.SearchGovElasticsearch").return_value
+    mock_es.open.return_value = defer.succeed(None)
+    sample_spider.output_target = output_target
+
+    result = pipeline_no_api.open_spider(sample_spider)
 
-    # Ensure POST request was made on spider close, cannot verify json once urls_batch is cleared
-    mock_post.assert_called_once_with("http://mockapi.com", json=mocker.ANY)
+    assert mock_es.open.call_count == expected_open_calls
+    assert (result is None) == (expected_open_calls == 0)